@@ -30,6 +30,15 @@ SOFTWARE.
 
 from .config import *
 from .file import File
+from .directory import Directory
+from .bulk import hash_many
+from .duplicates import find_duplicates
+from .archive import backup_many
+from .search import grep_tree
+from .trigram import TrigramIndex
+from .watcher import Watcher
+from .asyncfile import AsyncFile
+from .writer import Writer, Durability
 
 __version_info__ = (0, 0, 1)
 __version__ = "0.0.1"
\ No newline at end of file
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+File: archive.py
+Description: Streaming multi-file ZIP backups with selectable codecs and parallel compression.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import hashlib
+import zipfile
+from collections import namedtuple
+from PyFile.config import HASH_BLOCK_SIZE
+from PyFile.transfer import iter_blocks
+
+
+CODECS: dict = {
+    "stored": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bz2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+# ZipInfo has a public per-entry compression level from Python 3.13. Before that an entry
+# streamed with ZipFile.open() always gets the codec's default level.
+_ENTRY_LEVEL = hasattr(zipfile.ZipInfo(), "compress_level")
+
+BackupEntry = namedtuple("BackupEntry", ["path", "arcname", "sha256", "size", "compress_size"])
+
+
+def _arcname(path: str) -> str:
+    """
+    Name a file is stored under: its path relative to the current directory when it is
+    below it, otherwise its absolute path without the leading separator.
+    """
+    relative = os.path.relpath(path)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return os.path.splitdrive(path)[1].lstrip(os.sep)
+    return relative
+
+
+def _zip_info(path: str, arcname: str, compress_type: int, level: int or None) -> zipfile.ZipInfo:
+    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+    zinfo.compress_type = compress_type
+    if _ENTRY_LEVEL:
+        zinfo.compress_level = level
+    return zinfo
+
+
+def _resolve(item) -> str:
+    """
+    Accept a File or a path, flushing pending writes on a File.
+    """
+    flush = getattr(item, "flush", None)
+    if flush is not None:
+        flush()
+    return getattr(item, "abs_path", item)
+
+
+def _write_entry(archive: zipfile.ZipFile, zinfo: zipfile.ZipInfo, path: str, level: int or None, block_size: int) -> str:
+    """
+    Compress a file into the archive, hashing it during the same read.
+
+    Before Python 3.13 ZipInfo has no public compression level, so an explicit level is
+    applied with ZipFile.writestr(), which needs the whole file in memory.
+
+    :return: SHA256 hex digest of the file.
+    """
+    file_hash = hashlib.sha256()
+    if level is not None and not _ENTRY_LEVEL:
+        with open(path, "rb") as file_obj:
+            data = file_obj.read()
+        file_hash.update(data)
+        archive.writestr(zinfo, data, compresslevel=level)
+        return file_hash.hexdigest()
+
+    with archive.open(zinfo, "w") as dst:
+        for block in iter_blocks(path, block_size):
+            file_hash.update(block)
+            dst.write(block)
+    return file_hash.hexdigest()
+
+
+def backup_many(files, archive_path: str, codec="deflate", level=None, block_size=HASH_BLOCK_SIZE) -> list:
+    """
+    Back up many files into a single ZIP archive. Each file is read once: its SHA256 is
+    computed while it is compressed, and the digest is written from memory as a
+    '<name>.SHA256' entry next to it, so no temporary files are created on disk.
+
+    :param files: Iterable of File objects or paths.
+    :param archive_path: Path of the archive to create.
+    :param codec: One of 'stored', 'deflate', 'bz2' or 'lzma'.
+    :param level: Compression level for the codec, or None for the codec's default.
+    :param block_size: Number of bytes to read per block.
+    :return: List of BackupEntry(path, arcname, sha256, size, compress_size).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported backup codec: '{codec}'")
+    compress_type: int = CODECS[codec]
+
+    directory = os.path.dirname(archive_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    entries: list = []
+    with zipfile.ZipFile(archive_path, "w", compress_type, compresslevel=level) as archive:
+        for item in files:
+            path = _resolve(item)
+            zinfo = _zip_info(path, _arcname(path), compress_type, level)
+            digest = _write_entry(archive, zinfo, path, level, block_size)
+            archive.writestr(zinfo.filename + ".SHA256", digest)
+            entries.append(BackupEntry(path, zinfo.filename, digest, zinfo.file_size, zinfo.compress_size))
+
+    return entries
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+"""
+File: asyncfile.py
+Description: asyncio counterpart to File that runs blocking work on a bounded executor.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from PyFile.config import HASH_BLOCK_SIZE, STREAM_BLOCK_SIZE, ASYNC_HASH_SPAN
+from PyFile.file import File, HashType
+from PyFile import hashing
+from PyFile import lines
+from PyFile import search
+from PyFile import transfer
+from PyFile import tail
+from PyFile import compression
+
+
+# Number of results moved from a worker thread to the event loop per executor call
+# when streaming lines or grep matches.
+STREAM_BATCH_SIZE = 256
+
+
+class AsyncExecutor(object):
+    """
+    Bounded executor for the blocking work behind AsyncFile. Stateful file I/O runs on a
+    thread pool; CPU heavy, path based work (grep, line counting) can optionally run on a
+    process pool instead. At most max_pending calls are queued or running at once; further
+    callers wait, which gives producers backpressure.
+    """
+
+    __slots__ = ["threads", "processes", "max_pending", "_loop", "_semaphore"]
+
+    def __init__(self, workers=4, processes=0, max_pending=None):
+        self.threads = ThreadPoolExecutor(max_workers=workers)
+        self.processes = ProcessPoolExecutor(max_workers=processes) if processes else None
+        self.max_pending: int = max_pending or 2 * (workers + processes)
+        self._loop = None
+        self._semaphore: asyncio.Semaphore or None = None
+
+    async def run(self, func, *args, cpu=False):
+        """
+        Run a blocking function on the executor and await its result.
+
+        :param func: Function to call.
+        :param args: Positional arguments. Must be picklable if cpu is True and a process pool is configured.
+        :param cpu: Prefer the process pool, if one is configured.
+        :return: The function's return value.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Semaphores belong to one event loop, so a new one is made if the executor outlives its loop.
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        pool = self.processes if cpu and self.processes is not None else self.threads
+        async with self._semaphore:
+            return await loop.run_in_executor(pool, func, *args)
+
+    def submit(self, func, *args) -> Future:
+        """
+        Run a blocking cleanup call on the thread pool without waiting for it, typically
+        from a task that is being cancelled and can no longer await. If the call fails, its
+        exception is passed to the running event loop's exception handler.
+
+        :param func: Function to call.
+        :param args: Positional arguments.
+        :return: concurrent.futures.Future of the call.
+        """
+        future = self.threads.submit(func, *args)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return future
+
+        def report(done: Future) -> None:
+            if done.cancelled() or done.exception() is None:
+                return
+            context = {"message": f"Cleanup call {func!r} failed", "exception": done.exception(), "future": done}
+            try:
+                loop.call_soon_threadsafe(loop.call_exception_handler, context)
+            except RuntimeError:
+                # The loop has been closed; the exception stays on the future.
+                pass
+
+        future.add_done_callback(report)
+        return future
+
+    def shutdown(self, wait=True) -> None:
+        """
+        Shut down the underlying pools.
+
+        :param wait: Wait for running calls to finish.
+        :return: No return value.
+        """
+        self.threads.shutdown(wait)
+        if self.processes is not None:
+            self.processes.shutdown(wait)
+
+
+_default_executor: AsyncExecutor or None = None
+
+
+def default_executor() -> AsyncExecutor:
+    """
+    Return the shared executor used by AsyncFile objects created without one.
+
+    :return: AsyncExecutor
+    """
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = AsyncExecutor()
+    return _default_executor
+
+
+class _ChunkReader(object):
+    """
+    Block iterator shared between executor calls. Large raw files are hashed out of a
+    memory map, like File.hashes(). A lock ensures the file is not closed while a step is
+    still running on a worker thread after the awaiting task was cancelled.
+    """
+
+    __slots__ = ["blocks", "closed", "lock"]
+
+    def __init__(self, path: str, block_size: int, fmt=None):
+        if fmt is None:
+            self.blocks = transfer.iter_blocks(path, block_size)
+        else:
+            self.blocks = compression.iter_blocks(path, block_size, fmt)
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def hash_step(self, updates: list, span: int) -> int:
+        total: int = 0
+        with self.lock:
+            if self.closed:
+                return 0
+            for block in self.blocks:
+                for update in updates:
+                    update(block)
+                total += len(block)
+                if total >= span:
+                    break
+            return total
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            self.blocks.close()
+
+
+class _Batches(object):
+    """
+    Pulls items from a blocking iterable in batches on worker threads. The iterable is
+    opened by the first batch, and the lock serializes batches with the final close, which
+    may be submitted while a batch of a cancelled consumer is still running.
+    """
+
+    __slots__ = ["opener", "iterable", "lock", "closed"]
+
+    def __init__(self, opener):
+        self.opener = opener
+        self.iterable = None
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def take(self, n: int) -> list:
+        items: list = []
+        with self.lock:
+            if self.closed:
+                return items
+            if self.iterable is None:
+                self.iterable = self.opener()
+            for item in self.iterable:
+                items.append(item)
+                if len(items) >= n:
+                    break
+        return items
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            if self.iterable is not None:
+                self.iterable.close()
+
+    async def drain(self, executor: AsyncExecutor):
+        try:
+            while True:
+                batch = await executor.run(self.take, STREAM_BATCH_SIZE)
+                if not batch:
+                    return
+                for item in batch:
+                    yield item
+        finally:
+            executor.submit(self.close)
+
+
+def _grep_path(path: str, pattern: bytes, flags: int, max_count, invert: bool, before: int, after: int, fmt=None) -> list:
+    regex = search.compile_pattern(pattern, flags)
+    if fmt is not None:
+        with compression.open_decompressed(path, "rb", fmt) as stream:
+            return list(search.grep_stream(stream, regex, max_count, invert, before, after))
+    with open(path, "rb") as file_obj, transfer.map_file(file_obj) as buf:
+        return list(search.grep_buffer(buf, regex, max_count, invert, before, after))
+
+
+class AsyncFile(object):
+    """
+    asyncio counterpart to File. Every blocking operation runs on an AsyncExecutor so the
+    event loop is never blocked, and lines and grep matches can be streamed with async for.
+    """
+
+    __slots__ = ["file", "executor"]
+
+    def __init__(self, path, mode="r", executor=None):
+        self.file: File = path if isinstance(path, File) else File(path, open_file=True, mode=mode)
+        self.executor: AsyncExecutor = executor or default_executor()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def abs_path(self) -> str:
+        return self.file.abs_path
+
+    async def close(self) -> bool:
+        return await self.executor.run(self.file.close)
+
+    async def read(self, n=None) -> str:
+        return await self.executor.run(self.file.read, n)
+
+    async def readlines(self) -> list:
+        return await self.executor.run(self.file.readlines)
+
+    async def write(self, string) -> int:
+        return await self.executor.run(self.file.write, string)
+
+    async def flush(self) -> None:
+        return await self.executor.run(self.file.flush)
+
+    async def hashes(self, algorithms=("md5", "sha256"), hash_type=HashType.STRING, block_size=None, decompress=False) -> dict:
+        """
+        Hash the file with several algorithms in one pass. Each executor call reads and hashes
+        up to ASYNC_HASH_SPAN bytes, so cancelling the awaiting task stops the work at the
+        next span boundary. Digests go through the same caches as File.hashes().
+
+        :param algorithms: Iterable of hashlib algorithm names.
+        :param hash_type: String or bytes return type.
+        :param block_size: Number of bytes read per block. Defaults to HASH_BLOCK_SIZE.
+        :param decompress: Hash the decompressed contents of a compressed file.
+        :return: Dictionary mapping each algorithm name to its digest.
+        """
+        names: list = hashing.normalize_algorithms(algorithms)
+        fmt = await self.executor.run(self._compression, decompress)
+        prefix: str = "decompressed:" if fmt is not None else ""
+        # The caches may be backed by disk (digest store, xattrs), so they are consulted off the loop.
+        signature, digests, missing = await self.executor.run(self._cached_digests, [prefix + name for name in names])
+
+        if missing:
+            hashers: dict = hashing.new_hashers([name[len(prefix):] for name in missing])
+            updates: list = [hasher.update for hasher in hashers.values()]
+            reader = await self.executor.run(_ChunkReader, self.abs_path, block_size or HASH_BLOCK_SIZE, fmt)
+            try:
+                while await self.executor.run(reader.hash_step, updates, ASYNC_HASH_SPAN):
+                    pass
+            except BaseException:
+                # A cancelled task cannot await the close, which may wait for a running step.
+                self.executor.submit(reader.close)
+                raise
+            await self.executor.run(reader.close)
+
+            computed = {prefix + name: hasher.digest() for name, hasher in hashers.items()}
+            await self.executor.run(self.file._store_digests, signature, computed)
+            digests.update(computed)
+
+        return {name: File._format_digest(digests[prefix + name], hash_type) for name in names}
+
+    def _compression(self, decompress: bool) -> str or None:
+        """
+        The compression format to read the file through, or None to read its raw bytes.
+        """
+        self.file.flush()
+        return self.file.compression if self.file._decompresses(decompress) else None
+
+    def _cached_digests(self, names: list) -> tuple:
+        signature: tuple = self.file._signature()
+        return (signature,) + self.file._cached_digests(names, signature)
+
+    async def md5(self, hash_type=HashType.STRING, decompress=False):
+        return (await self.hashes(["md5"], hash_type, decompress=decompress))["md5"]
+
+    async def sha256(self, hash_type=HashType.STRING, decompress=False):
+        return (await self.hashes(["sha256"], hash_type, decompress=decompress))["sha256"]
+
+    async def count_lines(self, count_unterminated=True, decompress=True) -> int:
+        """
+        Count the lines in the file on the executor (the process pool, if configured).
+        The lines of a compressed file are counted in its decompressed stream, as File does.
+
+        :param count_unterminated: Whether a final line without a trailing newline counts as a line.
+        :param decompress: Count the decompressed lines of a compressed file rather than its raw bytes.
+        :return: Integer
+        """
+        fmt = await self.executor.run(self._compression, decompress)
+        if fmt is not None:
+            return await self.executor.run(
+                compression.count_lines, self.abs_path, count_unterminated, STREAM_BLOCK_SIZE, fmt, cpu=True
+            )
+        return await self.executor.run(lines.count_lines, self.abs_path, count_unterminated, cpu=True)
+
+    async def grep(self, regex, max_count=None, invert=False, before=0, after=0, flags=0, decompress=True) -> list:
+        """
+        Search the whole file on the executor (the process pool, if configured).
+        A compressed file is searched as it is decompressed, as File does.
+
+        :return: List of search.GrepMatch
+        """
+        compiled = search.compile_pattern(regex, flags)
+        fmt = await self.executor.run(self._compression, decompress)
+        return await self.executor.run(
+            _grep_path, self.abs_path, compiled.pattern, compiled.flags, max_count, invert, before, after, fmt, cpu=True
+        )
+
+    def grep_iter(self, regex, max_count=None, invert=False, before=0, after=0, flags=0, decompress=True):
+        """
+        Stream grep matches with async for. Matches are produced on a worker thread and
+        handed to the event loop in batches.
+
+        :return: Async generator of search.GrepMatch
+        """
+        compiled = search.compile_pattern(regex, flags)
+        return _Batches(
+            lambda: self.file.grep_iter(compiled, max_count, invert, before, after, decompress=decompress)
+        ).drain(self.executor)
+
+    def lines(self, encoding="utf-8"):
+        """
+        Stream the lines of the file with async for, reading them in batches on a worker thread.
+
+        :param encoding: Text encoding of the file.
+        :return: Async generator of str lines including their terminators.
+        """
+        def opener():
+            fmt = self._compression(True)
+            if fmt is not None:
+                return io.TextIOWrapper(compression.open_decompressed(self.abs_path, "rb", fmt), encoding=encoding)
+            return open(self.abs_path, "r", encoding=encoding)
+
+        return _Batches(opener).drain(self.executor)
+
+    async def follow(self, offset=None, min_interval=0.1, max_interval=1.0, timeout=None):
+        """
+        Async variant of File.follow: yields complete lines as they are appended to the file,
+        reading on the executor and sleeping on the event loop between polls.
+
+        :param offset: Byte offset to start from. None starts at the current end of the file.
+        :param min_interval: Shortest delay between polls in seconds.
+        :param max_interval: Longest delay between polls in seconds.
+        :param timeout: Stop after this many seconds without new lines. None follows forever.
+        :return: Async generator of lines including their line terminators.
+        """
+        await self.flush()
+        follower = tail.Follower(self.abs_path, offset)
+        try:
+            interval = min_interval
+            idle_since = time.monotonic()
+            while True:
+                lines = await self.executor.run(follower.read)
+                if lines:
+                    for line in lines:
+                        yield line.decode("utf-8", errors="replace")
+                    interval = min_interval
+                    idle_since = time.monotonic()
+                    continue
+
+                if timeout is not None and time.monotonic() - idle_since >= timeout:
+                    return
+                await asyncio.sleep(interval)
+                interval = min(max_interval, interval * 2)
+        finally:
+            self.executor.submit(follower.close)
+
+    async def backup(self, directory="", repository=None, codec="deflate", level=None) -> str:
+        """
+        Create a backup of the file on the executor. See File.backup.
+
+        :return: Path of the backup archive or manifest.
+        """
+        return await self.executor.run(self.file.backup, directory, repository, codec, level)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+File: bulk.py
+Description: Parallel hashing of many files.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PyFile.config import BULK_MAX_BYTES_IN_FLIGHT
+from PyFile.file import File, HashType
+from PyFile import hashing
+
+
+HashResult = namedtuple("HashResult", ["path", "digests", "error"])
+
+
+def _hash_one(path: str, algorithms: list, hash_type: HashType, block_size: int or None) -> HashResult:
+    """
+    Hash a single file, capturing I/O errors in the result instead of raising.
+
+    :param path: Path of the file.
+    :param algorithms: List of algorithm names.
+    :param hash_type: String or bytes digests.
+    :param block_size: Number of bytes to read per block.
+    :return: HashResult
+    """
+    try:
+        digests = File(path, open_file=False).hashes(algorithms, hash_type, block_size)
+        return HashResult(path, digests, None)
+    except OSError as ex:
+        return HashResult(path, None, ex)
+
+
+def hash_many(
+    paths,
+    algorithms=("sha256",),
+    workers=None,
+    hash_type=HashType.STRING,
+    max_bytes_in_flight=BULK_MAX_BYTES_IN_FLIGHT,
+    block_size=None,
+):
+    """
+    Hash many files on a thread pool, yielding results as they finish.
+    hashlib releases the GIL while hashing large buffers, so threads hash in parallel.
+    Each file goes through File.hashes(), so the shared digest cache and the
+    persistent digest store are used when they are enabled.
+
+    At most `workers` files are hashed at once, and no new file is started while
+    the files in progress add up to more than `max_bytes_in_flight` bytes.
+    Errors are reported per file in HashResult.error and do not stop the batch.
+
+    :param paths: Iterable of file paths. It is consumed lazily.
+    :param algorithms: Iterable of hashlib algorithm names.
+    :param workers: Number of worker threads. Defaults to min(32, cpu_count + 4).
+    :param hash_type: String or bytes digests.
+    :param max_bytes_in_flight: Cap on the combined size of files being hashed.
+    :param block_size: Number of bytes to read per block. Defaults to HASH_BLOCK_SIZE.
+    :return: Generator of HashResult(path, digests, error) in completion order.
+    """
+    algorithms = list(hashing.new_hashers(algorithms))
+    paths = iter(paths)
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight: dict = {}
+        bytes_in_flight: int = 0
+        exhausted: bool = False
+
+        while True:
+            while not exhausted and len(in_flight) < workers:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                    break
+
+                try:
+                    size = os.stat(path).st_size
+                except OSError as ex:
+                    yield HashResult(path, None, ex)
+                    continue
+
+                future = executor.submit(_hash_one, path, algorithms, hash_type, block_size)
+                in_flight[future] = size
+                bytes_in_flight += size
+                if bytes_in_flight >= max_bytes_in_flight:
+                    break
+
+            if not in_flight:
+                if exhausted:
+                    return
+                continue
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                bytes_in_flight -= in_flight.pop(future)
+                yield future.result()
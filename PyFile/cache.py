@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""
+File: cache.py
+Description: Bounded process-wide digest cache shared by File instances.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+from collections import OrderedDict
+from PyFile.config import DIGEST_CACHE_MAX_ENTRIES
+
+
+class DigestCache(object):
+    """
+    Thread-safe LRU cache of file digests keyed by path, stat signature and algorithm.
+    The cache is bounded by an entry budget and, optionally, a byte budget.
+    """
+
+    __slots__ = [
+        "max_entries",
+        "max_bytes",
+        "hits",
+        "misses",
+        "_entries",
+        "_bytes",
+        "_lock",
+    ]
+
+    def __init__(self, max_entries=DIGEST_CACHE_MAX_ENTRIES, max_bytes=None):
+        self.max_entries: int or None = max_entries
+        self.max_bytes: int or None = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes: int = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(key: tuple, value: bytes) -> int:
+        """
+        Approximate number of bytes an entry accounts for in the byte budget.
+
+        :param key: Cache key.
+        :param value: Cached digest.
+        :return: Integer
+        """
+        return len(key[0]) + len(key[2]) + len(value)
+
+    def get(self, path: str, signature: tuple, algorithm: str) -> bytes or None:
+        """
+        Look up a digest, marking it as most recently used.
+
+        :param path: Absolute path of the file.
+        :param signature: Stat signature of the file the digest was computed from.
+        :param algorithm: Name of the hash algorithm.
+        :return: Raw digest bytes or None on a miss.
+        """
+        key = (path, signature, algorithm)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, path: str, signature: tuple, algorithm: str, value: bytes) -> None:
+        """
+        Store a digest, evicting least recently used entries to stay within budget.
+
+        :param path: Absolute path of the file.
+        :param signature: Stat signature of the file the digest was computed from.
+        :param algorithm: Name of the hash algorithm.
+        :param value: Raw digest bytes.
+        :return: No return value.
+        """
+        key = (path, signature, algorithm)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._cost(key, previous)
+            self._entries[key] = value
+            self._bytes += self._cost(key, value)
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Drop least recently used entries until the cache is within its budgets.
+        Must be called with the lock held.
+
+        :return: No return value.
+        """
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key, value = self._entries.popitem(last=False)
+            self._bytes -= self._cost(key, value)
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the hit/miss counters.
+
+        :return: No return value.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the cache counters.
+
+        :return: Dictionary with hits, misses, entries and bytes.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+_shared_cache: DigestCache or None = None
+
+
+def enable_shared_cache(max_entries=DIGEST_CACHE_MAX_ENTRIES, max_bytes=None) -> DigestCache:
+    """
+    Enable the process-wide digest cache consulted by every File instance.
+
+    :param max_entries: Maximum number of cached digests, or None for no entry limit.
+    :param max_bytes: Maximum approximate size of the cache in bytes, or None for no byte limit.
+    :return: The shared DigestCache.
+    """
+    global _shared_cache
+    _shared_cache = DigestCache(max_entries, max_bytes)
+    return _shared_cache
+
+
+def disable_shared_cache() -> None:
+    """
+    Disable and drop the process-wide digest cache.
+
+    :return: No return value.
+    """
+    global _shared_cache
+    _shared_cache = None
+
+
+def shared_cache() -> DigestCache or None:
+    """
+    Return the process-wide digest cache if it has been enabled.
+
+    :return: DigestCache or None
+    """
+    return _shared_cache
+
+
+_digest_store = None
+
+
+def set_digest_store(store) -> None:
+    """
+    Register a persistent digest store (see PyFile.digest_store) consulted by every
+    File instance after the in-memory caches. Pass None to disable it.
+
+    :param store: DigestStore, XattrDigestStore or None.
+    :return: No return value.
+    """
+    global _digest_store
+    _digest_store = store
+
+
+def digest_store():
+    """
+    Return the registered persistent digest store, if any.
+
+    :return: Digest store or None.
+    """
+    return _digest_store
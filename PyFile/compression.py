@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+File: compression.py
+Description: Detection of compressed files by magic bytes and streaming access to their contents.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+import bz2
+import gzip
+import lzma
+from PyFile.config import STREAM_BLOCK_SIZE
+from PyFile import hashing
+
+# Leading bytes of each supported format, and the opener for its decompressed stream. A bz2
+# stream is "BZh", the block size digit, then the magic of its first block or of its end.
+FORMATS = (
+    ("gzip", re.compile(b"\x1f\x8b"), gzip.open),
+    ("bz2", re.compile(b"BZh[1-9](?:1AY&SY|\x17rE8P\x90)"), bz2.open),
+    ("xz", re.compile(b"\xfd7zXZ\x00"), lzma.open),
+)
+_MAGIC_SIZE = 10
+
+# Raised by the decompressing readers on data that is not in their format.
+DECOMPRESSION_ERRORS = (OSError, EOFError, lzma.LZMAError)
+
+
+def detect(path: str) -> str or None:
+    """
+    Identify a compressed file by its leading magic bytes, whatever its extension. A file
+    whose magic matches but whose first byte cannot be decompressed is not compressed as
+    far as the rest of the module is concerned, so it is read as raw bytes.
+
+    :param path: Path of the file.
+    :return: "gzip", "bz2", "xz", or None for a file in none of these formats.
+    """
+    with open(path, "rb") as file_obj:
+        head = file_obj.read(_MAGIC_SIZE)
+    for name, magic, opener in FORMATS:
+        if magic.match(head):
+            try:
+                with opener(path, "rb") as stream:
+                    stream.read(1)
+            except DECOMPRESSION_ERRORS:
+                return None
+            return name
+    return None
+
+
+def open_decompressed(path: str, mode="rb", compression=None):
+    """
+    Open a stream over the decompressed contents of a file. Files that are not compressed
+    are opened as they are, so the stream always yields the logical contents.
+
+    :param path: Path of the file.
+    :param mode: "rb", or a text mode such as "r" or "rt".
+    :param compression: Format as returned by detect(). Detected when omitted.
+    :return: File object
+    """
+    if mode not in ("r", "rb", "rt"):
+        raise ValueError(f"Compressed files can only be opened for reading, not '{mode}'")
+    if compression is None:
+        compression = detect(path)
+    if compression is None:
+        return open(path, mode)
+
+    opener = next(opener for name, _, opener in FORMATS if name == compression)
+    return opener(path, "rt" if mode == "r" else mode)
+
+
+def iter_blocks(path: str, block_size=STREAM_BLOCK_SIZE, compression=None):
+    """
+    Iterate over the decompressed contents of a file as memoryview blocks, decompressed
+    into a single reused buffer. Each block is only valid until the next one is requested.
+
+    :param path: Path of the file.
+    :param block_size: Number of bytes per block.
+    :param compression: Format as returned by detect(). Detected when omitted.
+    :return: Generator of memoryview
+    """
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    try:
+        with open_decompressed(path, "rb", compression) as file_obj:
+            n = file_obj.readinto(buf)
+            while n:
+                yield view if n == block_size else view[:n]
+                n = file_obj.readinto(buf)
+    finally:
+        view.release()
+
+
+def count_lines(path: str, count_unterminated=True, block_size=STREAM_BLOCK_SIZE, compression=None) -> int:
+    """
+    Count the lines of the decompressed contents of a file without holding them in memory.
+
+    :param path: Path of the file.
+    :param count_unterminated: Whether a final line without a trailing newline counts as a line.
+    :param block_size: Number of bytes decompressed per block.
+    :param compression: Format as returned by detect(). Detected when omitted.
+    :return: Integer
+    """
+    buf = bytearray(block_size)
+    count: int = 0
+    last: int = 0x0A
+    with open_decompressed(path, "rb", compression) as file_obj:
+        n = file_obj.readinto(buf)
+        while n:
+            count += buf.count(b"\n", 0, n)
+            last = buf[n - 1]
+            n = file_obj.readinto(buf)
+    if count_unterminated and last != 0x0A:
+        count += 1
+    return count
+
+
+def hash_path(path: str, algorithms, block_size=STREAM_BLOCK_SIZE, compression=None) -> tuple:
+    """
+    Hash the decompressed contents of a file with several algorithms in a single pass.
+
+    :param path: Path of the file.
+    :param algorithms: Iterable of hashlib algorithm names.
+    :param block_size: Number of bytes decompressed per block.
+    :param compression: Format as returned by detect(). Detected when omitted.
+    :return: Tuple of (dictionary mapping each algorithm name to its finished hash object,
+             number of decompressed bytes hashed).
+    """
+    hashers = hashing.new_hashers(algorithms)
+    with open_decompressed(path, "rb", compression) as file_obj:
+        total = hashing.update_from_fileobj(hashers, file_obj, block_size)
+    return hashers, total
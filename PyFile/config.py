@@ -28,4 +28,60 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-HASH_BLOCK_SIZE = 65535
\ No newline at end of file
+HASH_BLOCK_SIZE = 65535
+# Default entry budget for the optional process-wide digest cache.
+DIGEST_CACHE_MAX_ENTRIES = 65536
+
+# Default cap on the total size of files being hashed concurrently by hash_many().
+BULK_MAX_BYTES_IN_FLIGHT = 1 << 30
+
+# Number of bytes read per block when counting lines.
+LINE_COUNT_BLOCK_SIZE = 1 << 20
+
+# Number of lines between the offsets recorded by a sparse line index.
+LINE_INDEX_STEP = 1024
+
+# File name patterns classified as temporary files when walking directories.
+TEMPORARY_PATTERNS = ("*~", "*.tmp", "*.temp", "*.swp", "#*#")
+
+# Content-defined chunk size bounds used by backup repositories.
+CHUNK_MIN_SIZE = 16 * 1024
+CHUNK_AVG_SIZE = 64 * 1024
+CHUNK_MAX_SIZE = 256 * 1024
+
+# Block size used for rsync-style signatures and deltas.
+DELTA_BLOCK_SIZE = 4096
+
+# Files at least this large are read through a memory map instead of a reused buffer.
+MMAP_MIN_SIZE = 1 << 20
+
+# Maximum number of bytes handed to the kernel per copy_file_range/sendfile call.
+COPY_BLOCK_SIZE = 1 << 30
+
+# Bytes buffered by a writer.Writer before they are handed to the kernel in one writev call.
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Default number of bytes written between fsyncs under the periodic durability policy.
+WRITE_SYNC_BYTES = 64 * 1024 * 1024
+
+# Number of bytes read per block when tailing or following a file.
+TAIL_BLOCK_SIZE = 1 << 16
+
+# Bytes hashed from each end of a file when screening duplicate candidates.
+DUPLICATE_PARTIAL_SIZE = 16 * 1024
+
+# Size of the blocks hashed into the leaves of a Merkle tree.
+MERKLE_BLOCK_SIZE = 64 * 1024
+
+# Bytes of a file scanned at a time when extracting its trigrams for a trigram index.
+TRIGRAM_CHUNK_SIZE = 1 << 20
+
+# Bytes read per block when searching a file for many patterns in one pass.
+MULTI_GREP_BLOCK_SIZE = 1 << 20
+
+# Bytes read per block when searching, counting or hashing a stream such as a decompressed file.
+STREAM_BLOCK_SIZE = 1 << 20
+
+# Bytes AsyncFile hashes per executor call, so cancellation is checked between spans
+# rather than paying an executor round trip for every block.
+ASYNC_HASH_SPAN = 16 * 1024 * 1024
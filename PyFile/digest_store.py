@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""
+File: digest_store.py
+Description: Persistent digest stores so unchanged files are not rehashed across restarts.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sqlite3
+import struct
+import threading
+
+
+class DigestStore(object):
+    """
+    SQLite backed digest store. Digests are keyed by path and algorithm and are only
+    returned when the stored stat signature still matches the file on disk.
+    The database runs in WAL mode so several processes can read while one writes.
+    """
+
+    __slots__ = ["path", "batch_size", "_conn", "_pending", "_lock"]
+
+    def __init__(self, path: str, batch_size=1000):
+        self.path: str = path
+        self.batch_size: int = batch_size
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            "path TEXT NOT NULL, "
+            "algorithm TEXT NOT NULL, "
+            "dev INTEGER NOT NULL, "
+            "ino INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, "
+            "digest BLOB NOT NULL, "
+            "PRIMARY KEY (path, algorithm))"
+        )
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, path: str, signature: tuple, algorithm: str) -> bytes or None:
+        """
+        Look up the digest of a file.
+
+        :param path: Absolute path of the file.
+        :param signature: Current (st_dev, st_ino, st_size, st_mtime_ns) of the file.
+        :param algorithm: Name of the hash algorithm.
+        :return: Raw digest bytes, or None if missing or the file has changed.
+        """
+        with self._lock:
+            pending = self._pending.get((path, algorithm))
+            if pending is not None:
+                return pending[1] if pending[0] == tuple(signature) else None
+
+            row = self._conn.execute(
+                "SELECT dev, ino, size, mtime_ns, digest FROM digests "
+                "WHERE path = ? AND algorithm = ?",
+                (path, algorithm),
+            ).fetchone()
+
+        if row is None or tuple(row[:4]) != tuple(signature):
+            return None
+        return bytes(row[4])
+
+    def put(self, path: str, signature: tuple, algorithm: str, digest: bytes) -> None:
+        """
+        Queue a digest for storage. Queued digests are written in a single
+        transaction once batch_size of them have accumulated.
+
+        :param path: Absolute path of the file.
+        :param signature: (st_dev, st_ino, st_size, st_mtime_ns) the digest was computed from.
+        :param algorithm: Name of the hash algorithm.
+        :param digest: Raw digest bytes.
+        :return: No return value.
+        """
+        with self._lock:
+            self._pending[(path, algorithm)] = (tuple(signature), digest)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        Write all queued digests to the database.
+
+        :return: No return value.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """
+        Write all queued digests. Must be called with the lock held.
+
+        :return: No return value.
+        """
+        if not self._pending:
+            return
+        rows = [
+            (path, algorithm) + signature + (digest,)
+            for (path, algorithm), (signature, digest) in self._pending.items()
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO digests "
+                "(path, algorithm, dev, ino, size, mtime_ns, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._pending.clear()
+
+    def prune(self) -> int:
+        """
+        Remove entries for paths that no longer exist.
+
+        :return: Number of paths removed.
+        """
+        with self._lock:
+            self._flush()
+            paths = [row[0] for row in self._conn.execute("SELECT DISTINCT path FROM digests")]
+            deleted = [(path,) for path in paths if not os.path.isfile(path)]
+            with self._conn:
+                self._conn.executemany("DELETE FROM digests WHERE path = ?", deleted)
+        return len(deleted)
+
+    def close(self) -> None:
+        """
+        Flush queued digests and close the database.
+
+        :return: No return value.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._flush()
+                self._conn.close()
+                self._conn = None
+
+
+class XattrDigestStore(object):
+    """
+    Digest store that keeps each digest in a user extended attribute on the file itself.
+    Only available on platforms and filesystems that support user xattrs.
+    """
+
+    __slots__ = ["prefix"]
+
+    _SIGNATURE = struct.Struct("<QQQq")
+
+    def __init__(self, prefix="user.pyfile."):
+        if not hasattr(os, "setxattr"):
+            raise OSError("Extended attributes are not supported on this platform")
+        self.prefix: str = prefix
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, path: str, signature: tuple, algorithm: str) -> bytes or None:
+        """
+        Look up the digest of a file.
+
+        :param path: Absolute path of the file.
+        :param signature: Current (st_dev, st_ino, st_size, st_mtime_ns) of the file.
+        :param algorithm: Name of the hash algorithm.
+        :return: Raw digest bytes, or None if missing or the file has changed.
+        """
+        try:
+            value = os.getxattr(path, self.prefix + algorithm)
+        except OSError:
+            return None
+
+        size = self._SIGNATURE.size
+        if len(value) <= size or self._SIGNATURE.unpack(value[:size]) != tuple(signature):
+            return None
+        return value[size:]
+
+    def put(self, path: str, signature: tuple, algorithm: str, digest: bytes) -> None:
+        """
+        Store a digest on the file. Failures (read-only files, unsupported
+        filesystems) are ignored since the store is only an optimization.
+
+        :param path: Absolute path of the file.
+        :param signature: (st_dev, st_ino, st_size, st_mtime_ns) the digest was computed from.
+        :param algorithm: Name of the hash algorithm.
+        :param digest: Raw digest bytes.
+        :return: No return value.
+        """
+        try:
+            os.setxattr(path, self.prefix + algorithm, self._SIGNATURE.pack(*signature) + digest)
+        except OSError:
+            pass
+
+    def flush(self) -> None:
+        """
+        Digests are written immediately, so there is nothing to flush.
+
+        :return: No return value.
+        """
+
+    def prune(self) -> int:
+        """
+        Attributes are removed together with their files, so there is nothing to prune.
+
+        :return: Always 0.
+        """
+        return 0
+
+    def close(self) -> None:
+        """
+        Nothing to release.
+
+        :return: No return value.
+        """
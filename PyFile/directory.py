@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+File: directory.py
+Description: Lazy, filtered directory walking that yields File objects.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import fnmatch
+from PyFile.config import TEMPORARY_PATTERNS
+from PyFile.file import File, FileClass
+
+
+def classify(name: str) -> FileClass:
+    """
+    Classify a file name as hidden and/or temporary.
+
+    :param name: Base name of the file.
+    :return: FileClass
+    """
+    temporary = any(fnmatch.fnmatchcase(name, pattern) for pattern in TEMPORARY_PATTERNS)
+    if name.startswith("."):
+        return FileClass.HIDDEN_TEMP if temporary else FileClass.HIDDEN
+    return FileClass.TEMPORARY if temporary else FileClass.NORMAL
+
+
+class Directory(object):
+    """
+    A set of files under a directory tree. The tree is walked lazily with os.scandir,
+    filters are applied to the cached DirEntry data before any File is built, and only
+    one directory is open at a time, so memory stays bounded on very large trees.
+
+    Hidden/temporary classification is used for filtering only; Files are never
+    constructed as temporary, since temporary Files delete themselves when destroyed.
+    """
+
+    __slots__ = [
+        "root",
+        "recursive",
+        "follow_symlinks",
+        "extensions",
+        "min_size",
+        "max_size",
+        "modified_after",
+        "modified_before",
+        "file_classes",
+        "exclude_dirs",
+    ]
+
+    def __init__(
+        self,
+        root: str,
+        recursive=True,
+        extensions=None,
+        min_size=None,
+        max_size=None,
+        modified_after=None,
+        modified_before=None,
+        file_classes=None,
+        exclude_dirs=(),
+        follow_symlinks=False,
+    ):
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        if isinstance(file_classes, FileClass):
+            file_classes = [file_classes]
+        if isinstance(exclude_dirs, str):
+            exclude_dirs = [exclude_dirs]
+
+        self.root: str = root
+        self.recursive: bool = recursive
+        self.follow_symlinks: bool = follow_symlinks
+        self.extensions: frozenset or None = (
+            None if extensions is None else frozenset(ext.lstrip(".").lower() for ext in extensions)
+        )
+        self.min_size: int or None = min_size
+        self.max_size: int or None = max_size
+        self.modified_after: float or None = modified_after
+        self.modified_before: float or None = modified_before
+        self.file_classes: frozenset or None = (
+            None if file_classes is None else frozenset(file_classes)
+        )
+        self.exclude_dirs: tuple = tuple(exclude_dirs)
+
+    def filter(self, **kwargs):
+        """
+        Returns a new Directory with some of the filters replaced.
+
+        :param kwargs: Any of the constructor's keyword arguments.
+        :return: Directory
+        """
+        arguments = {
+            "recursive": self.recursive,
+            "extensions": self.extensions,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "modified_after": self.modified_after,
+            "modified_before": self.modified_before,
+            "file_classes": self.file_classes,
+            "exclude_dirs": self.exclude_dirs,
+            "follow_symlinks": self.follow_symlinks,
+        }
+        arguments.update(kwargs)
+        return Directory(self.root, **arguments)
+
+    def _needs_stat(self) -> bool:
+        return (
+            self.min_size is not None
+            or self.max_size is not None
+            or self.modified_after is not None
+            or self.modified_before is not None
+        )
+
+    def _accept(self, entry: os.DirEntry, needs_stat: bool) -> bool:
+        """
+        Apply the filters to a directory entry, name based filters first so that
+        entries are only stated when a size or time filter is set.
+        """
+        name = entry.name
+        if self.extensions is not None:
+            ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+            if ext not in self.extensions:
+                return False
+
+        if self.file_classes is not None and classify(name) not in self.file_classes:
+            return False
+
+        if needs_stat:
+            stat = entry.stat(follow_symlinks=self.follow_symlinks)
+            if self.min_size is not None and stat.st_size < self.min_size:
+                return False
+            if self.max_size is not None and stat.st_size > self.max_size:
+                return False
+            if self.modified_after is not None and stat.st_mtime < self.modified_after:
+                return False
+            if self.modified_before is not None and stat.st_mtime > self.modified_before:
+                return False
+
+        return True
+
+    def entries(self):
+        """
+        Lazily walk the tree, yielding the os.DirEntry of every regular file that passes the filters.
+        Unreadable directories and entries that vanish during the walk are skipped. When
+        symlinks are followed, each directory is walked once, so symlink cycles terminate.
+
+        :return: Generator of os.DirEntry
+        """
+        needs_stat: bool = self._needs_stat()
+        follow_symlinks: bool = self.follow_symlinks
+        exclude_dirs: tuple = self.exclude_dirs
+        stack: list = [self.root]
+        # (st_dev, st_ino) of the directories walked so far, only needed when following symlinks.
+        visited: set or None = None
+        if follow_symlinks:
+            try:
+                stat = os.stat(self.root)
+            except OSError:
+                return
+            visited = {(stat.st_dev, stat.st_ino)}
+
+        while stack:
+            try:
+                iterator = os.scandir(stack.pop())
+            except OSError:
+                continue
+
+            with iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if self.recursive and not any(
+                                fnmatch.fnmatchcase(entry.name, pattern) for pattern in exclude_dirs
+                            ):
+                                if visited is not None:
+                                    stat = entry.stat()
+                                    key = (stat.st_dev, stat.st_ino)
+                                    if key in visited:
+                                        continue
+                                    visited.add(key)
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=follow_symlinks) and self._accept(entry, needs_stat):
+                            yield entry
+                    except OSError:
+                        continue
+
+    def paths(self):
+        """
+        Lazily yield the paths of the files that pass the filters.
+
+        :return: Generator of paths.
+        """
+        for entry in self.entries():
+            yield entry.path
+
+    def files(self, open_file=False, mode="r"):
+        """
+        Lazily yield a File for every file that passes the filters, built from the
+        DirEntry's cached stat data.
+
+        :param open_file: Open each file on first use.
+        :param mode: File access mode.
+        :return: Generator of File
+        """
+        for entry in self.entries():
+            try:
+                yield File.from_dir_entry(entry, open_file, mode)
+            except OSError:
+                continue
+
+    def __iter__(self):
+        return self.files()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+File: duplicates.py
+Description: Staged duplicate file detection: size, partial hash, then full hash.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import hashlib
+from collections import namedtuple, deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PyFile.config import DUPLICATE_PARTIAL_SIZE
+from PyFile.file import File
+from PyFile.directory import Directory
+
+
+DuplicateGroup = namedtuple("DuplicateGroup", ["size", "digest", "paths"])
+DuplicateGroup.__doc__ = """
+Files with identical contents. digest is the hex digest of the contents and paths lists
+every path, including hard links to the same file, which are listed next to each other.
+"""
+
+
+def _stat_paths(paths_or_tree, min_size: int):
+    """
+    Yield (path, stat_result) for every regular file of the input, reusing the cached stat
+    data of directory entries when a tree is walked.
+    """
+    if isinstance(paths_or_tree, str) and os.path.isdir(paths_or_tree):
+        paths_or_tree = Directory(paths_or_tree, min_size=min_size)
+    if isinstance(paths_or_tree, Directory):
+        for entry in paths_or_tree.entries():
+            try:
+                yield entry.path, entry.stat()
+            except OSError:
+                continue
+        return
+
+    if isinstance(paths_or_tree, (str, File)):
+        paths_or_tree = [paths_or_tree]
+    for item in paths_or_tree:
+        path = item.abs_path if isinstance(item, File) else item
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        yield path, stat
+
+
+def _partial_digest(path: str, size: int, algorithm: str, partial_size: int) -> tuple:
+    """
+    Hash the first and last partial_size bytes of a file.
+
+    :return: Tuple of (hex digest, whether the digest covers the whole file).
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as file_obj:
+        if size <= 2 * partial_size:
+            hasher.update(file_obj.read())
+            return hasher.hexdigest(), True
+        hasher.update(file_obj.read(partial_size))
+        file_obj.seek(size - partial_size)
+        hasher.update(file_obj.read(partial_size))
+    return hasher.hexdigest(), False
+
+
+def _full_digest(path: str, algorithm: str) -> str:
+    return File(path, open_file=False).hashes([algorithm])[algorithm]
+
+
+def find_duplicates(
+    paths_or_tree,
+    workers=None,
+    min_size=1,
+    algorithm="sha256",
+    partial_size=DUPLICATE_PARTIAL_SIZE,
+):
+    """
+    Find files with identical contents, reading as little as possible. Files are grouped
+    by size first; files sharing a size are compared by a hash of their first and last
+    partial_size bytes, and only files that still collide are hashed in full (through
+    File.hashes, so enabled digest caches are used). Files small enough for the partial
+    hash to cover them whole are never read twice.
+
+    Hard links to the same (st_dev, st_ino) are read once and reported together. Partial
+    and full hashes run on a thread pool, and each group is yielded as soon as all of its
+    candidates have been hashed. Files that vanish or cannot be read are skipped.
+
+    :param paths_or_tree: Directory path, directory.Directory, or iterable of paths or Files.
+    :param workers: Number of hashing threads. Defaults to min(32, cpu_count + 4).
+    :param min_size: Ignore files smaller than this many bytes. Empty files are skipped by default.
+    :param algorithm: hashlib algorithm for the partial and full hashes.
+    :param partial_size: Bytes hashed from each end of a file during screening.
+    :return: Generator of DuplicateGroup(size, digest, paths), each with at least two distinct files.
+    """
+    hashlib.new(algorithm)  # Fail early on an unsupported algorithm.
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+
+    # size -> {(st_dev, st_ino): [paths]}
+    by_size: defaultdict = defaultdict(dict)
+    for path, stat in _stat_paths(paths_or_tree, min_size):
+        if stat.st_size >= min_size:
+            by_size[stat.st_size].setdefault((stat.st_dev, stat.st_ino), []).append(path)
+
+    # Each candidate group (a size, or a size and partial digest) counts its outstanding
+    # hashes and collects finished ones by digest until it can be resolved.
+    remaining: dict = {}
+    collected: dict = {}
+
+    def screening():
+        for size, inodes in by_size.items():
+            if len(inodes) > 1:
+                remaining[size] = len(inodes)
+                collected[size] = defaultdict(list)
+                for inode in inodes:
+                    yield _partial_digest, (inodes[inode][0], size, algorithm, partial_size), size, inode
+
+    def resolve(group):
+        """
+        Yield the duplicate groups of a finished candidate group, queueing full hashes for
+        the partial digests that still collide.
+        """
+        size = group if isinstance(group, int) else group[0]
+        for digest, members in collected.pop(group).items():
+            if len(members) < 2:
+                continue
+            if isinstance(group, int) and not all(complete for _, complete in members):
+                key = (size, digest)
+                remaining[key] = len(members)
+                collected[key] = defaultdict(list)
+                for inode, _ in members:
+                    full_hashes.append((_full_digest, (by_size[size][inode][0], algorithm), key, inode))
+                continue
+            paths = [path for inode, _ in members for path in by_size[size][inode]]
+            yield DuplicateGroup(size, digest, paths)
+        del remaining[group]
+
+    tasks = screening()
+    full_hashes: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight: dict = {}
+        while True:
+            # Full hashes go first so that groups complete, and are yielded, early.
+            while len(in_flight) < 2 * workers:
+                task = full_hashes.popleft() if full_hashes else next(tasks, None)
+                if task is None:
+                    break
+                func, args, group, inode = task
+                in_flight[executor.submit(func, *args)] = (group, inode)
+
+            if not in_flight:
+                return
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                group, inode = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except OSError:
+                    result = None
+                if result is not None:
+                    digest, complete = result if isinstance(group, int) else (result, True)
+                    collected[group][digest].append((inode, complete))
+                remaining[group] -= 1
+                if not remaining[group]:
+                    yield from resolve(group)
@@ -30,14 +30,29 @@ SOFTWARE.
 
 
 import os
+import stat
 import pathlib
-from functools import lru_cache
 from enum import Enum
-from hashlib import sha256, md5
-import zipfile
-import re
-from PyFile.config import HASH_BLOCK_SIZE
+from collections import deque
+from itertools import islice
+from contextlib import contextmanager
+from PyFile.config import HASH_BLOCK_SIZE, LINE_INDEX_STEP, DELTA_BLOCK_SIZE, WRITE_BUFFER_SIZE, WRITE_SYNC_BYTES
+from PyFile.config import TAIL_BLOCK_SIZE, MERKLE_BLOCK_SIZE
 from PyFile import utilities
+from PyFile import hashing
+from PyFile import cache
+from PyFile import search
+from PyFile import lines
+from PyFile import archive
+from PyFile import delta
+from PyFile import transfer
+from PyFile import writer
+from PyFile import tail
+from PyFile import merkle
+from PyFile import multigrep
+from PyFile import compression
+from PyFile import instrumentation
+from PyFile.instrumentation import instrumented
 
 
 FILE_MODES: set = {
@@ -69,6 +84,7 @@ class FileClass(Enum):
     NORMAL = 3
 
 
+@instrumentation.register
 class File(object):
     __slots__ = [
         "_path",
@@ -76,50 +92,96 @@ class File(object):
         "_path_obj",
         "cached_stamp",
         "_file_io_obj",
+        "_open_pending",
         "exists",
-        "is_open",
         "file_class",
         "deleted",
         "backup_file",
         "_stat",
+        "_abs_path",
+        "_cache",
+        "_cache_key",
+        "_line_index",
+        "_dirty",
+        "_merkle",
     ]
 
-    def __init__(self, path: str, open_file=True, mode="r", temporary=False):
+    def __init__(self, path: str, open_file=True, mode="r", temporary=False, stat_result=None):
         self._path: str = path
         self._mode: str = mode
         self._path_obj: pathlib.Path or None = None
         self.cached_stamp: float = -1
         self._file_io_obj = None
+        self._open_pending: bool = False
         self.exists: bool = True
-        self.is_open: bool = False
         self.file_class: FileClass or None = None
         self.deleted: bool = False
         self.backup_file: str or None = None
         self._stat = None
+        self._abs_path: str or None = None
+        self._cache: dict = {}
+        self._cache_key: tuple or None = None
+        self._line_index: lines.LineIndex or None = None
+        self._dirty: bool = False
+        self._merkle: merkle.MerkleTree or None = None
+
+        if stat_result is None:
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                if mode in CREATE_MODES:
+                    # Opening in a create mode makes the file; keep the handle if it was wanted.
+                    self.open(mode)
+                    stat_result = os.fstat(self._file_io_obj.fileno())
+                    if not open_file:
+                        self.close()
+
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            self.exists = False
+            return
+
+        self._stat = stat_result
+        self.cached_stamp = stat_result.st_mtime
+
+        if open_file and not self.is_open:
+            if mode.startswith("w"):
+                # Truncating modes must take effect now, not on first use.
+                self.open(mode)
+            else:
+                self._open_pending = True
 
-        if not os.path.exists(path) and mode in CREATE_MODES:
-            open(path, mode).close()
-
-        if os.path.exists(path) and os.path.isfile(path):
-            self._path_obj: pathlib.Path = pathlib.Path(path)
-            self._stat = os.stat(self.abs_path)
+        if os.path.basename(path).startswith("."):
+            self.file_class = FileClass.HIDDEN_TEMP if temporary else FileClass.HIDDEN
+        else:
+            self.file_class = FileClass.TEMPORARY if temporary else FileClass.NORMAL
 
-            if open_file:
-                self.open(mode)
+    @classmethod
+    def from_dir_entry(cls, entry: os.DirEntry, open_file=False, mode="r", temporary=False):
+        """
+        Creates a File from an os.DirEntry (as yielded by os.scandir), reusing the
+        entry's cached stat data instead of stating the file again.
+
+        :param entry: Directory entry for the file.
+        :param open_file: Open the file on first use.
+        :param mode: File access mode.
+        :param temporary: Delete the file when the File object is destroyed.
+        :return: File
+        """
+        return cls(entry.path, open_file, mode, temporary, entry.stat())
 
-            if self.basename[0].startswith("."):
-                if temporary:
-                    self.file_class = FileClass.HIDDEN_TEMP
-                else:
-                    self.file_class = FileClass.HIDDEN
-            elif not self.basename[0].startswith("."):
-                if temporary:
-                    self.file_class = FileClass.TEMPORARY
-                else:
-                    self.file_class = FileClass.NORMAL
-
-        self.cached_stamp: float = os.stat(self.abs_path).st_mtime
-        self.exists: bool = True
+    @classmethod
+    def from_stat(cls, path: str, stat_result: os.stat_result, open_file=False, mode="r", temporary=False):
+        """
+        Creates a File from a path and an existing os.stat_result without any further syscalls.
+
+        :param path: Path of the file.
+        :param stat_result: Result of os.stat for the file.
+        :param open_file: Open the file on first use.
+        :param mode: File access mode.
+        :param temporary: Delete the file when the File object is destroyed.
+        :return: File
+        """
+        return cls(path, open_file, mode, temporary, stat_result)
 
     def __del__(self):
         """
@@ -135,17 +197,15 @@ class File(object):
             self.delete()
 
     @property
-    @lru_cache(maxsize=1)
     def basename(self) -> str:
         """
         Property returning the name of the file with the extension.
 
         :return: String containing the name of the file.
         """
-        return str(self._path_obj.name)
+        return os.path.basename(self._path)
 
     @property
-    @lru_cache(maxsize=1)
     def dirname(self) -> str:
         """
         Property returning the directory the file is located in.
@@ -155,7 +215,6 @@ class File(object):
         return self.abs_path[: -(len(self.basename) + 1)]
 
     @property
-    @lru_cache(maxsize=1)
     def filename(self) -> str:
         """
         Property returning the name of the file without the extension.
@@ -165,7 +224,6 @@ class File(object):
         return self.basename[: -(len(self.ext) + 1)]
 
     @property
-    @lru_cache(maxsize=1)
     def ext(self) -> str:
         """
         Property returning the extension of the file
@@ -197,44 +255,53 @@ class File(object):
             raise Exception(f"Invalid file access mode: '{value}'")
 
     @property
-    @lru_cache(maxsize=1)
     def owner(self) -> str:
         """
         Property returning the owner of the file.
 
         :return: string
         """
-        return self._path_obj.owner()
+        return self.path_obj.owner()
 
     @property
-    @lru_cache(maxsize=1)
     def group(self) -> str:
         """
         Property returning the group the file belongs to.
 
         :return: string
         """
-        return self._path_obj.group()
+        return self.path_obj.group()
+
+    @property
+    def path_obj(self) -> pathlib.Path:
+        """
+        Property returning a pathlib.Path for the file, created on first use.
+
+        :return: pathlib.Path
+        """
+        if self._path_obj is None:
+            self._path_obj = pathlib.Path(self._path)
+        return self._path_obj
 
     @property
-    @lru_cache(maxsize=1)
     def abs_path(self) -> str:
         """
         Property returning the absolute path of the file.
 
         :return:
         """
-        return str(self._path_obj.absolute())
+        if self._abs_path is None:
+            self._abs_path = os.path.abspath(self._path)
+        return self._abs_path
 
     @property
-    @lru_cache(maxsize=1)
     def relative_path(self) -> str:
         """
         Property returning the path of the file relative to the current directory.
 
         :return: String containing the relative path
         """
-        return str(self._path_obj.relative_to("./"))
+        return str(self.path_obj.relative_to("./"))
 
     @property
     def last_modified(self) -> float:
@@ -243,7 +310,7 @@ class File(object):
 
         :return: Float
         """
-        return self._stat.st_mtime
+        return self._get_stat().st_mtime
 
     @property
     def size(self) -> int:
@@ -252,34 +319,261 @@ class File(object):
 
         :return: Integer
         """
-        return self._stat.st_size
+        return self._get_stat().st_size
+
+    @property
+    def compression(self) -> str or None:
+        """
+        Property returning the compression format of the file, identified by its magic bytes
+        rather than its extension. The result is cached against the file's stat signature.
+
+        :return: "gzip", "bz2", "xz", or None if the file is not compressed.
+        """
+        fmt = self._cache_get("compression")
+        if fmt is None:
+            self.flush()
+            fmt = compression.detect(self.abs_path) or ""
+            self._cache["compression"] = fmt
+        return fmt or None
+
+    def _decompresses(self, decompress: bool) -> bool:
+        """
+        Whether an operation asked to decompress will actually read decompressed contents.
+        """
+        return decompress and self.exists and self.compression is not None
+
+    def decompressed(self, mode="rb"):
+        """
+        Open a read-only stream over the decompressed contents of the file. A file that is not
+        compressed is opened as it is.
+
+        :param mode: "rb", or a text mode such as "r".
+        :return: File object
+        """
+        self.flush()
+        if self.compression is None:
+            return open(self.abs_path, mode)
+        return compression.open_decompressed(self.abs_path, mode, self.compression)
 
     @property
     def modified(self) -> bool:
         """
         Property returning a boolean indicating whether the file has been modified.
+        The file's stat is refreshed by write, truncate, touch, refresh and by a watcher.Watcher.
 
         :return: Boolean indicating whether the file has been modified.
         """
-        return self.cached_stamp < self._stat.st_mtime
+        return self.cached_stamp < self._get_stat().st_mtime
 
     @property
+    @instrumented("line_cnt")
     def line_cnt(self) -> int:
         """
         Property returning the line count of the file.
 
         :return: Integer
         """
-        return self._line_cnt(self._stat.st_mtime)
+        return self.count_lines()
 
-    @lru_cache(maxsize=1)
-    def _line_cnt(self, m_time) -> int:
+    @instrumented("count_lines")
+    def count_lines(self, count_unterminated=True, workers=1, decompress=True) -> int:
         """
-        Helper function to allow the line_cnt property to use LRU caching.
-        :param m_time:
-        :return:
+        Count the lines in the file by counting newline bytes over large binary blocks.
+        The lines of a compressed file are counted in its decompressed stream.
+        The result is cached against the file's stat signature.
+
+        :param count_unterminated: Whether a final line without a trailing newline counts as a line.
+        :param workers: Number of processes to split large files across.
+        :param decompress: Count the decompressed lines of a compressed file rather than its raw bytes.
+        :return: Integer
+        """
+        decompress = self._decompresses(decompress)
+        key = ("line_cnt", count_unterminated, decompress)
+        line_cnt = self._cache_get(key)
+        if line_cnt is None and decompress:
+            line_cnt = compression.count_lines(self.abs_path, count_unterminated, compression=self.compression)
+            self._cache[key] = line_cnt
+            instrumentation.count(bytes_read=self._cache_key[2], cache_misses=1)
+        elif line_cnt is None:
+            line_cnt = lines.count_lines(self.abs_path, count_unterminated, workers)
+            self._cache[key] = line_cnt
+            instrumentation.count(bytes_read=self._cache_key[2], cache_misses=1)
+        else:
+            instrumentation.count(cache_hits=1)
+        return line_cnt
+
+    def line_index(self, step=LINE_INDEX_STEP, persist=False) -> lines.LineIndex:
         """
-        return len(self.readlines())
+        Returns a sparse line offset index for the file, building it on first use.
+        The index is extended incrementally if the file has only been appended to.
+        Compressed files cannot be indexed, since their lines cannot be seeked to.
+
+        :param step: Number of lines between recorded offsets.
+        :param persist: Load and save the index in a hidden sidecar file next to the file.
+        :return: LineIndex
+        """
+        if self._decompresses(True):
+            raise ValueError(f"Cannot index the lines of compressed file '{self.abs_path}'")
+        self.flush()
+        index: lines.LineIndex or None = self._line_index
+        sidecar: str = os.path.join(self.dirname, f".{self.basename}.lidx")
+
+        if index is None or index.step != step:
+            index = lines.LineIndex.load(sidecar) if persist else None
+            if index is None or index.step != step:
+                index = lines.LineIndex(step)
+            self._line_index = index
+
+        if index.refresh(self.abs_path) and persist:
+            index.save(sidecar)
+        return index
+
+    def merkle(self, block_size=MERKLE_BLOCK_SIZE, algorithm="sha256", persist=False) -> merkle.MerkleTree:
+        """
+        Returns a Merkle tree of the file's block digests, building it on first use. Later
+        calls only rehash the blocks written through write(), writelines() and truncate()
+        and the blocks appended since, so append-only files are never reread.
+
+        :param block_size: Size of each block.
+        :param algorithm: hashlib algorithm name.
+        :param persist: Load and save the tree in a hidden sidecar file next to the file.
+        :return: merkle.MerkleTree
+        """
+        self.flush()
+        tree: merkle.MerkleTree or None = self._merkle
+        sidecar: str = os.path.join(self.dirname, f".{self.basename}.mrkl")
+
+        # A tree already in memory may be newer than the sidecar, so it is always saved.
+        save: bool = persist
+        if tree is None or tree.block_size != block_size or tree.algorithm != algorithm:
+            tree = merkle.MerkleTree.load(sidecar) if persist else None
+            if tree is None or tree.block_size != block_size or tree.algorithm != algorithm:
+                tree = merkle.MerkleTree(block_size, algorithm)
+            else:
+                save = False
+            self._merkle = tree
+
+        if tree.refresh(self.abs_path) or save:
+            if persist:
+                tree.save(sidecar)
+        return tree
+
+    def merkle_root(self, hash_type=HashType.STRING) -> str or bytes:
+        """
+        Returns the root digest of the file's Merkle tree, brought up to date. The tree from
+        the last merkle() call is used with its settings, or a default one is built.
+
+        :param hash_type: String or bytes return type.
+        :return: Hex string or raw bytes.
+        """
+        tree: merkle.MerkleTree or None = self._merkle
+        if tree is None:
+            tree = self.merkle()
+        else:
+            self.flush()
+            tree.refresh(self.abs_path)
+        return self._format_digest(tree.root, hash_type)
+
+    def verify_range(self, start: int, end: int) -> bool:
+        """
+        Checks bytes [start, end) of the file against the recorded Merkle tree, reading only
+        the blocks that overlap the range. The tree is the one in memory, or else the
+        persisted sidecar; writes made through this File are trusted and rehashed first.
+
+        :param start: First byte of the range.
+        :param end: Byte one past the last byte of the range.
+        :return: Boolean indicating whether the range matches the recorded digests.
+        """
+        self.flush()
+        tree: merkle.MerkleTree or None = self._merkle
+        if tree is None:
+            tree = merkle.MerkleTree.load(os.path.join(self.dirname, f".{self.basename}.mrkl"))
+            if tree is None:
+                raise ValueError(f"No Merkle tree recorded for '{self.abs_path}'")
+            self._merkle = tree
+        elif tree.dirty:
+            tree.refresh(self.abs_path)
+        return tree.verify_range(self.abs_path, start, end)
+
+    def line(self, n: int, decompress=True) -> str:
+        """
+        Returns line n (0-based) of the file, seeking directly to it through the line index.
+        The decompressed lines of a compressed file are streamed up to line n instead.
+
+        :param n: Line number. Negative numbers count from the end of the file.
+        :param decompress: Read the decompressed lines of a compressed file.
+        :return: String containing the line, including its line terminator.
+        """
+        if self._decompresses(decompress):
+            if n < 0:
+                n += self.count_lines()
+            found = self.lines(n, n + 1) if n >= 0 else []
+            if not found:
+                raise IndexError(f"Line {n} is out of range")
+            return found[0]
+
+        index: lines.LineIndex = self.line_index()
+        if n < 0:
+            n += len(index)
+        index.locate(n)
+        return index.read_lines(self.abs_path, n, n + 1)[0].decode("utf-8", errors="replace")
+
+    def lines(self, start=0, stop=None, decompress=True) -> list:
+        """
+        Returns lines [start, stop) of the file, seeking directly to the first one
+        through the line index. The decompressed lines of a compressed file are streamed.
+
+        :param start: 0-based first line.
+        :param stop: 0-based line one past the last line. Defaults to the end of the file.
+        :param decompress: Read the decompressed lines of a compressed file.
+        :return: List of strings including their line terminators.
+        """
+        if self._decompresses(decompress):
+            with self.decompressed() as stream:
+                return [line.decode("utf-8", errors="replace") for line in islice(stream, start, stop)]
+
+        index: lines.LineIndex = self.line_index()
+        if stop is None:
+            stop = len(index)
+        return [
+            line.decode("utf-8", errors="replace")
+            for line in index.read_lines(self.abs_path, start, stop)
+        ]
+
+    def tail(self, n=10, decompress=True) -> list:
+        """
+        Returns the last n lines of the file. The file is read backwards from the end in
+        blocks, so the cost depends on the length of those lines, not the size of the file.
+        A compressed file cannot be read backwards, so its decompressed lines are streamed.
+
+        :param n: Number of lines.
+        :param decompress: Read the decompressed lines of a compressed file.
+        :return: List of lines including their line terminators.
+        """
+        if self._decompresses(decompress):
+            if n <= 0:
+                return []
+            with self.decompressed() as stream:
+                return [line.decode("utf-8", errors="replace") for line in deque(stream, maxlen=n)]
+
+        self.flush()
+        return [line.decode("utf-8", errors="replace") for line in tail.tail_lines(self.abs_path, n, TAIL_BLOCK_SIZE)]
+
+    def follow(self, offset=None, min_interval=0.1, max_interval=1.0, timeout=None):
+        """
+        Yields complete lines as they are appended to the file, like tail -f. Truncation and
+        log rotation (a new file at the same path) are detected and followed without losing
+        or repeating lines. Use a tail.Follower directly to checkpoint the byte offset.
+
+        :param offset: Byte offset to start from. None starts at the current end of the file.
+        :param min_interval: Shortest delay between polls in seconds.
+        :param max_interval: Longest delay between polls in seconds.
+        :param timeout: Stop after this many seconds without new lines. None follows forever.
+        :return: Generator of lines including their line terminators.
+        """
+        self.flush()
+        for line in tail.follow(self.abs_path, offset, min_interval, max_interval, timeout):
+            yield line.decode("utf-8", errors="replace")
 
     @property
     def stat(self) -> os.stat:
@@ -290,6 +584,71 @@ class File(object):
         """
         return os.stat(self.abs_path)
 
+    def _get_stat(self) -> os.stat_result:
+        """
+        Returns the cached os.stat object, refreshing it if it has been invalidated.
+
+        :return: os.stat object
+        """
+        if self._stat is None or self._dirty:
+            self.flush()
+            self._stat = os.stat(self.abs_path)
+        return self._stat
+
+    def _signature(self) -> tuple:
+        """
+        Stats the file and returns the signature used to key cached metadata and digests.
+        The per-instance cache is dropped if the signature no longer matches.
+
+        :return: Tuple of (st_dev, st_ino, st_size, st_mtime_ns)
+        """
+        self.flush()
+        self._stat = os.stat(self.abs_path)
+        key = (
+            self._stat.st_dev,
+            self._stat.st_ino,
+            self._stat.st_size,
+            self._stat.st_mtime_ns,
+        )
+        if key != self._cache_key:
+            self._cache.clear()
+            self._cache_key = key
+        return key
+
+    def _cache_get(self, name):
+        """
+        Returns a value from the per-instance cache if the file is unchanged since it was stored.
+
+        :param name: Cache entry name.
+        :return: Cached value or None.
+        """
+        self._signature()
+        return self._cache.get(name)
+
+    def _invalidate(self) -> None:
+        """
+        Drops the per-instance metadata and digest cache after the file has been changed.
+
+        :return: No return value.
+        """
+        self._stat = None
+        self._cache.clear()
+        self._cache_key = None
+
+    def refresh(self) -> bool:
+        """
+        Re-stats the file and drops its cached metadata and digests.
+
+        :return: Boolean indicating whether the file still exists.
+        """
+        self._invalidate()
+        try:
+            self._get_stat()
+            self.exists = True
+        except FileNotFoundError:
+            self.exists = False
+        return self.exists
+
     def chmod(self, mode: str or int) -> str or int:
         """
         Wrapper for builtin chmod
@@ -314,22 +673,45 @@ class File(object):
         else:
             self.open("a")
             self.close()
+            self.exists = True
+        self._invalidate()
         return self.last_modified
 
+    @property
+    def is_open(self) -> bool:
+        """
+        Property returning whether the file is open. A file constructed with open_file=True
+        counts as open even though the underlying handle is only created on first use.
+
+        :return: Boolean
+        """
+        return self._file_io_obj is not None or self._open_pending
+
+    @instrumented("open")
     def open(self, mode=None) -> bool:
         """
         Opens the file. Basically wrapper for the builtin open() function.
+        A compressed file opened for reading text yields its decompressed contents.
 
         :return: Boolean indicating successful operation.
         """
-        try:
-            self._file_io_obj = open(
-                self.abs_path, mode if mode is not None else self.mode
-            )
-            self.is_open = True
-            return self.is_open
-        except Exception as ex:
-            raise ex
+        mode = mode if mode is not None else self.mode
+        if mode in ("r", "rt") and self._decompresses(True):
+            self._file_io_obj = compression.open_decompressed(self._path, mode, self.compression)
+        else:
+            self._file_io_obj = open(self._path, mode)
+        self._open_pending = False
+        return self.is_open
+
+    def _io(self):
+        """
+        Returns the underlying file object, opening it first if opening was deferred.
+
+        :return: File object or None if the file is not open.
+        """
+        if self._open_pending:
+            self.open()
+        return self._file_io_obj
 
     def close(self) -> bool:
         """
@@ -338,61 +720,152 @@ class File(object):
         :return: Boolean indicating successful operation.
         """
         if self.is_open:
-            self._file_io_obj.close()
-            self.is_open = False
+            if self._file_io_obj is not None:
+                self.flush()
+                self._file_io_obj.close()
+            self._file_io_obj = None
+            self._open_pending = False
             return True
         else:
             return False
 
-    def md5(self, hash_type=HashType.STRING) -> str or int or hex or bytes:
+    @instrumented("md5")
+    def md5(self, hash_type=HashType.STRING, decompress=False) -> str or bytes:
         """
         Calculate and return the MD5 hash of the file contents.
-        The hash is updated using 65535 blocks of bytes from the file.
+        The hash is updated using HASH_BLOCK_SIZE blocks of bytes from the file.
 
+        :param decompress: Hash the decompressed contents of a compressed file.
         :return: Hash of the file contents.
         """
-        return self._get_hash(self.last_modified, md5, hash_type)
+        return self.hashes(["md5"], hash_type, decompress=decompress)["md5"]
 
-    def sha256(self, hash_type=HashType.STRING) -> str or int or hex or bytes:
+    @instrumented("sha256")
+    def sha256(self, hash_type=HashType.STRING, decompress=False) -> str or bytes:
         """
         Calculate and return the SHA256 hash of the file contents.
-        The hash is updated using 65535 blocks of bytes from the file.
+        The hash is updated using HASH_BLOCK_SIZE blocks of bytes from the file.
 
+        :param decompress: Hash the decompressed contents of a compressed file.
         :return: Hash of the file contents
         """
-        return self._get_hash(self.last_modified, sha256, hash_type)
+        return self.hashes(["sha256"], hash_type, decompress=decompress)["sha256"]
 
-    @lru_cache(maxsize=1)
-    def _get_hash(self, m_time: float, hash_func: sha256 or md5, hash_type: HashType) -> hex or str:
+    @instrumented("hashes")
+    def hashes(self, algorithms=("md5", "sha256"), hash_type=HashType.STRING, block_size=None, decompress=False) -> dict:
         """
-        Private function to allow the hash calculation to use LRU caching.
-        If the file has not been modified and a hash has previously been calculated,
-        we can just use the previous value rather than recalculating the hash.
-
-        :param m_time: st_mtime or last modified time.
-        :param hash_func: Type of hash function to use (MD5 or SHA256)
-        :param hash_type: String or hex return type.
-        :return: String or hex value containing the hash for the file contents.
+        Calculate several hashes of the file contents in a single pass over the file.
+        Digests are cached per instance against the file's stat signature, and in the
+        shared digest cache and persistent digest store when they are enabled, so
+        unchanged files are not rehashed.
+
+        The digests of a compressed file cover its raw bytes unless decompress is set, in
+        which case they cover the decompressed contents and are cached under their own names.
+
+        :param algorithms: Iterable of hashlib algorithm names (md5, sha1, sha256, blake2b, ...).
+        :param hash_type: String or bytes return type.
+        :param block_size: Number of bytes to read per block. Defaults to HASH_BLOCK_SIZE.
+        :param decompress: Hash the decompressed contents of a compressed file.
+        :return: Dictionary mapping each algorithm name to the hash of the file contents.
+        """
+        names: list = hashing.normalize_algorithms(algorithms)
+        prefix: str = "decompressed:" if self._decompresses(decompress) else ""
+        signature: tuple = self._signature()
+        digests, missing = self._cached_digests([prefix + name for name in names], signature)
+        instrumentation.count(cache_hits=len(digests), cache_misses=len(missing))
+
+        if missing:
+            instrumentation.count(bytes_read=signature[2])
+            missing = [name[len(prefix):] for name in missing]
+            if prefix:
+                hashers, _ = compression.hash_path(
+                    self.abs_path, missing, block_size or HASH_BLOCK_SIZE, self.compression
+                )
+            else:
+                hashers = hashing.hash_path(self.abs_path, missing, block_size or HASH_BLOCK_SIZE)
+            computed = {prefix + name: hasher.digest() for name, hasher in hashers.items()}
+            self._store_digests(signature, computed)
+            digests.update(computed)
+
+        return {name: self._format_digest(digests[prefix + name], hash_type) for name in names}
+
+    def _cached_digests(self, names: list, signature: tuple) -> tuple:
         """
-        close_before_returning = False
+        Looks digests up in the per-instance cache, the shared digest cache and the
+        persistent digest store, in that order.
 
-        if not self.is_open:
-            close_before_returning = True
-            self.open("r")
+        :param names: Normalized algorithm names.
+        :param signature: Current stat signature of the file.
+        :return: Tuple of (dictionary of found raw digests, list of missing algorithm names).
+        """
+        shared: cache.DigestCache or None = cache.shared_cache()
+        store = cache.digest_store()
+        digests: dict = {}
+        missing: list = []
+
+        for name in names:
+            digest = self._cache.get(("digest", name))
+            if digest is None and shared is not None:
+                digest = shared.get(self.abs_path, signature, name)
+            if digest is None and store is not None:
+                digest = store.get(self.abs_path, signature, name)
+                if digest is not None and shared is not None:
+                    shared.put(self.abs_path, signature, name, digest)
+            if digest is None:
+                missing.append(name)
+            else:
+                self._cache[("digest", name)] = digest
+                digests[name] = digest
+        return digests, missing
+
+    def _store_digests(self, signature: tuple, digests: dict) -> None:
+        """
+        Records freshly computed digests in every enabled cache.
 
-        file_buf: str = self._file_io_obj.read(HASH_BLOCK_SIZE)
+        :param signature: Stat signature of the file the digests were computed from.
+        :param digests: Dictionary mapping algorithm names to raw digests.
+        :return: No return value.
+        """
+        if signature != self._cache_key:
+            # The file changed while it was being hashed.
+            return
+
+        shared: cache.DigestCache or None = cache.shared_cache()
+        store = cache.digest_store()
+
+        for name, digest in digests.items():
+            self._cache[("digest", name)] = digest
+            if shared is not None:
+                shared.put(self.abs_path, signature, name, digest)
+            if store is not None:
+                store.put(self.abs_path, signature, name, digest)
+
+    @staticmethod
+    def _format_digest(digest: bytes, hash_type: HashType) -> str or bytes:
+        """
+        Convert a raw digest to the requested return type.
 
-        while len(file_buf):
-            hash_func().update(bytes(file_buf.encode("utf-8")))
-            file_buf = self._file_io_obj.read(HASH_BLOCK_SIZE)
+        :param digest: Raw digest bytes.
+        :param hash_type: String or bytes return type.
+        :return: Hex string or raw bytes.
+        """
+        if hash_type == HashType.BYTES:
+            return digest
+        return digest.hex()
 
-        if close_before_returning:
-            self.close()
+    def flush(self) -> None:
+        """
+        Flushes any buffered writes on the open file object to disk. Cached metadata and
+        digests are invalidated here, once per flush, rather than on every write.
 
-        if hash_type == HashType.STRING:
-            return hash_func().hexdigest()
-        elif hash_type == HashType.BYTES:
-            return hash_func().digest()
+        :return: No return value.
+        """
+        file_io_obj = self._file_io_obj
+        if file_io_obj is not None and not file_io_obj.closed and file_io_obj.writable():
+            file_io_obj.flush()
+        if self._dirty:
+            self._dirty = False
+            self._invalidate()
 
     def delete(self) -> bool:
         """
@@ -407,6 +880,7 @@ class File(object):
         except (PermissionError, FileNotFoundError, FileExistsError):
             return False
 
+    @instrumented("read")
     def read(self, n=None) -> str:
         """
         Wrapper for builtin read function.
@@ -415,72 +889,290 @@ class File(object):
         :return: string
         """
         if n is not None:
-            return self._file_io_obj.read(n)
+            data = self._io().read(n)
         else:
-            return self._file_io_obj.read()
+            data = self._io().read()
+        instrumentation.count(bytes_read=len(data))
+        return data
 
+    @instrumented("readlines")
     def readlines(self) -> list:
         """
-        Wrapper for builtin readlines function.
+        Wrapper for builtin readlines function. A compressed file is read decompressed.
 
         :return: list containing the lines from the file.
         """
         if not self.is_open:
-            with open(self.abs_path, "r") as file:
-                return file.readlines()
+            with self.decompressed("r") as file:
+                read_lines = file.readlines()
         else:
-            return self._file_io_obj.readlines()
+            read_lines = self._io().readlines()
+        if instrumentation.recorder() is not None:
+            instrumentation.count(bytes_read=sum(map(len, read_lines)))
+        return read_lines
 
-    def write(self, string) -> int:
+    @instrumented("write")
+    def write(self, data) -> int:
         """
-        Wrapper for the builting file object write function.
+        Writes str or bytes-like data to the open file whatever its mode: bytes are written
+        to a text handle's underlying binary buffer and str is encoded for a binary handle.
 
-        :param string:
-        :return:
+        :param data: str or bytes-like object.
+        :return: Number of characters or bytes written.
         """
-        self._get_hash.cache_clear()
-        return self._file_io_obj.write(string)
+        file_io_obj = self._io()
+        self._dirty = True
+        tree: merkle.MerkleTree or None = self._merkle
+        start: int = file_io_obj.tell() if tree is not None else 0
+        if isinstance(data, str) and "b" in file_io_obj.mode:
+            n = file_io_obj.write(data.encode("utf-8"))
+        elif isinstance(data, str) or "b" in file_io_obj.mode:
+            n = file_io_obj.write(data)
+        else:
+            file_io_obj.flush()
+            n = file_io_obj.buffer.write(data)
+        if tree is not None:
+            tree.mark_dirty(start, file_io_obj.tell())
+        instrumentation.count(bytes_written=n)
+        return n
+
+    @instrumented("writelines")
+    def writelines(self, records) -> None:
+        """
+        Writes many str or bytes-like records, without adding separators.
 
-    def backup(self, directory="") -> str:
+        :param records: Iterable of str or bytes-like objects.
+        :return: No return value.
+        """
+        file_io_obj = self._io()
+        self._dirty = True
+        if "b" in file_io_obj.mode:
+            records = [r.encode("utf-8") if isinstance(r, str) else r for r in records]
+            start: int = file_io_obj.tell()
+            file_io_obj.writelines(records)
+            if self._merkle is not None:
+                self._merkle.mark_dirty(start, file_io_obj.tell())
+            if instrumentation.recorder() is not None:
+                instrumentation.count(bytes_written=sum(map(len, records)))
+        else:
+            for record in records:
+                self.write(record)
+
+    def open_writer(
+        self,
+        append=False,
+        atomic=False,
+        durability=writer.Durability.NONE,
+        sync_every=WRITE_SYNC_BYTES,
+        buffer_size=WRITE_BUFFER_SIZE,
+    ) -> writer.Writer:
+        """
+        Opens a binary writer on the file for high volume output. Records are buffered and
+        flushed with batched writev calls; the file's cached metadata and digests are
+        invalidated once per flush. See writer.Writer for atomic mode and durability.
+
+        :param append: Append to the file instead of truncating it.
+        :param atomic: Write to a temporary file and rename it over the file on close.
+        :param durability: writer.Durability policy.
+        :param sync_every: Bytes between fsyncs under Durability.PERIODIC.
+        :param buffer_size: Bytes to buffer before flushing to the kernel.
+        :return: writer.Writer, usable as a context manager.
+        """
+        self.flush()
+        if self._merkle is not None and not append:
+            self._merkle.mark_dirty(0, self._merkle.size)
+        return writer.Writer(
+            self.abs_path, append, atomic, durability, sync_every, buffer_size, on_flush=self._invalidate
+        )
+
+    @instrumented("backup")
+    def backup(self, directory="", repository=None, codec="deflate", level=None) -> str:
         """
         Creates a backup of the file. This is a ZIP directory that includes a hash
-        of the file contents.
+        of the file contents. If a repository.BackupRepository is given, the file is
+        instead stored there as deduplicated chunks plus a small manifest.
 
         :param directory:
-        :return:
+        :param repository: Optional BackupRepository to back the file up into.
+        :param codec: Archive compression: 'stored', 'deflate', 'bz2' or 'lzma'.
+        :param level: Compression level for the codec, or None for the codec's default.
+        :return: Path of the backup archive, or of the manifest in repository mode.
         """
+        if repository is not None:
+            self.flush()
+            stats = repository.backup(self.abs_path)
+            instrumentation.count(bytes_read=stats.size, bytes_written=stats.stored_bytes)
+            self.backup_file = stats.manifest
+            return self.backup_file
+
         timestamp: str = utilities.get_formatted_datetime()
         self.backup_file: str = f"{directory}{timestamp}_{self.basename}.bak"
 
-        # We want to include a hash of the file's contents for integrity checks.
-        hash_file_name: str = f"{directory}{timestamp}.SHA256"
-        hash_file = open(hash_file_name, "w+")
-        hash_file.write(self.sha256())
-        hash_file.close()
+        # The archive includes a hash of the file's contents for integrity checks.
+        entries: list = archive.backup_many([self], self.backup_file, codec, level)
+        if instrumentation.recorder() is not None:
+            instrumentation.count(bytes_read=entries[0].size, bytes_written=os.path.getsize(self.backup_file))
+        return self.backup_file
 
-        if not os.path.exists(directory) and directory != "":
-            os.makedirs(directory)
+    def copy_to(self, destination: str) -> str:
+        """
+        Copies the file and its permission bits to destination. The kernel copies the bytes
+        (copy_file_range or sendfile) where possible, falling back to a chunked copy.
 
-        # Zip the files together
-        with zipfile.ZipFile(self.backup_file, "w", zipfile.ZIP_DEFLATED) as backup:
-            backup.write(self.relative_path)
-            backup.write(hash_file_name)
+        :param destination: Path of the copy, or a directory to copy the file into.
+        :return: Path of the copy.
+        :raises shutil.SameFileError: If the copy would overwrite the file itself.
+        """
+        if os.path.isdir(destination):
+            destination = os.path.join(destination, self.basename)
+        self.flush()
+        transfer.copy_file(self.abs_path, destination)
+        return destination
+
+    @contextmanager
+    def view(self):
+        """
+        Memory maps the file read-only and provides a memoryview over its raw bytes.
+        Slicing the view never copies the data; slices must be released before the
+        context exits.
 
-        os.remove(hash_file_name)
-        return self.backup_file
+        :return: Context manager yielding a read-only memoryview.
+        """
+        self.flush()
+        with open(self.abs_path, "rb") as file_obj, transfer.map_view(file_obj) as view:
+            yield view
 
-    def grep(self, regex: str) -> list:
+    def signature(self, block_size=DELTA_BLOCK_SIZE) -> delta.Signature:
+        """
+        Computes an rsync-style block signature of the file: a weak rolling checksum and a
+        strong hash per block. A later version of the file can be diffed against it.
+
+        :param block_size: Size of each block.
+        :return: delta.Signature
+        """
+        self.flush()
+        return delta.Signature.build(self.abs_path, block_size)
+
+    def delta(self, signature: delta.Signature):
+        """
+        Computes the delta from the version of the file described by signature to the
+        current contents, streaming the file through a rolling checksum window.
+
+        :param signature: Signature of the earlier version.
+        :return: Generator of delta operations (see delta.write_delta to serialize them).
+        """
+        self.flush()
+        with open(self.abs_path, "rb") as file_obj:
+            yield from delta.delta(file_obj, signature)
+
+    def patch(self, operations, destination: str, block_size=DELTA_BLOCK_SIZE) -> str:
+        """
+        Rebuilds a newer version of the file from this file and a delta, writing it to destination.
+
+        :param operations: Delta operations computed against this file's signature.
+        :param destination: Path to write the rebuilt file to.
+        :param block_size: Block size of the signature the delta was computed against.
+        :return: The destination path.
+        """
+        self.flush()
+        tmp_path = f"{destination}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as out_file_obj:
+            delta.patch(self.abs_path, operations, out_file_obj, block_size)
+        os.replace(tmp_path, destination)
+        return destination
+
+    @instrumented("grep")
+    def grep(self, regex, count_only=False, max_count=None, invert=False, decompress=True) -> list or int:
         """
         Basic grep functionality for the file contents.
 
-        :param regex: Regular expression to match.
-        :return: List containing all matching lines.
+        :param regex: Regular expression to match (str, bytes or compiled).
+        :param count_only: Return the number of matching lines instead of the lines.
+        :param max_count: Stop after this many matching lines.
+        :param invert: Select the lines that do not match.
+        :param decompress: Search the decompressed contents of a compressed file.
+        :return: List containing all matching lines, or their count.
+        """
+        if self._decompresses(decompress):
+            with self.decompressed() as stream:
+                compiled = search.compile_pattern(regex)
+                instrumentation.count(bytes_read=self.size)
+                matches = search.grep_stream(stream, compiled, max_count, invert)
+                if count_only:
+                    return sum(1 for _ in matches)
+                matches = list(matches)
+                # A matched line is unterminated only if the stream ended right after it.
+                size: int = stream.tell()
+        else:
+            matches = self.grep_iter(regex, max_count=max_count, invert=invert, decompress=False)
+            if count_only:
+                return sum(1 for _ in matches)
+            size: int = self.size
+
+        lines: list = []
+        for match in matches:
+            line: str = match.line.decode("utf-8", errors="replace")
+            if match.byte_offset + len(match.line) < size:
+                line += "\n"
+            lines.append(line)
+        return lines
+
+    def grep_iter(self, regex, max_count=None, invert=False, before=0, after=0, flags=0, decompress=True):
         """
-        matches: list = []
-        for line in self.readlines():
-            if re.search(re.compile(regex), line):
-                matches.append(line)
-        return matches
+        Lazily search the file through a read-only memory map. The pattern is compiled
+        once as a bytes regular expression, so the file is never decoded or loaded whole.
+        A compressed file is searched as it is decompressed, in blocks.
+
+        :param regex: Regular expression to match (str, bytes or compiled).
+        :param max_count: Stop after this many matching lines.
+        :param invert: Select the lines that do not match.
+        :param before: Number of context lines to include before each match.
+        :param after: Number of context lines to include after each match.
+        :param flags: Additional re flags.
+        :param decompress: Search the decompressed contents of a compressed file.
+        :return: Generator of search.GrepMatch(line_no, byte_offset, line, before, after).
+        """
+        compiled = search.compile_pattern(regex, flags)
+        if self._decompresses(decompress):
+            with self.decompressed() as stream:
+                instrumentation.count(bytes_read=self.size)
+                yield from search.grep_stream(stream, compiled, max_count, invert, before, after)
+            return
+
+        self.flush()
+        with open(self.abs_path, "rb") as file_obj, transfer.map_file(file_obj) as buf:
+            instrumentation.count(bytes_read=len(buf))
+            yield from search.grep_buffer(buf, compiled, max_count, invert, before, after)
+
+    @instrumented("grep_many")
+    def grep_many(self, patterns=(), literals=(), count_only=False, max_count=None, flags=0, decompress=True) -> dict:
+        """
+        Search the file for many patterns in a single read. Regular expressions are combined
+        into one alternation and literal strings are matched with an Aho-Corasick automaton;
+        see multigrep.PatternSet. Build a PatternSet once to search many files with it.
+
+        :param patterns: Regular expressions (str, bytes or compiled), or a multigrep.PatternSet.
+        :param literals: Literal strings (str or bytes) to search for.
+        :param count_only: Count the matching lines of each pattern instead of collecting them.
+        :param max_count: Stop after this many matching lines for each pattern.
+        :param flags: Additional re flags for the regular expressions.
+        :param decompress: Search the decompressed contents of a compressed file.
+        :return: Dictionary of pattern to a list of search.GrepMatch, or to a count.
+        """
+        if isinstance(patterns, multigrep.PatternSet):
+            pattern_set = patterns
+        else:
+            pattern_set = multigrep.PatternSet(patterns, literals, flags)
+        if self._decompresses(decompress):
+            with self.decompressed() as stream:
+                instrumentation.count(bytes_read=self.size)
+                return pattern_set.scan(stream, count_only, max_count)
+
+        self.flush()
+        with open(self.abs_path, "rb", buffering=0) as file_obj:
+            results = pattern_set.scan(file_obj, count_only, max_count)
+            instrumentation.count(bytes_read=file_obj.tell())
+        return results
 
     def truncate(self, n=None) -> None:
         """
@@ -489,7 +1181,11 @@ class File(object):
         :param n: Number of byte to truncate to.
         :return: No return value.
         """
-        if n is None and self._file_io_obj is not None:
-            self._file_io_obj.truncate(0)
-        elif self._file_io_obj is not None:
-            self._file_io_obj.truncate(n)
+        file_io_obj = self._io()
+        if n is None and file_io_obj is not None:
+            file_io_obj.truncate(0)
+        elif file_io_obj is not None:
+            file_io_obj.truncate(n)
+        if self._merkle is not None:
+            self._merkle.mark_dirty(n or 0, self._merkle.size)
+        self._invalidate()
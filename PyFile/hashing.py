@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+File: hashing.py
+Description: Streaming multi-digest hashing engine.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+from PyFile.config import HASH_BLOCK_SIZE
+from PyFile.transfer import iter_blocks
+
+
+def normalize_algorithms(algorithms) -> list:
+    """
+    Lower-case and de-duplicate a list of algorithm names, preserving order.
+
+    :param algorithms: Algorithm name or iterable of algorithm names.
+    :return: List of normalized algorithm names.
+    """
+    if isinstance(algorithms, str):
+        algorithms = [algorithms]
+
+    names: list = []
+    for name in algorithms:
+        name = name.lower()
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def new_hashers(algorithms) -> dict:
+    """
+    Create a fresh hash object for each of the requested algorithms.
+
+    :param algorithms: Iterable of hashlib algorithm names (md5, sha1, sha256, blake2b, ...).
+    :return: Dictionary mapping each normalized algorithm name to a hash object.
+    """
+    hashers: dict = {}
+    for name in normalize_algorithms(algorithms):
+        try:
+            hashers[name] = hashlib.new(name)
+        except ValueError:
+            raise ValueError(f"Unsupported hash algorithm: '{name}'")
+
+    if not hashers:
+        raise ValueError("At least one hash algorithm is required")
+    return hashers
+
+
+def update_from_fileobj(hashers: dict, file_obj, block_size: int = HASH_BLOCK_SIZE) -> int:
+    """
+    Feed every hash object with the contents of a binary file object in a single pass.
+    A single buffer is allocated and reused for every block via readinto().
+
+    :param hashers: Dictionary of hash objects as returned by new_hashers().
+    :param file_obj: Binary file object supporting readinto().
+    :param block_size: Number of bytes to read per block.
+    :return: Total number of bytes hashed.
+    """
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    updates = [hasher.update for hasher in hashers.values()]
+    total = 0
+
+    n = file_obj.readinto(buf)
+    while n:
+        chunk = view if n == block_size else view[:n]
+        for update in updates:
+            update(chunk)
+        total += n
+        n = file_obj.readinto(buf)
+
+    view.release()
+    return total
+
+
+def hash_path(path: str, algorithms, block_size: int = HASH_BLOCK_SIZE) -> dict:
+    """
+    Hash the raw bytes of a file with several algorithms while reading it only once.
+    Large files are hashed straight out of a memory map, without copying.
+
+    :param path: Path of the file to hash.
+    :param algorithms: Iterable of hashlib algorithm names.
+    :param block_size: Number of bytes to read per block.
+    :return: Dictionary mapping each algorithm name to its finished hash object.
+    """
+    hashers = new_hashers(algorithms)
+    updates = [hasher.update for hasher in hashers.values()]
+    for block in iter_blocks(path, block_size):
+        for update in updates:
+            update(block)
+    return hashers
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+File: instrumentation.py
+Description: Opt-in per-operation call, time, I/O and cache counters for File.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+import threading
+import functools
+from collections import namedtuple
+
+
+OperationEvent = namedtuple(
+    "OperationEvent",
+    ["operation", "path", "seconds", "bytes_read", "bytes_written", "cache_hits", "cache_misses", "error"],
+)
+OperationEvent.__doc__ = """
+One completed, instrumented File operation, as passed to a Recorder's callback.
+error is the exception the operation raised, or None.
+"""
+
+
+class OperationStats(object):
+    """
+    Running totals for one operation name.
+    """
+
+    __slots__ = ["calls", "errors", "seconds", "bytes_read", "bytes_written", "cache_hits", "cache_misses"]
+
+    def __init__(self):
+        self.calls: int = 0
+        self.errors: int = 0
+        self.seconds: float = 0.0
+        self.bytes_read: int = 0
+        self.bytes_written: int = 0
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Active(object):
+    """
+    Counters of the operation currently running in a thread.
+    """
+
+    __slots__ = ["bytes_read", "bytes_written", "cache_hits", "cache_misses"]
+
+    def __init__(self):
+        self.bytes_read: int = 0
+        self.bytes_written: int = 0
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+
+
+class Recorder(object):
+    """
+    Thread-safe aggregation of instrumented File operations. Each operation is attributed
+    to the outermost instrumented call in its thread (md5() calling hashes() counts once,
+    as md5). An optional callback receives an OperationEvent for every operation, for
+    exporting to an external metrics system; it runs in the calling thread.
+    """
+
+    __slots__ = ["callback", "_stats", "_lock", "_local"]
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._stats: dict = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, operation: str, path: str, seconds: float, active: _Active, error=None) -> None:
+        """
+        Add a completed operation to the totals and pass it to the callback.
+
+        :param operation: Operation name.
+        :param path: Path of the file operated on.
+        :param seconds: Wall time of the operation.
+        :param active: Counters accumulated while the operation ran.
+        :param error: Exception raised by the operation, if any.
+        :return: No return value.
+        """
+        with self._lock:
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = OperationStats()
+            stats.calls += 1
+            stats.errors += error is not None
+            stats.seconds += seconds
+            stats.bytes_read += active.bytes_read
+            stats.bytes_written += active.bytes_written
+            stats.cache_hits += active.cache_hits
+            stats.cache_misses += active.cache_misses
+
+        if self.callback is not None:
+            self.callback(OperationEvent(
+                operation, path, seconds, active.bytes_read, active.bytes_written,
+                active.cache_hits, active.cache_misses, error,
+            ))
+
+    def snapshot(self) -> dict:
+        """
+        Return a copy of the totals.
+
+        :return: Dictionary mapping each operation name to a dictionary of its counters.
+        """
+        with self._lock:
+            return {operation: stats.as_dict() for operation, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        """
+        Clear the totals.
+
+        :return: No return value.
+        """
+        with self._lock:
+            self._stats.clear()
+
+
+_recorder: Recorder or None = None
+
+# Classes whose instrumented methods are wrapped while instrumentation is enabled, and the
+# original class attributes that were replaced, keyed by (class, attribute name).
+_classes: list = []
+_originals: dict = {}
+
+
+def enable_instrumentation(callback=None) -> Recorder:
+    """
+    Start recording instrumented File operations process-wide. The recording wrappers
+    are only installed while instrumentation is enabled, so disabled instrumentation
+    costs nothing on the instrumented methods.
+
+    :param callback: Optional callable receiving an OperationEvent per operation.
+    :return: The active Recorder.
+    """
+    global _recorder
+    _recorder = Recorder(callback)
+    for cls in _classes:
+        _install(cls)
+    return _recorder
+
+
+def disable_instrumentation() -> None:
+    """
+    Stop recording, remove the recording wrappers and drop the active Recorder.
+
+    :return: No return value.
+    """
+    global _recorder
+    _recorder = None
+    for (cls, name), attribute in list(_originals.items()):
+        setattr(cls, name, attribute)
+    _originals.clear()
+
+
+def recorder() -> Recorder or None:
+    """
+    Return the active Recorder if instrumentation is enabled.
+
+    :return: Recorder or None
+    """
+    return _recorder
+
+
+def snapshot() -> dict:
+    """
+    Return a copy of the active Recorder's totals, or an empty dictionary if disabled.
+
+    :return: Dictionary mapping operation names to dictionaries of counters.
+    """
+    return _recorder.snapshot() if _recorder is not None else {}
+
+
+def count(bytes_read=0, bytes_written=0, cache_hits=0, cache_misses=0) -> None:
+    """
+    Add to the counters of the instrumented operation running in this thread, if any.
+
+    :return: No return value.
+    """
+    if _recorder is None:
+        return
+    active = getattr(_recorder._local, "active", None)
+    if active is not None:
+        active.bytes_read += bytes_read
+        active.bytes_written += bytes_written
+        active.cache_hits += cache_hits
+        active.cache_misses += cache_misses
+
+
+def instrumented(operation: str):
+    """
+    Method decorator marking a method (or property getter) as an instrumented operation.
+    The method itself is returned unchanged; see register().
+
+    :param operation: Operation name.
+    :return: Decorator
+    """
+    def decorator(func):
+        func.__instrumented__ = operation
+        return func
+
+    return decorator
+
+
+def register(cls):
+    """
+    Class decorator making the methods marked with instrumented() recordable.
+
+    :param cls: Class to register.
+    :return: The class, unchanged.
+    """
+    _classes.append(cls)
+    if _recorder is not None:
+        _install(cls)
+    return cls
+
+
+def _install(cls) -> None:
+    for name, attribute in list(vars(cls).items()):
+        if (cls, name) in _originals:
+            continue
+        if isinstance(attribute, property) and hasattr(attribute.fget, "__instrumented__"):
+            replacement = property(_wrap(attribute.fget), attribute.fset, attribute.fdel, attribute.__doc__)
+        elif hasattr(attribute, "__instrumented__"):
+            replacement = _wrap(attribute)
+        else:
+            continue
+        _originals[(cls, name)] = attribute
+        setattr(cls, name, replacement)
+
+
+def _wrap(func):
+    operation: str = func.__instrumented__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        recorder = _recorder
+        if recorder is None:
+            return func(self, *args, **kwargs)
+
+        local = recorder._local
+        if getattr(local, "active", None) is not None:
+            # Nested inside another instrumented operation, which gets the credit.
+            return func(self, *args, **kwargs)
+
+        active = local.active = _Active()
+        start = time.perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+        except BaseException as e:
+            local.active = None
+            recorder.record(operation, self._path, time.perf_counter() - start, active, e)
+            raise
+        local.active = None
+        recorder.record(operation, self._path, time.perf_counter() - start, active)
+        return result
+
+    return wrapper
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+File: lines.py
+Description: Line counting over raw byte blocks.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import struct
+import hashlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from PyFile.config import LINE_COUNT_BLOCK_SIZE, LINE_INDEX_STEP
+
+
+def count_newlines(path: str, start=0, end=None, block_size=LINE_COUNT_BLOCK_SIZE) -> int:
+    """
+    Count the newline bytes in a byte range of a file, reading into one reused buffer.
+
+    :param path: Path of the file.
+    :param start: Offset of the first byte to scan.
+    :param end: Offset one past the last byte to scan. Defaults to the end of the file.
+    :param block_size: Number of bytes to read per block.
+    :return: Integer
+    """
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    count: int = 0
+
+    with open(path, "rb", buffering=0) as file_obj:
+        if start:
+            file_obj.seek(start)
+        remaining = end - start if end is not None else None
+
+        while remaining is None or remaining > 0:
+            want = block_size if remaining is None else min(block_size, remaining)
+            n = file_obj.readinto(view[:want])
+            if not n:
+                break
+            count += buf.count(b"\n", 0, n)
+            if remaining is not None:
+                remaining -= n
+
+    view.release()
+    return count
+
+
+def count_lines(path: str, count_unterminated=True, workers=1, block_size=LINE_COUNT_BLOCK_SIZE) -> int:
+    """
+    Count the lines in a file without decoding it or materializing the lines.
+    With several workers the file is split into byte ranges counted in parallel processes.
+
+    :param path: Path of the file.
+    :param count_unterminated: Whether a final line without a trailing newline counts as a line.
+    :param workers: Number of processes to split the file across.
+    :param block_size: Number of bytes to read per block.
+    :return: Integer
+    """
+    size: int = os.stat(path).st_size
+    if size == 0:
+        return 0
+
+    if workers is None or workers <= 1 or size < workers * block_size:
+        count = count_newlines(path, block_size=block_size)
+    else:
+        step = -(-size // workers)
+        ranges = [(start, min(start + step, size)) for start in range(0, size, step)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(count_newlines, path, start, end, block_size)
+                for start, end in ranges
+            ]
+            count = sum(future.result() for future in futures)
+
+    if count_unterminated:
+        with open(path, "rb") as file_obj:
+            file_obj.seek(-1, os.SEEK_END)
+            if file_obj.read(1) != b"\n":
+                count += 1
+    return count
+
+
+class LineIndex(object):
+    """
+    Sparse index of line start offsets. The offset of every `step`-th line is kept in an
+    array('Q'), so any line can be reached with one seek and at most `step` - 1 line reads.
+    The index remembers the file it was built from and is extended in place when the
+    file has only grown by appending.
+    """
+
+    __slots__ = [
+        "step",
+        "offsets",
+        "newlines",
+        "tail_start",
+        "indexed_size",
+        "signature",
+        "tail_digest",
+    ]
+
+    _HEADER = struct.Struct("<4sIQQQQQQq20s")
+    _MAGIC = b"PFLI"
+    _VERSION = 1
+    _TAIL_SIZE = 4096
+
+    def __init__(self, step=LINE_INDEX_STEP):
+        self.step: int = step
+        self.offsets: array = array("Q", [0])
+        self.newlines: int = 0
+        self.tail_start: int = 0
+        self.indexed_size: int = 0
+        self.signature: tuple = (0, 0, 0, 0)
+        self.tail_digest: bytes = b"\0" * 20
+
+    def __len__(self) -> int:
+        return self.newlines + (1 if self.tail_start < self.indexed_size else 0)
+
+    @classmethod
+    def build(cls, path: str, step=LINE_INDEX_STEP):
+        """
+        Build an index for a file.
+
+        :param path: Path of the file.
+        :param step: Number of lines between recorded offsets.
+        :return: LineIndex
+        """
+        index = cls(step)
+        index.refresh(path)
+        return index
+
+    def refresh(self, path: str) -> bool:
+        """
+        Bring the index up to date with the file. Appended data is scanned incrementally;
+        any other change causes a full rebuild.
+
+        :param path: Path of the file.
+        :return: Boolean indicating whether the index changed.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature == self.signature:
+            return False
+
+        if not self._is_append(path, signature):
+            self.offsets = array("Q", [0])
+            self.newlines = 0
+            self.tail_start = 0
+            self.indexed_size = 0
+
+        self._scan(path, signature[2])
+        self.signature = signature
+        self.tail_digest = self._digest_tail(path, self.indexed_size)
+        return True
+
+    def _is_append(self, path: str, signature: tuple) -> bool:
+        """
+        Whether the file is the indexed file with data appended after the indexed range.
+        """
+        return (
+            self.indexed_size > 0
+            and signature[:2] == self.signature[:2]
+            and signature[2] >= self.indexed_size
+            and self._digest_tail(path, self.indexed_size) == self.tail_digest
+        )
+
+    @classmethod
+    def _digest_tail(cls, path: str, end: int) -> bytes:
+        """
+        Digest of the last bytes of the indexed range, used to detect in-place rewrites.
+        """
+        start = max(0, end - cls._TAIL_SIZE)
+        with open(path, "rb") as file_obj:
+            file_obj.seek(start)
+            return hashlib.sha1(file_obj.read(end - start)).digest()
+
+    def _scan(self, path: str, size: int, block_size=LINE_COUNT_BLOCK_SIZE) -> None:
+        """
+        Scan the file from the end of the indexed range, recording every step-th line start.
+        Blocks without a checkpoint are only counted, not searched newline by newline.
+        """
+        step: int = self.step
+        offsets: array = self.offsets
+        newlines: int = self.newlines
+        tail_start: int = self.tail_start
+        buf = bytearray(block_size)
+        view = memoryview(buf)
+
+        with open(path, "rb", buffering=0) as file_obj:
+            file_obj.seek(self.indexed_size)
+            base: int = self.indexed_size
+
+            while base < size:
+                n = file_obj.readinto(view[: min(block_size, size - base)])
+                if not n:
+                    break
+
+                pos = 0
+                while True:
+                    need = step - newlines % step
+                    available = buf.count(b"\n", pos, n)
+                    if available < need:
+                        if available:
+                            newlines += available
+                            tail_start = base + buf.rfind(b"\n", pos, n) + 1
+                        break
+                    for _ in range(need):
+                        pos = buf.find(b"\n", pos, n) + 1
+                    newlines += need
+                    tail_start = base + pos
+                    offsets.append(tail_start)
+
+                base += n
+
+        view.release()
+        self.newlines = newlines
+        self.tail_start = tail_start
+        self.indexed_size = base
+
+    def locate(self, n: int) -> tuple:
+        """
+        Find the nearest recorded line at or before line n.
+
+        :param n: 0-based line number.
+        :return: Tuple of (byte offset, number of lines to skip from that offset).
+        """
+        if n < 0 or n >= len(self):
+            raise IndexError(f"Line {n} out of range")
+        return self.offsets[n // self.step], n % self.step
+
+    def read_lines(self, path: str, start: int, stop: int) -> list:
+        """
+        Read lines [start, stop) from the file with a single seek.
+
+        :param path: Path of the file.
+        :param start: 0-based first line.
+        :param stop: 0-based line one past the last line.
+        :return: List of bytes lines including their terminators.
+        """
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+
+        offset, skip = self.locate(start)
+        with open(path, "rb") as file_obj:
+            file_obj.seek(offset)
+            for _ in range(skip):
+                file_obj.readline()
+            return [file_obj.readline() for _ in range(stop - start)]
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index to a sidecar file.
+
+        :param path: Path of the index file.
+        :return: No return value.
+        """
+        header = self._HEADER.pack(
+            self._MAGIC,
+            self._VERSION,
+            self.step,
+            self.newlines,
+            self.tail_start,
+            self.indexed_size,
+            self.signature[0],
+            self.signature[1],
+            self.signature[3],
+            self.tail_digest,
+        )
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file_obj:
+            file_obj.write(header)
+            self.offsets.tofile(file_obj)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load an index persisted with save().
+
+        :param path: Path of the index file.
+        :return: LineIndex, or None if the file is missing or not a valid index.
+        """
+        try:
+            with open(path, "rb") as file_obj:
+                header = file_obj.read(cls._HEADER.size)
+                if len(header) != cls._HEADER.size:
+                    return None
+                fields = cls._HEADER.unpack(header)
+                if fields[0] != cls._MAGIC or fields[1] != cls._VERSION:
+                    return None
+
+                index = cls(fields[2])
+                index.newlines, index.tail_start, index.indexed_size = fields[3:6]
+                index.signature = (fields[6], fields[7], fields[5], fields[8])
+                index.tail_digest = fields[9]
+                index.offsets = array("Q")
+                index.offsets.frombytes(file_obj.read())
+                return index
+        except (OSError, struct.error, ValueError):
+            return None
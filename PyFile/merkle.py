@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+"""
+File: merkle.py
+Description: Merkle tree of block digests with incremental rehashing and range verification.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import struct
+import hashlib
+from PyFile.config import MERKLE_BLOCK_SIZE
+
+# Domain separation prefixes, as in RFC 6962, so a leaf can never be mistaken for a node.
+_LEAF = b"\x00"
+_NODE = b"\x01"
+
+
+def merkle_root(leaves: list, algorithm: str) -> bytes:
+    """
+    Combine leaf digests pairwise up to a single root. An odd node is carried up a level
+    unchanged. An empty list has the digest of an empty leaf as its root.
+
+    :param leaves: List of leaf digests.
+    :param algorithm: hashlib algorithm name.
+    :return: Root digest.
+    """
+    if not leaves:
+        return hashlib.new(algorithm, _LEAF).digest()
+
+    level = leaves
+    while len(level) > 1:
+        parents = [
+            hashlib.new(algorithm, _NODE + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0]
+
+
+class MerkleTree(object):
+    """
+    Digest of every block_size block of a file, combined into a Merkle root. The tree
+    remembers the file it was built from: blocks marked dirty, blocks past the previous
+    end of the file and the new last block after a truncation are the only ones rehashed
+    on refresh. A change it was not told about causes a rebuild if the size is unchanged;
+    if the file grew, it is taken as an append once the last complete block of the old
+    contents is found unchanged.
+
+    verify_range() checks a byte range against the recorded digests by reading only the
+    blocks that overlap it.
+    """
+
+    __slots__ = ["block_size", "algorithm", "leaves", "root", "size", "signature", "dirty"]
+
+    _HEADER = struct.Struct("<4sIQQQQq16sI64s")
+    _MAGIC = b"PFMT"
+    _VERSION = 1
+
+    def __init__(self, block_size=MERKLE_BLOCK_SIZE, algorithm="sha256"):
+        hashlib.new(algorithm)  # Fail early on an unsupported algorithm.
+        self.block_size: int = block_size
+        self.algorithm: str = algorithm
+        self.leaves: list = []
+        self.root: bytes = merkle_root(self.leaves, algorithm)
+        self.size: int = 0
+        self.signature: tuple = (0, 0, 0, 0)
+        self.dirty: set = set()
+
+    def __len__(self) -> int:
+        return len(self.leaves)
+
+    @classmethod
+    def build(cls, path: str, block_size=MERKLE_BLOCK_SIZE, algorithm="sha256"):
+        """
+        Build a tree for a file.
+
+        :param path: Path of the file.
+        :param block_size: Size of each block.
+        :param algorithm: hashlib algorithm name.
+        :return: MerkleTree
+        """
+        tree = cls(block_size, algorithm)
+        tree.refresh(path)
+        return tree
+
+    def _leaf(self, data) -> bytes:
+        hasher = hashlib.new(self.algorithm, _LEAF)
+        hasher.update(data)
+        return hasher.digest()
+
+    def mark_dirty(self, start: int, end: int) -> None:
+        """
+        Record that bytes [start, end) were written, so the blocks covering them are
+        rehashed on the next refresh.
+
+        :param start: First byte written.
+        :param end: Byte one past the last byte written.
+        :return: No return value.
+        """
+        if end > start:
+            self.dirty.update(range(start // self.block_size, (end - 1) // self.block_size + 1))
+
+    def refresh(self, path: str) -> bool:
+        """
+        Bring the tree up to date with the file, rehashing only the blocks that can have
+        changed.
+
+        :param path: Path of the file.
+        :return: Boolean indicating whether the tree changed.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature == self.signature and not self.dirty:
+            return False
+
+        size: int = signature[2]
+        count: int = -(-size // self.block_size)
+        with open(path, "rb", buffering=0) as file_obj:
+            if signature[:2] != self.signature[:2] or (not self.dirty and size == self.size):
+                # A different file, or one changed in place without the tree being told.
+                stale = range(count)
+                self.leaves = []
+            else:
+                stale = {index for index in self.dirty if index < count}
+                if size != self.size:
+                    stale.update(range(min(self.size, size) // self.block_size, count))
+                    if not self.dirty and size > self.size and not self._unchanged(file_obj, self.size):
+                        # Appended to by something else, which also rewrote the old data.
+                        stale = range(count)
+                        self.leaves = []
+
+            del self.leaves[count:]
+            self.leaves.extend([b""] * (count - len(self.leaves)))
+            for index in sorted(stale):
+                file_obj.seek(index * self.block_size)
+                self.leaves[index] = self._leaf(file_obj.read(self.block_size))
+
+        self.root = merkle_root(self.leaves, self.algorithm)
+        self.size = size
+        self.signature = signature
+        self.dirty.clear()
+        return True
+
+    def _unchanged(self, file_obj, old_size: int) -> bool:
+        """
+        Whether the last complete block of the previous contents still has its recorded digest.
+        """
+        index = old_size // self.block_size - 1
+        if index < 0:
+            return True
+        file_obj.seek(index * self.block_size)
+        return self._leaf(file_obj.read(self.block_size)) == self.leaves[index]
+
+    def verify_range(self, path: str, start: int, end: int) -> bool:
+        """
+        Check that bytes [start, end) of the file match the recorded digests, reading only
+        the blocks that overlap the range.
+
+        :param path: Path of the file.
+        :param start: First byte of the range.
+        :param end: Byte one past the last byte of the range.
+        :return: Boolean indicating whether the range is intact.
+        """
+        if start < 0 or end > self.size:
+            return False
+        if end <= start:
+            return True
+
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        with open(path, "rb", buffering=0) as file_obj:
+            file_obj.seek(first * self.block_size)
+            for index in range(first, last + 1):
+                if self._leaf(file_obj.read(self.block_size)) != self.leaves[index]:
+                    return False
+        return True
+
+    def dirty_ranges(self) -> list:
+        """
+        Byte ranges of the blocks currently marked dirty, merged where adjacent.
+
+        :return: List of (start, end) tuples.
+        """
+        ranges: list = []
+        for index in sorted(self.dirty):
+            start, end = index * self.block_size, (index + 1) * self.block_size
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def save(self, path: str) -> None:
+        """
+        Persist the tree to a sidecar file.
+
+        :param path: Path of the tree file.
+        :return: No return value.
+        """
+        header = self._HEADER.pack(
+            self._MAGIC,
+            self._VERSION,
+            self.block_size,
+            self.size,
+            self.signature[0],
+            self.signature[1],
+            self.signature[3],
+            self.algorithm.encode("ascii"),
+            len(self.leaves),
+            self.root,
+        )
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file_obj:
+            file_obj.write(header)
+            file_obj.write(b"".join(self.leaves))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load a tree persisted with save(). The leaves are checked against each other by
+        recomputing the root, so a damaged sidecar is rejected.
+
+        :param path: Path of the tree file.
+        :return: MerkleTree, or None if the file is missing or not a valid tree.
+        """
+        try:
+            with open(path, "rb") as file_obj:
+                header = file_obj.read(cls._HEADER.size)
+                if len(header) != cls._HEADER.size:
+                    return None
+                fields = cls._HEADER.unpack(header)
+                if fields[0] != cls._MAGIC or fields[1] != cls._VERSION:
+                    return None
+
+                tree = cls(fields[2], fields[7].rstrip(b"\0").decode("ascii"))
+                tree.size = fields[3]
+                tree.signature = (fields[4], fields[5], fields[3], fields[6])
+                digest_size = hashlib.new(tree.algorithm).digest_size
+                data = file_obj.read()
+                if len(data) != fields[8] * digest_size or fields[8] != -(-tree.size // tree.block_size):
+                    return None
+                tree.leaves = [data[i:i + digest_size] for i in range(0, len(data), digest_size)]
+                tree.root = merkle_root(tree.leaves, tree.algorithm)
+                if tree.root != fields[9][:digest_size]:
+                    return None
+                return tree
+        except (OSError, struct.error, ValueError, UnicodeDecodeError):
+            return None
@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+"""
+File: multigrep.py
+Description: Single pass search of a stream for many regular expressions and literal strings.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+from array import array
+from collections import deque
+from PyFile.config import MULTI_GREP_BLOCK_SIZE
+from PyFile.search import GrepMatch, compile_pattern, grep_buffer
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+_INLINE_FLAGS = ((re.IGNORECASE, "i"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+# Literal sets starting with more distinct bytes than this are never screened with re,
+# since counting the candidate positions would cost more than it could save.
+SCREEN_MAX_FIRST_BYTES = 32
+
+
+class AhoCorasick(object):
+    """
+    Aho-Corasick automaton finding which of a set of byte strings occur in a line, in one
+    pass over the line whatever the number of strings.
+
+    The automaton is stored as a full transition table: one flat array with a row of 256
+    entries per state, each entry holding the next state's row offset, so a step is a
+    single array lookup. States are numbered so that those completing a string come last
+    and are recognised with one comparison.
+    """
+
+    __slots__ = ["literals", "_table", "_accept", "_outputs"]
+
+    def __init__(self, literals):
+        """
+        :param literals: Iterable of non-empty str or bytes without newlines. str is encoded as UTF-8.
+        """
+        self.literals: list = []
+        goto: list = [{}]
+        outputs: list = [set()]
+        for index, literal in enumerate(literals):
+            if isinstance(literal, str):
+                literal = literal.encode("utf-8")
+            if not literal or b"\n" in literal:
+                raise ValueError("literals must be non-empty and must not contain newlines")
+            self.literals.append(bytes(literal))
+            state = 0
+            for byte in literal:
+                if byte not in goto[state]:
+                    goto[state][byte] = len(goto)
+                    goto.append({})
+                    outputs.append(set())
+                state = goto[state][byte]
+            outputs[state].add(index)
+
+        # Breadth first, so each state's failure link is to a state already complete.
+        fail: list = [0] * len(goto)
+        order: list = [0]
+        queue: deque = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for byte, child in goto[state].items():
+                link = fail[state]
+                while link and byte not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(byte, 0) if state else 0
+                outputs[child] |= outputs[fail[child]]
+                queue.append(child)
+
+        silent = [state for state in order if not outputs[state]]
+        accepting = [state for state in order if outputs[state]]
+        number: list = [0] * len(goto)
+        for new, state in enumerate(silent + accepting):
+            number[state] = new * 256
+
+        table = array("i", bytes(4 * 256 * len(goto)))
+        for state in order:
+            row = number[state]
+            if state:
+                parent = number[fail[state]]
+                table[row:row + 256] = table[parent:parent + 256]
+            for byte, child in goto[state].items():
+                table[row + byte] = number[child]
+
+        self._table = table
+        self._accept: int = 256 * len(silent)
+        self._outputs: list = [tuple(sorted(outputs[state])) for state in accepting]
+
+    def __len__(self) -> int:
+        return len(self.literals)
+
+    def search(self, data) -> set:
+        """
+        Find the strings occurring in data. Matching restarts after every newline.
+
+        :param data: Bytes-like object.
+        :return: Set of indexes into literals.
+        """
+        table = self._table
+        accept: int = self._accept
+        state: int = 0
+        found: set = set()
+        for byte in data:
+            state = table[state + byte]
+            if state >= accept:
+                found.update(self._outputs[(state - accept) >> 8])
+        return found
+
+
+def _references_groups(value) -> bool:
+    """
+    Whether a parsed regular expression contains backreferences, which would refer to
+    the wrong groups once the expression is embedded in a larger one.
+    """
+    if isinstance(value, sre_parse.SubPattern):
+        value = value.data
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            if isinstance(item, tuple) and item and item[0] in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+                return True
+            if _references_groups(item):
+                return True
+    return False
+
+
+def _anchors_string(value) -> bool:
+    """
+    Whether a parsed regular expression contains \\A or \\Z. Matching lines of the
+    alternation are tested again with search(segment, start, end), where \\Z would match at
+    the end of every such line.
+    """
+    if isinstance(value, sre_parse.SubPattern):
+        value = value.data
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            if isinstance(item, tuple) and item and item[0] == sre_parse.AT \
+                    and item[1] in (sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING):
+                return True
+            if _anchors_string(item):
+                return True
+    return False
+
+
+class PatternSet(object):
+    """
+    Regular expressions and literal strings searched for together in one pass over a
+    stream. The expressions are combined into one alternation, so a line matching none
+    of them costs a single search; only a line that matches is tested against each
+    expression on its own. The alternatives are deliberately not capturing groups: re
+    saves and restores every group's marks as it backtracks out of each alternative,
+    which makes a search with hundreds of named groups orders of magnitude slower than
+    the same alternation without them.
+
+    Literal strings go through an Aho-Corasick automaton, which steps through the bytes
+    in Python, at about 10 MB/s whatever the number of strings. Where a block has few
+    bytes that start one of the strings, it is first screened with an alternation of the
+    escaped strings, which runs in re's C matcher and skips every other byte; only the
+    lines it finds go through the automaton. In benchmarks/bench_multigrep.py this
+    raises the throughput for 500 literals from about 9 to about 35 MB/s. When the
+    starting bytes are common, the alternation tries every literal at every one of them
+    and falls to about 1 MB/s, so such blocks are passed to the automaton directly
+    (see _screens).
+
+    Expressions using backreferences, \\A or \\Z, global inline flags that cannot be
+    embedded or a group name already used by another expression are searched separately
+    over each block, as grep_stream does. As there, \\A and \\Z match at the start and end
+    of each searched block rather than of the stream.
+    """
+
+    __slots__ = ["patterns", "_regexes", "_combined", "_embedded", "_separate", "_automaton", "_screen", "_first_bytes"]
+
+    def __init__(self, patterns=(), literals=(), flags=0):
+        """
+        :param patterns: Iterable of regular expressions (str, bytes or compiled).
+        :param literals: Iterable of literal strings (str or bytes) without newlines.
+        :param flags: Additional re flags for the regular expressions.
+        :raises ValueError: If a pattern or literal is given more than once, since results are keyed by it.
+        """
+        patterns = list(patterns)
+        literals = list(literals)
+        self.patterns: list = patterns + literals
+        if len(set(self.patterns)) != len(self.patterns):
+            raise ValueError("Patterns and literals must be unique")
+        self._regexes: list = [compile_pattern(pattern, flags) for pattern in patterns]
+        self._embedded: list = []
+        self._separate: list = []
+
+        parts: list = []
+        group_names: set = set()
+        for index, regex in enumerate(self._regexes):
+            local = "".join(letter for flag, letter in _INLINE_FLAGS if regex.flags & flag)
+            part = b"(?%s:%s)" % (local.encode("ascii"), regex.pattern)
+            try:
+                parsed = sre_parse.parse(regex.pattern, regex.flags)
+                embeddable = not _references_groups(parsed) and not _anchors_string(parsed)
+                re.compile(part, re.MULTILINE)
+            except re.error:
+                embeddable = False
+            # A group name may only be defined once in the alternation.
+            if embeddable and group_names.isdisjoint(regex.groupindex):
+                group_names.update(regex.groupindex)
+                self._embedded.append(index)
+                parts.append(part)
+            else:
+                self._separate.append(index)
+
+        try:
+            self._combined = re.compile(b"|".join(parts), re.MULTILINE) if parts else None
+        except re.error:
+            self._combined = None
+            self._separate = sorted(self._separate + self._embedded)
+            self._embedded = []
+        self._automaton = AhoCorasick(literals) if literals else None
+        self._screen = None
+        self._first_bytes: list = []
+        if self._automaton is not None:
+            self._screen = re.compile(b"|".join(re.escape(literal) for literal in self._automaton.literals))
+            starts: dict = {}
+            for literal in self._automaton.literals:
+                starts[literal[:1]] = starts.get(literal[:1], 0) + 1
+            self._first_bytes = sorted(starts.items(), key=lambda item: -item[1])
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def scan(self, file_obj, count_only=False, max_count=None, block_size=MULTI_GREP_BLOCK_SIZE) -> dict:
+        """
+        Search a binary stream for every pattern at once. The stream is read once, in
+        blocks through one reused buffer; only the current block and any line spanning
+        its end are held in memory.
+
+        :param file_obj: Binary file object supporting readinto.
+        :param count_only: Count the matching lines instead of collecting them.
+        :param max_count: Stop collecting for a pattern after this many matching lines.
+        :param block_size: Number of bytes read per block.
+        :return: Dictionary of pattern to a list of search.GrepMatch, or to a count, in
+                 the order the patterns and then the literals were given.
+        """
+        results: list = [0 if count_only else [] for _ in self.patterns]
+        remaining: list = [max_count] * len(self.patterns)
+        if max_count is not None and max_count <= 0:
+            remaining = [0] * len(self.patterns)
+
+        def record(index: int, line_no: int, byte_offset: int, line) -> None:
+            if remaining[index] is not None:
+                remaining[index] -= 1
+            if count_only:
+                results[index] += 1
+            else:
+                results[index].append(GrepMatch(line_no, byte_offset, bytes(line), (), ()))
+
+        buf = bytearray(block_size)
+        view = memoryview(buf)
+        pending = bytearray()
+        line_no: int = 1
+        offset: int = 0
+
+        while any(limit is None or limit > 0 for limit in remaining):
+            n = file_obj.readinto(view)
+            if n:
+                pending += view[:n]
+                cut = pending.rfind(b"\n") + 1
+                if not cut:
+                    continue
+            else:
+                cut = len(pending)
+                if not cut:
+                    break
+            segment = pending[:cut]
+            del pending[:cut]
+            self._scan_segment(segment, line_no, offset, remaining, record)
+            line_no += segment.count(b"\n")
+            offset += cut
+            if not n:
+                break
+
+        view.release()
+        return dict(zip(self.patterns, results))
+
+    def _scan_segment(self, segment, line_no: int, offset: int, remaining: list, record) -> None:
+        """
+        Search a run of whole lines starting at line line_no and stream offset offset.
+        """
+        def wanted(index: int) -> bool:
+            return remaining[index] is None or remaining[index] > 0
+
+        if self._combined is not None and any(wanted(index) for index in self._embedded):
+            for number, start, end in self._matching_lines(self._combined.search, segment, line_no):
+                line = segment[start:end]
+                for index in self._embedded:
+                    if wanted(index) and self._regexes[index].search(segment, start, end) is not None:
+                        record(index, number, offset + start, line)
+
+        for index in self._separate:
+            if wanted(index):
+                for match in grep_buffer(segment, self._regexes[index], remaining[index]):
+                    record(index, line_no + match.line_no - 1, offset + match.byte_offset, match.line)
+
+        if self._automaton is not None:
+            first: int = len(self._regexes)
+            if any(wanted(first + index) for index in range(len(self._automaton))):
+                search = self._automaton.search
+                if self._screens(segment):
+                    candidates = (
+                        (number, start, segment[start:end])
+                        for number, start, end in self._matching_lines(self._screen.search, segment, line_no)
+                    )
+                else:
+                    candidates = self._lines(segment, line_no)
+                for number, start, line in candidates:
+                    for index in sorted(search(line)):
+                        if wanted(first + index):
+                            record(first + index, number, offset + start, line)
+
+    def _screens(self, segment) -> bool:
+        """
+        Whether screening a segment with the literal alternation is expected to be cheaper
+        than passing all of it through the automaton. The alternation costs about as much
+        per literal tried at a position holding the literal's first byte as the automaton
+        costs per byte, so the positions are counted, in C, until they are too many.
+        """
+        if len(self._first_bytes) > SCREEN_MAX_FIRST_BYTES:
+            return False
+        budget: int = len(segment)
+        for first, literals in self._first_bytes:
+            budget -= segment.count(first) * literals
+            if budget < 0:
+                return False
+        return True
+
+    @staticmethod
+    def _lines(segment, line_no: int):
+        """
+        Every line of a segment as (line number, start, line).
+        """
+        position: int = 0
+        for line in segment.split(b"\n"):
+            yield line_no, position, line
+            position += len(line) + 1
+            line_no += 1
+
+    @staticmethod
+    def _matching_lines(search, segment, line_no: int):
+        """
+        Jump from one line matched by search to the next, as search._grep_jump does.
+
+        :param search: Bound search method of a compiled pattern.
+        :param segment: Run of whole lines.
+        :param line_no: Line number of the first line of segment.
+        :return: Generator of (line number, start, end) of each matching line, end excluding the newline.
+        """
+        size: int = len(segment)
+        pos: int = 0
+
+        while pos < size:
+            match = search(segment, pos)
+            if match is None:
+                return
+
+            newline = segment.rfind(b"\n", pos, match.start())
+            start = pos if newline < 0 else newline + 1
+            if start == size:
+                return
+            if start > pos:
+                line_no += segment.count(b"\n", pos, start)
+            end = segment.find(b"\n", start)
+            if end < 0:
+                end = size
+
+            if match.end() <= end or search(segment, start, end) is not None:
+                yield line_no, start, end
+
+            pos = end + 1
+            line_no += 1
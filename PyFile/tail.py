@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+File: tail.py
+Description: Reading the end of a file and following it as it grows, across truncation and rotation.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import time
+from PyFile.config import TAIL_BLOCK_SIZE
+
+
+def split_lines(data: bytes) -> list:
+    """
+    Split bytes into lines on b"\\n" only, keeping the terminators. Unlike bytes.splitlines,
+    carriage returns and other separators are left inside the lines.
+
+    :param data: Bytes to split.
+    :return: List of bytes lines. The last one has no terminator if data does not end in one.
+    """
+    parts: list = data.split(b"\n")
+    lines: list = [part + b"\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def tail_lines(path: str, n: int, block_size: int = TAIL_BLOCK_SIZE) -> list:
+    """
+    Return the last n lines of a file, reading backwards from the end in blocks so only
+    the blocks holding those lines are read.
+
+    :param path: Path of the file.
+    :param n: Number of lines.
+    :param block_size: Number of bytes read per block.
+    :return: List of bytes lines including their terminators.
+    """
+    if n <= 0:
+        return []
+
+    with open(path, "rb", buffering=0) as file_obj:
+        pos = file_obj.seek(0, os.SEEK_END)
+        if pos == 0:
+            return []
+        file_obj.seek(pos - 1)
+        # A final newline terminates the last line, so one more is needed to find the start of the first.
+        needed = n + 1 if file_obj.read(1) == b"\n" else n
+
+        blocks: list = []
+        newlines = 0
+        while pos > 0 and newlines < needed:
+            size = min(block_size, pos)
+            pos -= size
+            file_obj.seek(pos)
+            block = file_obj.read(size)
+            newlines += block.count(b"\n")
+            blocks.append(block)
+
+    blocks.reverse()
+    return split_lines(b"".join(blocks))[-n:]
+
+
+class Follower(object):
+    """
+    Incrementally reads the complete lines appended to a file. The follower remembers the
+    byte offset just past the last complete line it returned, so following can resume from
+    a saved offset.
+
+    Rotation is detected by the path's (st_dev, st_ino) changing: the old file, which stays
+    open, is read to its end before the new file is opened from its start, so no line is
+    lost or repeated. Truncation is detected by the file shrinking below the read position,
+    in which case reading restarts from the beginning.
+    """
+
+    __slots__ = ["path", "offset", "block_size", "_file_obj", "_identity", "_partial"]
+
+    def __init__(self, path: str, offset=None, block_size: int = TAIL_BLOCK_SIZE):
+        """
+        :param path: Path of the file to follow.
+        :param offset: Byte offset to start from. None starts at the current end of the file.
+        :param block_size: Number of bytes read per block.
+        """
+        self.path: str = path
+        self.offset: int or None = offset
+        self.block_size: int = block_size
+        self._file_obj = None
+        self._identity: tuple or None = None
+        self._partial: bytes = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _open(self) -> bool:
+        try:
+            file_obj = open(self.path, "rb", buffering=0)
+        except FileNotFoundError:
+            return False
+
+        stat = os.fstat(file_obj.fileno())
+        if self.offset is None:
+            self.offset = stat.st_size
+        elif self.offset > stat.st_size:
+            # The file was truncated while nobody was following it.
+            self.offset = 0
+        file_obj.seek(self.offset)
+        self._file_obj = file_obj
+        self._identity = (stat.st_dev, stat.st_ino)
+        self._partial = b""
+        return True
+
+    def _drain(self) -> list:
+        """
+        Read the open file to its current end, keeping any unterminated last line pending.
+
+        :return: List of complete bytes lines.
+        """
+        lines: list = []
+        data = self._file_obj.read(self.block_size)
+        while data:
+            end = data.rfind(b"\n") + 1
+            if end:
+                complete = self._partial + data[:end]
+                lines.extend(split_lines(complete))
+                self.offset += len(complete)
+                self._partial = data[end:]
+            else:
+                self._partial += data
+            data = self._file_obj.read(self.block_size)
+        return lines
+
+    def read(self) -> list:
+        """
+        Return the complete lines appended since the last call. A line still being written
+        is held back until its newline arrives, unless the file is rotated away first, in
+        which case it is returned as it is.
+
+        :return: List of bytes lines including their terminators.
+        """
+        if self._file_obj is None and not self._open():
+            return []
+
+        lines: list = self._drain()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Rotated away and not yet recreated: keep reading the old file meanwhile.
+            return lines
+
+        if (stat.st_dev, stat.st_ino) != self._identity:
+            # Pick up anything written to the old file between the drain and the stat.
+            lines.extend(self._drain())
+            if self._partial:
+                lines.append(self._partial)
+            self.close()
+            self.offset = 0
+            if self._open():
+                lines.extend(self._drain())
+        elif stat.st_size < self._file_obj.tell():
+            self._file_obj.seek(0)
+            self.offset = 0
+            self._partial = b""
+            lines.extend(self._drain())
+        return lines
+
+    def close(self) -> None:
+        """
+        Close the followed file. Following can resume later from offset.
+
+        :return: No return value.
+        """
+        if self._file_obj is not None:
+            self._file_obj.close()
+            self._file_obj = None
+
+
+def follow(path: str, offset=None, min_interval=0.1, max_interval=1.0, timeout=None):
+    """
+    Generator yielding complete lines as they are appended to a file, like tail -f. The file
+    is polled, with the interval shrinking to min_interval while lines are arriving and
+    backing off to max_interval when idle.
+
+    :param path: Path of the file to follow.
+    :param offset: Byte offset to start from. None starts at the current end of the file.
+    :param min_interval: Shortest delay between polls in seconds.
+    :param max_interval: Longest delay between polls in seconds.
+    :param timeout: Stop after this many seconds without new lines. None follows forever.
+    :return: Generator of bytes lines including their terminators.
+    """
+    with Follower(path, offset) as follower:
+        interval = min_interval
+        idle_since = time.monotonic()
+        while True:
+            lines = follower.read()
+            if lines:
+                yield from lines
+                interval = min_interval
+                idle_since = time.monotonic()
+                continue
+
+            if timeout is not None and time.monotonic() - idle_since >= timeout:
+                return
+            time.sleep(interval)
+            interval = min(max_interval, interval * 2)
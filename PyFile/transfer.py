@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+File: transfer.py
+Description: Zero-copy file copies and memory mapped access to file contents.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import errno
+import mmap
+import shutil
+from contextlib import contextmanager
+from PyFile.config import HASH_BLOCK_SIZE, MMAP_MIN_SIZE, COPY_BLOCK_SIZE
+
+
+# Errors meaning an in-kernel copy is not possible between two files, so the next strategy is tried.
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.EPERM}
+
+
+@contextmanager
+def map_file(file_obj):
+    """
+    Memory map an open binary file read-only. Empty files, which cannot be mapped,
+    yield an empty bytes object instead.
+
+    :param file_obj: File object opened in binary mode.
+    :return: mmap or bytes
+    """
+    try:
+        buf = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        yield b""
+        return
+
+    try:
+        yield buf
+    finally:
+        buf.close()
+
+
+@contextmanager
+def map_view(file_obj):
+    """
+    Read-only memoryview over a memory map of an open binary file. Slicing the view
+    never copies; slices must not outlive the context.
+
+    :param file_obj: File object opened in binary mode.
+    :return: memoryview
+    """
+    with map_file(file_obj) as buf:
+        view = memoryview(buf)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+def iter_blocks(path: str, block_size: int = HASH_BLOCK_SIZE):
+    """
+    Iterate over the contents of a file as memoryview blocks. Files of at least
+    MMAP_MIN_SIZE bytes are sliced out of a memory map, smaller ones are read into a
+    single reused buffer. Each block is only valid until the next one is requested.
+
+    :param path: Path of the file.
+    :param block_size: Number of bytes per block.
+    :return: Generator of memoryview
+    """
+    with open(path, "rb", buffering=0) as file_obj:
+        if os.fstat(file_obj.fileno()).st_size >= MMAP_MIN_SIZE:
+            with map_view(file_obj) as view:
+                for start in range(0, len(view), block_size):
+                    block = view[start:start + block_size]
+                    try:
+                        yield block
+                    finally:
+                        # An unreleased slice would keep the map from being closed if the consumer stops early.
+                        block.release()
+            return
+
+        buf = bytearray(block_size)
+        view = memoryview(buf)
+        try:
+            n = file_obj.readinto(buf)
+            while n:
+                yield view if n == block_size else view[:n]
+                n = file_obj.readinto(buf)
+        finally:
+            view.release()
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> None:
+    while os.copy_file_range(src_fd, dst_fd, min(size, COPY_BLOCK_SIZE)):
+        pass
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> None:
+    while os.sendfile(dst_fd, src_fd, None, min(size, COPY_BLOCK_SIZE)):
+        pass
+
+
+def copy_file(source: str, destination: str, block_size: int = HASH_BLOCK_SIZE) -> int:
+    """
+    Copy a file's contents and permission bits without passing the bytes through Python
+    where the platform allows it: os.copy_file_range (which may share extents on
+    copy-on-write filesystems) is tried first, then os.sendfile, then a chunked copy
+    through a single reused buffer. Every strategy advances the file offsets, so each
+    one picks up where the previous one stopped.
+
+    :param source: Path of the file to copy.
+    :param destination: Path of the copy. An existing file is overwritten.
+    :param block_size: Number of bytes per block for the chunked fallback.
+    :return: Number of bytes copied.
+    :raises shutil.SameFileError: If destination is the source file itself.
+    """
+    try:
+        same = os.path.samefile(source, destination)
+    except OSError:
+        same = False
+    if same:
+        raise shutil.SameFileError(f"{source!r} and {destination!r} are the same file")
+
+    copiers: list = []
+    if hasattr(os, "copy_file_range"):
+        copiers.append(_copy_file_range)
+    if hasattr(os, "sendfile"):
+        copiers.append(_sendfile)
+
+    with open(source, "rb", buffering=0) as src, open(destination, "wb", buffering=0) as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        size = os.fstat(src_fd).st_size
+
+        for copier in copiers:
+            try:
+                copier(src_fd, dst_fd, size)
+                break
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+
+        buf = bytearray(block_size)
+        view = memoryview(buf)
+        n = src.readinto(buf)
+        while n:
+            dst.write(view[:n])
+            n = src.readinto(buf)
+        view.release()
+        copied = dst.tell()
+
+    shutil.copymode(source, destination)
+    return copied
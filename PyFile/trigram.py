@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+"""
+File: trigram.py
+Description: Trigram inverted index that narrows regular expression searches over a corpus.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import re
+import sys
+import mmap
+import json
+import struct
+import bisect
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from PyFile.config import TRIGRAM_CHUNK_SIZE
+from PyFile.duplicates import _stat_paths
+from PyFile.search import compile_pattern, grep_paths, is_binary
+from PyFile.transfer import map_file
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+IndexUpdate = namedtuple("IndexUpdate", ["added", "updated", "removed", "unchanged"])
+IndexUpdate.__doc__ = """
+Number of files added to, reindexed in, dropped from and carried over unchanged in a
+trigram index by TrigramIndex.update().
+"""
+
+_ORDER = sys.byteorder.encode("ascii")[:1]
+_REPEATS = tuple(
+    getattr(sre_parse, name) for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") if hasattr(sre_parse, name)
+)
+
+
+def trigrams(data) -> set:
+    """
+    Collect the distinct trigrams of a bytes-like object. A trigram is keyed by the
+    integer value of its three bytes read little endian.
+
+    Rather than slicing every offset, the data is read as 32-bit words at each of the
+    four alignments, so the set is built from len(data) words in C and masked afterwards.
+
+    :param data: Bytes-like object.
+    :return: Set of integer keys.
+    """
+    size: int = len(data)
+    if size < 3:
+        return set()
+
+    view = memoryview(data)
+    words: set = set()
+    for offset in range(4):
+        count = (size - offset) // 4
+        if count:
+            values = array("I")
+            values.frombytes(view[offset:offset + 4 * count])
+            if sys.byteorder != "little":
+                values.byteswap()
+            words.update(values)
+    view.release()
+
+    keys = {word & 0xFFFFFF for word in words}
+    keys.add(int.from_bytes(data[size - 3:size], "little"))
+    return keys
+
+
+def _file_trigrams(path: str, chunk_size=TRIGRAM_CHUNK_SIZE):
+    """
+    Worker function for TrigramIndex.update(). Extracts the trigrams of a text file in
+    overlapping chunks of a memory map. Binary files have no trigrams.
+
+    :return: Tuple of (path, sorted array of keys), or (path, None) if the file is unreadable.
+    """
+    keys: set = set()
+    try:
+        with open(path, "rb") as file_obj:
+            if not is_binary(file_obj):
+                with map_file(file_obj) as buf:
+                    for start in range(0, len(buf), chunk_size):
+                        keys.update(trigrams(buf[start:start + chunk_size + 2]))
+    except OSError:
+        return path, None
+    return path, array("I", sorted(keys))
+
+
+def _key(data: bytes) -> int:
+    return int.from_bytes(data, "little")
+
+
+def _and(nodes: list):
+    nodes = [node for node in nodes if node is not None]
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+
+def _or(nodes: list):
+    if not nodes or any(node is None for node in nodes):
+        return None
+    return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+
+def _literal_query(run: bytes, ignore_case: bool):
+    """
+    Query node requiring every trigram of a literal byte string. Under IGNORECASE, which
+    only folds ASCII for bytes patterns, each trigram becomes an OR of its case variants.
+    """
+    nodes: list = []
+    for i in range(len(run) - 2):
+        trigram = run[i:i + 3]
+        if not ignore_case:
+            nodes.append(_key(trigram))
+            continue
+        variants: set = {b""}
+        for byte in trigram:
+            cases = {bytes([byte]).lower(), bytes([byte]).upper()}
+            variants = {prefix + case for prefix in variants for case in cases}
+        nodes.append(_or([_key(variant) for variant in sorted(variants)]))
+    return _and(nodes)
+
+
+def _plan(items, ignore_case: bool):
+    """
+    Translate a parsed regular expression into a query over trigrams. A node is an
+    integer key, ("and", nodes), ("or", nodes) or None, which places no constraint on
+    the files. The query is necessary, not sufficient: every file the expression can
+    match satisfies it.
+    """
+    nodes: list = []
+    run = bytearray()
+
+    def flush():
+        if len(run) >= 3:
+            nodes.append(_literal_query(bytes(run), ignore_case))
+        run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(av)
+        elif op is sre_parse.AT:
+            continue  # Zero width; the literals either side are still adjacent.
+        elif op is sre_parse.SUBPATTERN:
+            group_ignore = (ignore_case or bool(av[1] & re.IGNORECASE)) and not av[2] & re.IGNORECASE
+            if group_ignore == ignore_case and all(child_op is sre_parse.LITERAL for child_op, _ in av[3]):
+                run.extend(child_av for _, child_av in av[3])
+            else:
+                flush()
+                nodes.append(_plan(av[3], group_ignore))
+        elif op is sre_parse.BRANCH:
+            flush()
+            nodes.append(_or([_plan(branch, ignore_case) for branch in av[1]]))
+        elif op in _REPEATS:
+            flush()
+            if av[0] >= 1:
+                nodes.append(_plan(av[2], ignore_case))
+        else:
+            flush()
+    flush()
+    return _and(nodes)
+
+
+def query_plan(regex):
+    """
+    Build the trigram query for a compiled bytes regular expression.
+
+    :param regex: Compiled bytes regular expression (see search.compile_pattern).
+    :return: Query node, or None if the expression cannot be narrowed by trigrams.
+    """
+    parsed = sre_parse.parse(regex.pattern, regex.flags)
+    return _plan(parsed, bool(parsed.state.flags & re.IGNORECASE))
+
+
+class TrigramIndex(object):
+    """
+    Inverted index from trigrams to the files containing them, after Russ Cox's codesearch.
+    A query is reduced to the trigrams any match must contain, the posting lists of those
+    trigrams select the candidate files, and only the candidates are searched with the
+    real expression.
+
+    The index is one file: a header, the indexed files as JSON with the size and mtime
+    they had when read, the sorted trigram keys, the start of each key's posting list and
+    the posting lists of file numbers. Everything after the JSON is read in place from a
+    memory map. update() only reads the files whose size or mtime changed; the index
+    is not consulted about files changed since, so update it before searching.
+    """
+
+    __slots__ = ["path", "_docs", "_map", "_keys", "_starts", "_postings"]
+
+    _HEADER = struct.Struct("<4sIc3xIIQQQQQ")
+    _MAGIC = b"PFTI"
+    _VERSION = 1
+
+    def __init__(self, path: str):
+        """
+        Open an index file. A missing or invalid file gives an empty index, which the
+        next update() replaces.
+
+        :param path: Path of the index file.
+        """
+        self.path: str = path
+        self._docs: list = []
+        self._map = None
+        self._keys = self._starts = self._postings = ()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def paths(self) -> list:
+        """
+        The paths of the indexed files.
+
+        :return: List of paths.
+        """
+        return [doc[0] for doc in self._docs]
+
+    def close(self) -> None:
+        """
+        Release the memory map of the index file.
+
+        :return: No return value.
+        """
+        for view in (self._keys, self._starts, self._postings):
+            if isinstance(view, memoryview):
+                view.release()
+        self._keys = self._starts = self._postings = ()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as file_obj:
+                buf = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+
+        try:
+            fields = self._HEADER.unpack_from(buf)
+            magic, version, order, n_docs, n_keys, docs_size, keys_at, starts_at, postings_at, n_postings = fields
+            if magic != self._MAGIC or version != self._VERSION or order != _ORDER:
+                raise ValueError
+            if postings_at + 4 * n_postings != len(buf) or starts_at + 8 * (n_keys + 1) > postings_at:
+                raise ValueError
+            docs = json.loads(buf[self._HEADER.size:self._HEADER.size + docs_size].decode("ascii"))
+            if len(docs) != n_docs:
+                raise ValueError
+        except (struct.error, ValueError, UnicodeDecodeError):
+            buf.close()
+            return
+
+        view = memoryview(buf)
+        self._docs = [tuple(doc) for doc in docs]
+        self._map = buf
+        self._keys = view[keys_at:keys_at + 4 * n_keys].cast("I")
+        self._starts = view[starts_at:starts_at + 8 * (n_keys + 1)].cast("Q")
+        self._postings = view[postings_at:postings_at + 4 * n_postings].cast("I")
+        view.release()
+
+    def _posting(self, key: int):
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return ()
+        return self._postings[self._starts[i]:self._starts[i + 1]]
+
+    def _evaluate(self, node) -> set:
+        if isinstance(node, int):
+            return set(self._posting(node))
+        kind, children = node
+        if kind == "or":
+            result: set = set()
+            for child in children:
+                result.update(self._evaluate(child))
+            return result
+
+        # Evaluate single trigrams first, smallest posting list first, to shrink the set early.
+        leaves = sorted((child for child in children if isinstance(child, int)), key=lambda key: len(self._posting(key)))
+        result = None
+        for child in leaves + [child for child in children if not isinstance(child, int)]:
+            found = self._evaluate(child)
+            result = found if result is None else result & found
+            if not result:
+                return set()
+        return result
+
+    def candidates(self, pattern, flags=0) -> list:
+        """
+        The indexed files that may contain a match, in index order. Files whose trigrams
+        rule out a match are left out; the rest still need searching.
+
+        :param pattern: Regular expression (str, bytes or compiled).
+        :param flags: Additional re flags.
+        :return: List of paths.
+        """
+        node = query_plan(compile_pattern(pattern, flags))
+        if node is None:
+            return self.paths
+        return [self._docs[doc_id][0] for doc_id in sorted(self._evaluate(node))]
+
+    def search(self, pattern, flags=0, max_count=None, workers=1):
+        """
+        Search the indexed files with a regular expression, reading only the candidates
+        the index selects. Results are the same as searching every indexed file while
+        the index is up to date.
+
+        :param pattern: Regular expression (str, bytes or compiled).
+        :param flags: Additional re flags.
+        :param max_count: Stop after this many matching lines in each file.
+        :param workers: Number of worker processes (see search.grep_paths).
+        :return: Generator of (path, GrepMatch).
+        """
+        regex = compile_pattern(pattern, flags)
+        return grep_paths(self.candidates(regex), regex, workers, max_count)
+
+    def update(self, files, workers=1, chunk_size=TRIGRAM_CHUNK_SIZE) -> IndexUpdate:
+        """
+        Make the index cover exactly the given files. Files whose size and mtime match
+        the index keep their postings without being read; new and changed files are read
+        and files no longer present are dropped. The index file is replaced atomically.
+
+        :param files: Directory path, directory.Directory, or iterable of paths or Files.
+        :param workers: Number of processes extracting trigrams from changed files.
+        :param chunk_size: Number of bytes of a file scanned at a time.
+        :return: IndexUpdate
+        """
+        old_ids: dict = {doc[0]: doc_id for doc_id, doc in enumerate(self._docs)}
+        docs: list = []
+        remap: list = [-1] * len(self._docs)
+        changed: list = []
+        updated: int = 0
+        own_path = os.path.abspath(self.path)
+        seen: set = {own_path, own_path + ".tmp"}
+
+        for path, stat in _stat_paths(files, 0):
+            path = os.path.abspath(path)
+            if path in seen:
+                continue
+            seen.add(path)
+            doc = (path, stat.st_size, stat.st_mtime_ns)
+            old_id = old_ids.get(path)
+            if old_id is not None and self._docs[old_id] == doc:
+                remap[old_id] = len(docs)
+            else:
+                updated += old_id is not None
+                changed.append(len(docs))
+            docs.append(doc)
+
+        unchanged: int = len(docs) - len(changed)
+        result = IndexUpdate(len(changed) - updated, updated, len(self._docs) - unchanged - updated, unchanged)
+        if not changed and not result.removed and remap == list(range(len(docs))):
+            return result
+
+        postings: dict = {}
+        for i in range(len(self._keys)):
+            doc_ids = [remap[old] for old in self._postings[self._starts[i]:self._starts[i + 1]] if remap[old] >= 0]
+            if doc_ids:
+                postings[self._keys[i]] = doc_ids
+
+        paths: list = [docs[doc_id][0] for doc_id in changed]
+        chunk_sizes: list = [chunk_size] * len(paths)
+        if workers == 1 or len(paths) < 2:
+            self._collect(docs, changed, map(_file_trigrams, paths, chunk_sizes), postings)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_file_trigrams, paths, chunk_sizes, chunksize=16)
+                self._collect(docs, changed, results, postings)
+
+        self._save(docs, postings)
+        return result
+
+    @staticmethod
+    def _collect(docs: list, doc_ids: list, results, postings: dict) -> None:
+        for doc_id, (path, keys) in zip(doc_ids, results):
+            if keys is None:
+                # Unreadable now; an impossible mtime makes the next update read it again.
+                docs[doc_id] = (path, docs[doc_id][1], -1)
+                continue
+            for key in keys:
+                postings.setdefault(key, []).append(doc_id)
+
+    def _save(self, docs: list, postings: dict) -> None:
+        keys = array("I", sorted(postings))
+        starts = array("Q", [0])
+        flat = array("I")
+        for key in keys:
+            flat.extend(sorted(postings[key]))
+            starts.append(len(flat))
+
+        docs_json = json.dumps([list(doc) for doc in docs]).encode("ascii")
+        keys_at = self._align(self._HEADER.size + len(docs_json))
+        starts_at = self._align(keys_at + 4 * len(keys))
+        postings_at = self._align(starts_at + 8 * len(starts))
+        header = self._HEADER.pack(
+            self._MAGIC,
+            self._VERSION,
+            _ORDER,
+            len(docs),
+            len(keys),
+            len(docs_json),
+            keys_at,
+            starts_at,
+            postings_at,
+            len(flat),
+        )
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as file_obj:
+            file_obj.write(header)
+            file_obj.write(docs_json)
+            for offset, section in ((keys_at, keys), (starts_at, starts), (postings_at, flat)):
+                file_obj.write(b"\0" * (offset - file_obj.tell()))
+                section.tofile(file_obj)
+        os.replace(tmp_path, self.path)
+
+        self.close()
+        self._load()
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return (offset + 7) & ~7
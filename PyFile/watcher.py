@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+"""
+File: watcher.py
+Description: Change notification for many File objects (inotify with a stat polling fallback).
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from collections import namedtuple, OrderedDict
+
+
+WatchEvent = namedtuple("WatchEvent", ["kind", "path", "files"])
+
+MODIFIED = "modified"
+DELETED = "deleted"
+MOVED = "moved"
+
+# When several events for a path are coalesced, the most severe kind wins.
+_SEVERITY = {MODIFIED: 0, MOVED: 1, DELETED: 2}
+
+
+class InotifyBackend(object):
+    """
+    Linux inotify backend driven through ctypes, so no extra dependencies are needed.
+
+    The parent directory of each path is watched rather than the file itself, and events
+    are matched to paths by name. A watch on the file would follow its inode, losing
+    track of the path once the file is deleted and recreated or replaced by a rename.
+    Paths whose directory does not exist yet are checked again on every read.
+    """
+
+    __slots__ = ["_libc", "_fd", "_dirs", "_dir_wds", "_present", "_orphans"]
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    )
+
+    # How often paths without a directory are checked while waiting for events.
+    ORPHAN_INTERVAL = 1.0
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc.inotify_init1.argtypes = [ctypes.c_int]
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self._fd: int = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # wd -> (directory, {name: path}), directory -> wd, path -> whether it exists.
+        self._dirs: dict = {}
+        self._dir_wds: dict = {}
+        self._present: dict = {}
+        self._orphans: set = set()
+
+    def add(self, path: str) -> None:
+        """
+        Start watching a path. The path need not exist.
+
+        :param path: Absolute path of the file.
+        :return: No return value.
+        """
+        if path in self._present:
+            return
+        self._present[path] = os.path.lexists(path)
+        if not self._attach(path):
+            self._orphans.add(path)
+
+    def _attach(self, path: str) -> bool:
+        """
+        Watch the directory of a path, sharing the watch with its siblings.
+
+        :return: Whether the directory is now watched.
+        """
+        directory, name = os.path.split(path)
+        wd = self._dir_wds.get(directory)
+        if wd is None:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR):
+                    return False
+                raise OSError(err, os.strerror(err), directory)
+            self._dir_wds[directory] = wd
+            self._dirs.setdefault(wd, (directory, {}))
+        self._dirs[wd][1][name] = path
+        return True
+
+    def remove(self, path: str) -> None:
+        """
+        Stop watching a path.
+
+        :param path: Absolute path of the file.
+        :return: No return value.
+        """
+        if self._present.pop(path, None) is None:
+            return
+        self._orphans.discard(path)
+        directory, name = os.path.split(path)
+        wd = self._dir_wds.get(directory)
+        if wd is None:
+            return
+        names = self._dirs[wd][1]
+        names.pop(name, None)
+        if not names:
+            self._detach(wd)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _detach(self, wd: int) -> dict:
+        """
+        Forget a directory watch.
+
+        :return: The {name: path} map of the directory.
+        """
+        directory, names = self._dirs.pop(wd, (None, {}))
+        if directory is not None and self._dir_wds.get(directory) == wd:
+            del self._dir_wds[directory]
+        return names
+
+    def read(self, timeout: float or None) -> list:
+        """
+        Wait up to timeout seconds for events.
+
+        :param timeout: Seconds to wait, or None to wait indefinitely.
+        :return: List of (kind, path) tuples.
+        """
+        events: list = self._adopt_orphans()
+        if events:
+            timeout = 0
+        elif self._orphans and (timeout is None or timeout > self.ORPHAN_INTERVAL):
+            timeout = self.ORPHAN_INTERVAL
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return events
+
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as ex:
+            if ex.errno == errno.EAGAIN:
+                return events
+            raise
+
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _, name_len = self._EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + self._EVENT.size:offset + self._EVENT.size + name_len].rstrip(b"\0"))
+            offset += self._EVENT.size + name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped; have every watched file looked at again.
+                events.extend(self._resync())
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+                # The directory itself went away; its paths wait for it to come back.
+                for path in self._detach(wd).values():
+                    self._orphans.add(path)
+                    if self._present[path]:
+                        self._present[path] = False
+                        events.append((DELETED, path))
+                if not mask & self.IN_IGNORED:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                continue
+
+            path = self._dirs.get(wd, (None, {}))[1].get(name)
+            if path is None:
+                continue
+            if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self._present[path] = False
+                events.append((DELETED, path))
+            elif mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                # Something already at the path has been replaced, as when renamed over.
+                events.append((MOVED if self._present[path] else MODIFIED, path))
+                self._present[path] = True
+            else:
+                events.append((MODIFIED, path))
+        return events
+
+    def _adopt_orphans(self) -> list:
+        """
+        Watch the directories of orphaned paths that now exist.
+
+        :return: Events for paths that appeared with their directory.
+        """
+        events: list = []
+        for path in list(self._orphans):
+            if self._attach(path):
+                self._orphans.discard(path)
+                if os.path.lexists(path):
+                    events.append((MOVED if self._present[path] else MODIFIED, path))
+                    self._present[path] = True
+        return events
+
+    def _resync(self) -> list:
+        """
+        Recheck every path after the kernel dropped events.
+
+        :return: Events for all paths that exist or have just disappeared.
+        """
+        events: list = []
+        for path, present in self._present.items():
+            exists = os.path.lexists(path)
+            if exists or present:
+                events.append((MODIFIED if exists else DELETED, path))
+            self._present[path] = exists
+        return events
+
+    def close(self) -> None:
+        """
+        Release the inotify file descriptor.
+
+        :return: No return value.
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingBackend(object):
+    """
+    Portable backend that stats watched paths in batches. The polling interval shrinks
+    to min_interval while changes are being seen and backs off to max_interval when idle.
+    """
+
+    __slots__ = ["min_interval", "max_interval", "batch_size", "interval", "_signatures", "_order", "_cursor"]
+
+    def __init__(self, min_interval=0.1, max_interval=5.0, batch_size=4096):
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        self.batch_size: int = batch_size
+        self.interval: float = min_interval
+        self._signatures: OrderedDict = OrderedDict()
+        # Sweep order over the watched paths, rebuilt only after the set of paths changes.
+        self._order: list or None = None
+        self._cursor: int = 0
+
+    @staticmethod
+    def _stat(path: str) -> tuple or None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def add(self, path: str) -> None:
+        """
+        Start watching a path.
+
+        :param path: Absolute path of the file.
+        :return: No return value.
+        """
+        if path not in self._signatures:
+            self._order = None
+        self._signatures[path] = self._stat(path)
+
+    def remove(self, path: str) -> None:
+        """
+        Stop watching a path.
+
+        :param path: Absolute path of the file.
+        :return: No return value.
+        """
+        if path in self._signatures:
+            del self._signatures[path]
+            self._order = None
+
+    def read(self, timeout: float or None) -> list:
+        """
+        Stat the watched paths batch by batch until a batch reports changes or the timeout
+        expires. The adaptive interval is slept once per full sweep over the paths.
+
+        :param timeout: Seconds to wait, or None to wait indefinitely.
+        :return: List of (kind, path) tuples.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            events, sweep_done = self._read_batch()
+            if events:
+                self.interval = self.min_interval
+                return events
+            if not sweep_done:
+                continue
+
+            self.interval = min(self.max_interval, self.interval * 2)
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return []
+            time.sleep(delay)
+
+    def _read_batch(self) -> tuple:
+        """
+        Stat the next batch of paths.
+
+        :return: Tuple of (events, whether this batch completed a sweep over all paths).
+        """
+        if self._order is None:
+            self._order = list(self._signatures)
+        paths = self._order
+        if self._cursor >= len(paths):
+            self._cursor = 0
+        batch = paths[self._cursor:self._cursor + self.batch_size]
+        self._cursor += len(batch)
+
+        events: list = []
+        for path in batch:
+            previous = self._signatures[path]
+            current = self._stat(path)
+            if current == previous:
+                continue
+            self._signatures[path] = current
+            if current is None:
+                events.append((DELETED, path))
+            elif previous is not None and current[:2] != previous[:2]:
+                events.append((MOVED, path))
+            else:
+                events.append((MODIFIED, path))
+        return events, self._cursor >= len(paths)
+
+    def close(self) -> None:
+        """
+        Nothing to release.
+
+        :return: No return value.
+        """
+
+
+class Watcher(object):
+    """
+    Watches many File objects at once and refreshes their cached stat and digest state
+    when they change. Events for the same path are coalesced and delivered through an
+    optional callback, as the return value of poll(), or by iterating over events().
+    """
+
+    __slots__ = ["backend", "callback", "_files"]
+
+    def __init__(self, callback=None, backend=None):
+        if backend is None:
+            try:
+                backend = InotifyBackend()
+            except OSError:
+                backend = PollingBackend()
+        self.backend = backend
+        self.callback = callback
+        self._files: dict = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, file) -> None:
+        """
+        Start watching a File.
+
+        :param file: File to watch.
+        :return: No return value.
+        """
+        path = file.abs_path
+        files = self._files.get(path)
+        if files is None:
+            self.backend.add(path)
+            self._files[path] = [file]
+        elif not any(tracked is file for tracked in files):
+            files.append(file)
+
+    def remove(self, file) -> None:
+        """
+        Stop watching a File.
+
+        :param file: File to stop watching.
+        :return: No return value.
+        """
+        path = file.abs_path
+        files = [tracked for tracked in self._files.get(path, ()) if tracked is not file]
+        if files:
+            self._files[path] = files
+        elif path in self._files:
+            del self._files[path]
+            self.backend.remove(path)
+
+    def poll(self, timeout=0.0) -> list:
+        """
+        Collect pending changes, waiting up to timeout seconds for the first one.
+
+        :param timeout: Seconds to wait, or None to wait indefinitely.
+        :return: List of coalesced WatchEvents.
+        """
+        pending: OrderedDict = OrderedDict()
+        raw = self.backend.read(timeout)
+        while raw:
+            for kind, path in raw:
+                previous = pending.get(path)
+                if previous == DELETED and kind != DELETED:
+                    # Deleted and recreated within one poll: the path now names a new file.
+                    pending[path] = MOVED
+                elif previous is None or _SEVERITY[kind] > _SEVERITY[previous]:
+                    pending[path] = kind
+            # Drain whatever else is already queued without waiting.
+            raw = self.backend.read(0)
+
+        events: list = []
+        for path, kind in pending.items():
+            files = tuple(self._files.get(path, ()))
+            for file in files:
+                file.refresh()
+            event = WatchEvent(kind, path, files)
+            events.append(event)
+            if self.callback is not None:
+                self.callback(event)
+        return events
+
+    def events(self, timeout=None):
+        """
+        Iterate over events as they arrive.
+
+        :param timeout: Stop after this many seconds without any event, or None to run forever.
+        :return: Generator of WatchEvent
+        """
+        while True:
+            events = self.poll(timeout)
+            if not events and timeout is not None:
+                return
+            yield from events
+
+    def close(self) -> None:
+        """
+        Stop watching everything and release backend resources.
+
+        :return: No return value.
+        """
+        self.backend.close()
+        self._files.clear()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+"""
+File: writer.py
+Description: Buffered, batched and optionally atomic binary writer with a durability policy.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+from enum import Enum
+from PyFile.config import WRITE_BUFFER_SIZE, WRITE_SYNC_BYTES
+from PyFile import transfer
+
+
+class Durability(Enum):
+    NONE = 0
+    ON_CLOSE = 1
+    PERIODIC = 2
+
+
+# Upper bound on the number of buffers passed to a single writev call.
+try:
+    IOV_MAX: int = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
+
+
+def _create_temp(directory: str, basename: str) -> str:
+    """
+    Create an empty, uniquely named temporary file next to a target file. Unlike
+    tempfile.mkstemp it is created with mode 0o666 less the current umask, the permissions
+    open() would give the target itself.
+
+    :param directory: Directory of the target file.
+    :param basename: Name of the target file.
+    :return: Path of the temporary file.
+    """
+    while True:
+        tmp_path = os.path.join(directory, f".{basename}.{os.urandom(6).hex()}.tmp")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return tmp_path
+
+
+def write_all(fd: int, buffers: list) -> int:
+    """
+    Write a list of bytes-like buffers to a file descriptor, gathering them into as few
+    os.writev calls as possible and resuming after partial writes.
+
+    :param fd: File descriptor open for writing.
+    :param buffers: List of bytes-like objects.
+    :return: Number of bytes written.
+    """
+    if not hasattr(os, "writev"):
+        data = b"".join(buffers)
+        view = memoryview(data)
+        written = 0
+        while written < len(data):
+            written += os.write(fd, view[written:])
+        return written
+
+    total = 0
+    start = 0
+    while start < len(buffers):
+        batch = buffers[start:start + IOV_MAX]
+        start += len(batch)
+        remaining = sum(len(buf) for buf in batch)
+        total += remaining
+        while remaining:
+            n = os.writev(fd, batch)
+            remaining -= n
+            if not remaining:
+                break
+            # Partial write: drop the buffers that were written and trim the first unfinished one.
+            while n >= len(batch[0]):
+                n -= len(batch[0])
+                batch.pop(0)
+            batch[0] = memoryview(batch[0])[n:]
+    return total
+
+
+def fsync_directory(path: str) -> None:
+    """
+    Flush a directory entry to disk so a rename or file creation inside it survives a crash.
+    A no-op where directories cannot be opened (Windows).
+
+    :param path: Path of the directory.
+    :return: No return value.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Writer(object):
+    """
+    Binary writer for many small records. Writes are collected in memory and handed to
+    the kernel with a single os.writev per flush, so each write costs a list append.
+
+    In atomic mode the data goes to a temporary file in the destination's directory, which
+    is fsynced and renamed over the destination on close; readers see either the old or
+    the new contents, never a partial file. An exception inside a with block discards the
+    temporary file instead.
+
+    The durability policy decides when data is forced to disk: Durability.NONE leaves it
+    to the OS, ON_CLOSE fsyncs once on close and PERIODIC additionally fsyncs whenever
+    sync_every bytes have been written since the last fsync.
+    """
+
+    __slots__ = [
+        "path",
+        "atomic",
+        "durability",
+        "sync_every",
+        "buffer_size",
+        "encoding",
+        "on_flush",
+        "closed",
+        "_fd",
+        "_tmp_path",
+        "_pending",
+        "_pending_bytes",
+        "_unsynced",
+        "_written",
+    ]
+
+    def __init__(
+        self,
+        path: str,
+        append=False,
+        atomic=False,
+        durability=Durability.NONE,
+        sync_every=WRITE_SYNC_BYTES,
+        buffer_size=WRITE_BUFFER_SIZE,
+        encoding="utf-8",
+        on_flush=None,
+    ):
+        """
+        :param path: Path of the file to write.
+        :param append: Append to the file instead of truncating it.
+        :param atomic: Write to a temporary file and rename it over path on close.
+        :param durability: Durability policy.
+        :param sync_every: Bytes between fsyncs under Durability.PERIODIC.
+        :param buffer_size: Bytes to buffer before flushing to the kernel.
+        :param encoding: Encoding used for str records.
+        :param on_flush: Optional callable run after every flush that wrote data.
+        """
+        self.path: str = path
+        self.atomic: bool = atomic
+        self.durability: Durability = durability
+        self.sync_every: int = sync_every
+        self.buffer_size: int = buffer_size
+        self.encoding: str = encoding
+        self.on_flush = on_flush
+        self.closed: bool = False
+        self._tmp_path: str or None = None
+        self._pending: list = []
+        self._pending_bytes: int = 0
+        self._unsynced: int = 0
+        self._written: int = 0
+
+        flags = os.O_WRONLY | getattr(os, "O_BINARY", 0) | (os.O_APPEND if append else 0)
+        if atomic:
+            directory, basename = os.path.split(os.path.abspath(path))
+            self._tmp_path = _create_temp(directory, basename)
+            if os.path.exists(path):
+                if append:
+                    transfer.copy_file(path, self._tmp_path)
+                else:
+                    os.chmod(self._tmp_path, os.stat(path).st_mode & 0o7777)
+            self._fd = os.open(self._tmp_path, flags)
+        else:
+            self._fd = os.open(path, flags | os.O_CREAT | (0 if append else os.O_TRUNC), 0o666)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def bytes_written(self) -> int:
+        """
+        Number of bytes accepted so far, including those still buffered.
+
+        :return: Integer
+        """
+        return self._written + self._pending_bytes
+
+    def write(self, data) -> int:
+        """
+        Buffer a record. bytes are kept by reference; str is encoded and other bytes-like
+        objects are copied, so the caller may reuse them immediately.
+
+        :param data: str or bytes-like object.
+        :return: Number of bytes buffered.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed writer")
+        if type(data) is not bytes:
+            if isinstance(data, str):
+                data = data.encode(self.encoding)
+            elif self._pending_bytes + len(data) < self.buffer_size:
+                data = bytes(data)
+            else:
+                # Too large to be worth copying: write it out now along with what is buffered.
+                n = len(data)
+                self._pending.append(data)
+                self._pending_bytes += n
+                self.flush()
+                return n
+
+        n = len(data)
+        self._pending.append(data)
+        self._pending_bytes += n
+        if self._pending_bytes >= self.buffer_size:
+            self.flush()
+        return n
+
+    def writelines(self, records) -> int:
+        """
+        Buffer many records. Separators are not added, as with io.IOBase.writelines.
+
+        :param records: Iterable of str or bytes-like objects.
+        :return: Number of bytes buffered.
+        """
+        write = self.write
+        return sum(write(record) for record in records)
+
+    def flush(self) -> None:
+        """
+        Hand every buffered record to the kernel in batched writev calls, fsyncing if the
+        periodic durability policy is due.
+
+        :return: No return value.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed writer")
+        if not self._pending:
+            return
+
+        n = write_all(self._fd, self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._written += n
+        self._unsynced += n
+        if self.durability == Durability.PERIODIC and self._unsynced >= self.sync_every:
+            self.sync()
+        if self.on_flush is not None and not self.atomic:
+            self.on_flush()
+
+    def sync(self) -> None:
+        """
+        Force the data written so far to disk with fsync.
+
+        :return: No return value.
+        """
+        os.fsync(self._fd)
+        self._unsynced = 0
+
+    def close(self) -> None:
+        """
+        Flush, apply the durability policy and, in atomic mode, rename the temporary file
+        over the destination.
+
+        :return: No return value.
+        """
+        if self.closed:
+            return
+        try:
+            self.flush()
+            if self.atomic or self.durability != Durability.NONE:
+                self.sync()
+        except BaseException:
+            self.abort()
+            raise
+
+        self.closed = True
+        os.close(self._fd)
+        if self.atomic:
+            os.replace(self._tmp_path, self.path)
+            self._tmp_path = None
+            if self.durability != Durability.NONE:
+                fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+            if self.on_flush is not None:
+                self.on_flush()
+
+    def abort(self) -> None:
+        """
+        Close without flushing buffered records. In atomic mode the temporary file is
+        removed and the destination is left untouched.
+
+        :return: No return value.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._pending = []
+        self._pending_bytes = 0
+        os.close(self._fd)
+        if self._tmp_path is not None:
+            try:
+                os.remove(self._tmp_path)
+            except FileNotFoundError:
+                pass
+            self._tmp_path = None
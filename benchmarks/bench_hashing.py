@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+File: benchmarks/bench_hashing.py
+Description: Throughput of the single-pass hashing engine against the text-mode path.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyFile import hashing
+from PyFile.config import HASH_BLOCK_SIZE
+
+FILE_SIZE = int(os.environ.get("BENCH_FILE_SIZE", 256)) * 1024 * 1024
+ALGORITHMS = ["md5", "sha256"]
+
+
+def text_mode_hash(path: str, algorithm: str) -> str:
+    """
+    The previous hashing path: text-mode reads re-encoded to UTF-8, one read per digest.
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, "r") as file:
+        buf = file.read(HASH_BLOCK_SIZE)
+        while len(buf):
+            hasher.update(buf.encode("utf-8"))
+            buf = file.read(HASH_BLOCK_SIZE)
+    return hasher.hexdigest()
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def report(label: str, seconds: float) -> None:
+    print(f"{label:<40} {seconds:8.3f}s {FILE_SIZE / seconds / 1e6:10.1f} MB/s")
+
+
+def main():
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as tmp:
+        line = "x" * 79 + "\n"
+        tmp.write(line * (FILE_SIZE // len(line)))
+        path = tmp.name
+
+    try:
+        report(
+            "text mode, one read per digest",
+            sum(timed(text_mode_hash, path, name) for name in ALGORITHMS),
+        )
+        for block_size in (HASH_BLOCK_SIZE, 1 << 18, 1 << 20, 1 << 22):
+            report(
+                f"single pass, block_size={block_size}",
+                timed(hashing.hash_path, path, ALGORITHMS, block_size),
+            )
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
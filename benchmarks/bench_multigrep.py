@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+File: bench_multigrep.py
+Description: Searching a log for many patterns in one pass compared with one search per pattern.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyFile.file import File
+from PyFile.multigrep import PatternSet
+
+FILE_SIZE = int(os.environ.get("BENCH_FILE_SIZE", 8 * 1024 * 1024))
+PATTERNS = int(os.environ.get("BENCH_PATTERNS", 500))
+
+
+def main():
+    rng = random.Random(0)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(4, 10))) for _ in range(2000)]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as tmp:
+        size: int = 0
+        while size < FILE_SIZE:
+            line = "2020-01-01 12:00:00 " + " ".join(rng.choice(words) for _ in range(10)) + "\n"
+            tmp.write(line)
+            size += len(line)
+        path = tmp.name
+
+    literals = ["%s %s" % (rng.choice(words), rng.choice(words)) for _ in range(PATTERNS)]
+    # Upper case first bytes never occur in the text, so the literals are screened with re.
+    rare_literals = ["%s %s" % (rng.choice(words).upper(), rng.choice(words)) for _ in range(PATTERNS)]
+    regexes = [r"\b%s\w* \d+" % word for word in rng.sample(words, PATTERNS)]
+
+    try:
+        test = File(path)
+        for label, patterns, kind in (
+            ("literals", literals, "literals"),
+            ("rare literals", rare_literals, "literals"),
+            ("regexes", regexes, "patterns"),
+        ):
+            start = time.perf_counter()
+            separate = {pattern: test.grep(pattern, count_only=True) for pattern in patterns}
+            separate_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pattern_set = PatternSet(**{kind: patterns})
+            compile_time = time.perf_counter() - start
+            start = time.perf_counter()
+            combined = test.grep_many(pattern_set, count_only=True)
+            combined_time = time.perf_counter() - start
+
+            assert combined == separate
+            print(
+                f"{len(patterns)} {label:<13} one grep per pattern {separate_time:7.2f} s"
+                f"  grep_many {combined_time:7.2f} s, {size / combined_time / 1e6:6.1f} MB/s"
+                f" (+{compile_time:.2f} s to compile)"
+            )
+        test.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+File: benchmarks/bench_repository.py
+Description: Deduplication ratio and throughput of repeated repository backups.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyFile.repository import BackupRepository, chunk_stream
+
+FILE_SIZE = int(os.environ.get("BENCH_FILE_SIZE", 64)) * 1024 * 1024
+BACKUPS = 5
+EDIT_SIZE = 1024
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "data.bin")
+    with open(path, "wb") as file:
+        file.write(os.urandom(FILE_SIZE))
+
+    try:
+        start = time.perf_counter()
+        with open(path, "rb") as file:
+            chunks = sum(1 for _ in chunk_stream(file))
+        print(f"chunking: {chunks} chunks, {FILE_SIZE / (time.perf_counter() - start) / 1e6:.1f} MB/s")
+
+        repo = BackupRepository(os.path.join(directory, "repo"))
+        logical = stored = 0
+        for i in range(BACKUPS):
+            if i:
+                with open(path, "r+b") as file:
+                    file.seek((i * FILE_SIZE // BACKUPS) % (FILE_SIZE - EDIT_SIZE))
+                    file.write(os.urandom(EDIT_SIZE))
+
+            start = time.perf_counter()
+            stats = repo.backup(path)
+            seconds = time.perf_counter() - start
+            logical += stats.size
+            stored += stats.stored_bytes
+            print(
+                f"backup {i}: {stats.chunks} chunks, {stats.new_chunks} new, "
+                f"{stats.stored_bytes / 1e6:8.2f} MB stored, {stats.size / seconds / 1e6:8.1f} MB/s"
+            )
+
+        print(f"dedup ratio over {BACKUPS} backups: {logical / stored:.2f}x")
+
+        start = time.perf_counter()
+        repo.restore(stats.manifest, os.path.join(directory, "restored.bin"))
+        print(f"restore: {FILE_SIZE / (time.perf_counter() - start) / 1e6:.1f} MB/s")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+File: bench_trigram.py
+Description: Trigram index queries compared with a full scan of the same corpus.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyFile.search import grep_paths, walk_tree
+from PyFile.trigram import TrigramIndex
+
+FILES = int(os.environ.get("BENCH_FILES", 2000))
+FILE_SIZE = int(os.environ.get("BENCH_FILE_SIZE", 16 * 1024))
+QUERIES = [
+    "rare_identifier_42",
+    "def (open|close)_handle",
+    "TODO: remove",
+    "[a-z]+_[0-9]+",
+]
+
+
+def build_corpus(root: str) -> None:
+    rng = random.Random(0)
+    words = ["value", "count", "index", "buffer", "result", "offset", "return", "self", "for", "in"]
+    for i in range(FILES):
+        lines: list = []
+        size: int = 0
+        while size < FILE_SIZE:
+            line = " ".join(rng.choice(words) for _ in range(8)) + "\n"
+            lines.append(line)
+            size += len(line)
+        if i % 100 == 0:
+            lines.insert(len(lines) // 2, "x = rare_identifier_42\n")
+        if i % 20 == 0:
+            lines.insert(0, "def open_handle(path):  # TODO: remove\n")
+        with open(os.path.join(root, "f%05d.py" % i), "w") as f:
+            f.writelines(lines)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    root = tempfile.mkdtemp()
+    try:
+        build_corpus(root)
+        paths = list(walk_tree(root))
+        index_path = os.path.join(root, ".trigrams")
+
+        with TrigramIndex(index_path) as index:
+            elapsed, _ = timed(lambda: index.update(paths))
+            print(f"build   {elapsed:8.3f} s  ({os.path.getsize(index_path) / 1024:.0f} KiB index)")
+            elapsed, _ = timed(lambda: index.update(paths))
+            print(f"update  {elapsed:8.3f} s  (nothing changed)")
+
+            for pattern in QUERIES:
+                full_time, full = timed(lambda: sum(1 for _ in grep_paths(paths, pattern, workers=1)))
+                index_time, found = timed(lambda: sum(1 for _ in index.search(pattern)))
+                assert found == full
+                print(
+                    f"{pattern:<28} full scan {full_time * 1e3:8.1f} ms"
+                    f"  indexed {index_time * 1e3:8.1f} ms ({len(index.candidates(pattern))}/{len(paths)} files)"
+                )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""
+File: suite.py
+Description: Benchmark suite for the File hot paths with JSON results and baseline comparison.
+Author: Malcolm Hall
+Version: 1
+
+MIT License
+
+Copyright (c) 2020 Malcolm Hall
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyFile.file import File
+from PyFile.directory import Directory
+from PyFile.bulk import hash_many
+from PyFile.search import grep_tree
+
+FILE_SIZE = int(os.environ.get("BENCH_FILE_SIZE", 64)) * 1024 * 1024
+SMALL_FILES = 2000
+SMALL_FILE_MAX_SIZE = 8 * 1024
+DEFAULT_THRESHOLD = 0.10
+
+# A benchmark case. setup is called only if the case is selected and returns the function
+# that is called once per iteration; nbytes is the amount of data it processes, used for
+# throughput, or 0 where throughput is meaningless.
+Case = namedtuple("Case", ["name", "setup", "nbytes", "iterations"])
+
+
+class Corpus(object):
+    """
+    Synthetic files generated once per run in a temporary directory.
+    """
+
+    __slots__ = ["root", "small_dir", "small_paths", "huge_text", "short_lines", "long_lines", "binary", "scratch"]
+
+    def __init__(self, size: int):
+        rng = random.Random(0)
+        self.root: str = tempfile.mkdtemp(prefix="pyfile-bench-")
+        self.small_dir: str = os.path.join(self.root, "small")
+        self.scratch: str = os.path.join(self.root, "scratch")
+        os.makedirs(self.small_dir)
+        os.makedirs(self.scratch)
+
+        self.small_paths: list = []
+        for i in range(SMALL_FILES):
+            path = os.path.join(self.small_dir, f"{i % 50:02d}", f"file{i}.txt")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"small file %d needle\n" % i * (rng.randrange(SMALL_FILE_MAX_SIZE) // 22 + 1))
+            self.small_paths.append(path)
+
+        words = [b"alpha", b"beta", b"gamma", b"delta", b"error", b"warning", b"info", b"debug"]
+        self.short_lines: str = self._text("short_lines.txt", size, rng, words, 8)
+        self.long_lines: str = self._text("long_lines.txt", size, rng, words, 2000)
+        self.huge_text: str = self._text("huge.txt", 4 * size, rng, words, 12)
+
+        self.binary: str = os.path.join(self.root, "binary.bin")
+        with open(self.binary, "wb") as f:
+            for _ in range(size // (1 << 20)):
+                f.write(os.urandom(1 << 20))
+
+    def _text(self, name: str, size: int, rng: random.Random, words: list, words_per_line: int) -> str:
+        path = os.path.join(self.root, name)
+        lines = [b" ".join(rng.choice(words) for _ in range(words_per_line)) + b"\n" for _ in range(256)]
+        block = b"".join(lines)
+        with open(path, "wb") as f:
+            for _ in range(max(1, size // len(block))):
+                f.write(block)
+        return path
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.root)
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(case: Case) -> dict:
+    """
+    Time every iteration of a case, then run it once more under tracemalloc to record
+    the peak of Python allocations. Timing and memory are measured separately because
+    tracemalloc slows allocation heavy code down considerably.
+    """
+    run = case.setup()
+    run()  # Warm up caches and imports.
+    samples: list = []
+    for _ in range(case.iterations):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    mean = sum(samples) / len(samples)
+    result = {
+        "iterations": len(samples),
+        "mean": mean,
+        "p50": percentile(samples, 0.50),
+        "p90": percentile(samples, 0.90),
+        "p99": percentile(samples, 0.99),
+        "peak_memory": peak,
+    }
+    if case.nbytes:
+        result["throughput_mb_s"] = case.nbytes / result["p50"] / 1e6
+    return result
+
+
+def cases(corpus: Corpus, iterations: int) -> list:
+    size = os.path.getsize
+    small_bytes = sum(size(path) for path in corpus.small_paths)
+    out = os.path.join(corpus.scratch, "out")
+    result: list = []
+
+    def add(name: str, run, nbytes=0, scale=1):
+        add_setup(name, lambda: run, nbytes, scale)
+
+    def add_setup(name: str, setup, nbytes=0, scale=1):
+        # For cases that need expensive preparation, which is skipped when they are filtered out.
+        result.append(Case(name, setup, nbytes, max(1, iterations * scale)))
+
+    # Construction and metadata.
+    add("construct.small_files", lambda: [File(path, open_file=False) for path in corpus.small_paths])
+    add("construct.from_dir_entry", lambda: list(Directory(corpus.small_dir).files()))
+    add("metadata.size_modified", lambda: [(f.size, f.modified) for f in [File(corpus.binary, open_file=False)] * 1000])
+
+    # Hashing. A fresh File per iteration so the per-instance digest cache is not hit.
+    for label, path in (("binary", corpus.binary), ("huge_text", corpus.huge_text)):
+        add(f"sha256.{label}", lambda path=path: File(path, open_file=False).sha256(), size(path))
+        add(f"md5.{label}", lambda path=path: File(path, open_file=False).md5(), size(path))
+    add("hashes.binary", lambda: File(corpus.binary, open_file=False).hashes(["md5", "sha256"]), size(corpus.binary))
+    add_setup("sha256.cached", lambda: File(corpus.binary, open_file=False).sha256, 0, 100)
+    add("hash_many.small_files", lambda: list(hash_many(corpus.small_paths)), small_bytes)
+
+    # Searching.
+    for label, path in (("short_lines", corpus.short_lines), ("long_lines", corpus.long_lines)):
+        add(f"grep.count.{label}", lambda path=path: File(path, open_file=False).grep("error warning", count_only=True), size(path))
+        add(f"grep_iter.context.{label}", lambda path=path: sum(
+            1 for _ in File(path, open_file=False).grep_iter(r"^debug", max_count=10000, before=1, after=1)
+        ), 0)
+    add("grep_tree.small_files", lambda: list(grep_tree(corpus.small_dir, "needle", workers=2)), small_bytes)
+
+    # Lines.
+    add("line_cnt.huge_text", lambda: File(corpus.huge_text, open_file=False).line_cnt, size(corpus.huge_text))
+    add("count_lines.parallel.huge_text", lambda: File(corpus.huge_text, open_file=False).count_lines(workers=4),
+        size(corpus.huge_text))
+    add("line_index.build.short_lines", lambda: File(corpus.short_lines, open_file=False).line_index(), size(corpus.short_lines))
+
+    def random_access():
+        indexed = File(corpus.short_lines, open_file=False)
+        line_numbers = random.Random(0).sample(range(indexed.line_cnt), 100)
+        return lambda: [indexed.line(n) for n in line_numbers]
+
+    add_setup("line.random_access", random_access, 0, 10)
+    add("tail.short_lines", lambda: File(corpus.short_lines, open_file=False).tail(100), 0, 100)
+    add("readlines.short_lines", lambda: File(corpus.short_lines, open_file=False).readlines(), size(corpus.short_lines))
+    add("read.short_lines", lambda: File(corpus.short_lines).read(), size(corpus.short_lines))
+
+    # Writing and copying.
+    def write_records():
+        with File(out, mode="w", open_file=False).open_writer() as writer:
+            writer.writelines(b"record %d\n" % i for i in range(100000))
+
+    def write_text():
+        f = File(out, mode="w")
+        for i in range(100000):
+            f.write("record %d\n" % i)
+        f.close()
+
+    add("open_writer.small_records", write_records)
+    add("write.small_records", write_text)
+    add("copy_to.binary", lambda: File(corpus.binary, open_file=False).copy_to(out), size(corpus.binary))
+    add("backup.deflate.short_lines", lambda: File(corpus.short_lines, open_file=False).backup(corpus.scratch + os.sep),
+        size(corpus.short_lines))
+    add("backup.stored.binary", lambda: File(corpus.binary, open_file=False).backup(corpus.scratch + os.sep, codec="stored"),
+        size(corpus.binary))
+
+    # Deltas.
+    def delta_binary():
+        signature = File(corpus.binary, open_file=False).signature()
+        return lambda: sum(1 for _ in File(corpus.binary, open_file=False).delta(signature))
+
+    add("signature.binary", lambda: File(corpus.binary, open_file=False).signature(), size(corpus.binary))
+    add_setup("delta.binary", delta_binary, size(corpus.binary))
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare median latencies against a baseline.
+
+    :return: List of (name, baseline p50, current p50, ratio) for cases slower than 1 + threshold.
+    """
+    regressions: list = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous.get("p50"):
+            continue
+        ratio = current["p50"] / previous["p50"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["p50"], current["p50"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("Description: ")[1].splitlines()[0])
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Report cases whose median is this fraction slower than the baseline.")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed iterations per case.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this string.")
+    args = parser.parse_args()
+
+    corpus = Corpus(FILE_SIZE)
+    results: dict = {}
+    try:
+        for case in cases(corpus, args.iterations):
+            if args.filter not in case.name:
+                continue
+            results[case.name] = measure(case)
+            result = results[case.name]
+            throughput = f"{result['throughput_mb_s']:10.1f} MB/s" if "throughput_mb_s" in result else " " * 15
+            print(
+                f"{case.name:<36} p50 {result['p50'] * 1e3:10.2f} ms  p99 {result['p99'] * 1e3:10.2f} ms"
+                f"  {throughput}  peak {result['peak_memory'] / 1024:10.1f} KiB"
+            )
+    finally:
+        corpus.cleanup()
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "file_size": FILE_SIZE,
+            "iterations": args.iterations,
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms ({(ratio - 1) * 100:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold * 100:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
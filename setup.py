@@ -17,7 +17,7 @@ DESCRIPTION = 'A file object wrapper for Python. This combines many file I/O and
 URL = 'https://github.com/malcolmraine/PyFile'
 EMAIL = 'malcolmrainehall@gmail.com'
 AUTHOR = 'Malcolm Hall'
-REQUIRES_PYTHON = '>=3.6.0'
+REQUIRES_PYTHON = '>=3.7.0'
 VERSION = '0.0.0'
 
 # What packages are required for this module to be executed?
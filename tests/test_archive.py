@@ -0,0 +1,81 @@
+import unittest
+import os
+import hashlib
+import struct
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+from PyFile import archive, file
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(self.directory, f"file{i}.txt")
+            with open(path, "wb") as f:
+                f.write(os.urandom(1000 * i) + b"text " * (5000 * i))
+            self.paths.append(path)
+        self.archive_path = os.path.join(self.directory, "out", "backup.zip")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check(self, entries):
+        self.assertEqual([entry.path for entry in entries], self.paths)
+        with zipfile.ZipFile(self.archive_path) as backup:
+            self.assertIsNone(backup.testzip())
+            names = backup.namelist()
+            for entry in entries:
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+                self.assertEqual(entry.sha256, hashlib.sha256(data).hexdigest())
+                self.assertEqual(backup.read(entry.arcname), data)
+                self.assertEqual(backup.read(entry.arcname + ".SHA256").decode(), entry.sha256)
+                self.assertEqual(names.index(entry.arcname + ".SHA256"), names.index(entry.arcname) + 1)
+                # The local header carries the file's timestamp, as the central directory does.
+                info = backup.getinfo(entry.arcname)
+                expected = zipfile.ZipInfo.from_file(entry.path)
+                self.assertEqual(info.external_attr, expected.external_attr)
+                self.assertEqual(info.date_time[:5], expected.date_time[:5])
+                self.assertEqual(info.date_time[5] // 2, expected.date_time[5] // 2)
+                with open(self.archive_path, "rb") as f:
+                    f.seek(info.header_offset)
+                    header = f.read(30)
+                year, month, day, hour, minute, second = info.date_time
+                self.assertEqual(struct.unpack("<HH", header[10:14]),
+                                 (hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day))
+
+    def test_codecs(self):
+        for codec in archive.CODECS:
+            for level in (None, 1):
+                entries = archive.backup_many(self.paths, self.archive_path, codec, level)
+                self.check(entries)
+
+    def test_files(self):
+        files = [file.File(path, open_file=False) for path in self.paths]
+        self.check(archive.backup_many(files, self.archive_path, "deflate", level=1))
+
+    def test_level(self):
+        sizes = []
+        for level in (1, 9):
+            entries = archive.backup_many(self.paths, self.archive_path, "deflate", level)
+            self.check(entries)
+            sizes.append(sum(entry.compress_size for entry in entries))
+        self.assertLess(sizes[1], sizes[0])
+
+    def test_single_read(self):
+        # Each file is hashed during the read that compresses it.
+        with mock.patch.object(archive, "iter_blocks", wraps=archive.iter_blocks) as streamed:
+            entries = archive.backup_many(self.paths, self.archive_path, "deflate")
+        self.check(entries)
+        self.assertEqual(streamed.call_count, len(self.paths))
+
+    def test_invalid_codec(self):
+        self.assertRaises(ValueError, archive.backup_many, self.paths, self.archive_path, "zstd")
+
+
+if __name__ == "__main__":
+    unittest.main()
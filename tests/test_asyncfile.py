@@ -0,0 +1,207 @@
+import unittest
+import asyncio
+import os
+import gzip
+import hashlib
+import tempfile
+import shutil
+import threading
+from unittest import mock
+import PyFile
+from PyFile import asyncfile
+from PyFile.config import MMAP_MIN_SIZE
+
+
+class TestAsyncFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "file.txt")
+        self.text = "".join(f"line {i}\n" for i in range(1000))
+        with open(self.path, "w") as f:
+            f.write(self.text)
+        self.executor = asyncfile.AsyncExecutor(workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        shutil.rmtree(self.directory)
+
+    def test_read_and_hash(self):
+        async def main():
+            async with PyFile.AsyncFile(self.path, executor=self.executor) as file:
+                text = await file.read()
+                digests = await file.hashes(["md5", "sha256"], block_size=1024)
+                return text, digests, await file.sha256()
+
+        text, digests, sha256 = asyncio.run(main())
+        self.assertEqual(text, self.text)
+        self.assertEqual(digests["md5"], hashlib.md5(self.text.encode()).hexdigest())
+        self.assertEqual(digests["sha256"], hashlib.sha256(self.text.encode()).hexdigest())
+        self.assertEqual(sha256, digests["sha256"])
+
+    def test_concurrent_hashes(self):
+        async def main():
+            files = [asyncfile.AsyncFile(self.path, executor=self.executor) for _ in range(8)]
+            return await asyncio.gather(*(file.md5() for file in files))
+
+        digests = asyncio.run(main())
+        self.assertEqual(set(digests), {hashlib.md5(self.text.encode()).hexdigest()})
+
+    def test_digest_caches_off_loop(self):
+        threads: list = []
+        cached_digests = PyFile.File._cached_digests
+        store_digests = PyFile.File._store_digests
+
+        def record(method):
+            def wrapper(self, *args):
+                threads.append(threading.current_thread())
+                return method(self, *args)
+            return wrapper
+
+        async def main():
+            file = asyncfile.AsyncFile(self.path, executor=self.executor)
+            await file.sha256()
+            await file.sha256()
+            return threading.current_thread()
+
+        with mock.patch.object(PyFile.File, "_cached_digests", record(cached_digests)), \
+                mock.patch.object(PyFile.File, "_store_digests", record(store_digests)):
+            loop_thread = asyncio.run(main())
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_cancel_hash(self):
+        path = os.path.join(self.directory, "large.bin")
+        # Large enough to be hashed out of a memory map.
+        data = os.urandom(MMAP_MIN_SIZE + 4096)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        async def main():
+            errors: list = []
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            file = asyncfile.AsyncFile(path, executor=self.executor)
+            futures: list = []
+            submit = asyncfile.AsyncExecutor.submit
+
+            def record(executor, func, *args):
+                futures.append(submit(executor, func, *args))
+                return futures[-1]
+
+            with mock.patch.object(asyncfile.AsyncExecutor, "submit", record):
+                task = asyncio.ensure_future(file.hashes(["sha256"], block_size=1))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            # The reader is closed, and its memory map released, once the running step finishes.
+            self.assertEqual(len(futures), 1)
+            await asyncio.wrap_future(futures[0])
+            await asyncio.sleep(0)
+            self.assertEqual(errors, [])
+            # A cancelled hash caches nothing and does not disturb the next one.
+            digests, missing = file.file._cached_digests(["sha256"], file.file._signature())
+            self.assertEqual((digests, missing), ({}, ["sha256"]))
+            return await file.sha256()
+
+        with mock.patch.object(asyncfile, "ASYNC_HASH_SPAN", 1024):
+            self.assertEqual(asyncio.run(main()), hashlib.sha256(data).hexdigest())
+
+    def test_submit_reports_errors(self):
+        async def main():
+            errors: list = []
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            future = self.executor.submit(int, "not a number")
+            with self.assertRaises(ValueError):
+                await asyncio.wrap_future(future)
+            await asyncio.sleep(0.01)
+            return errors
+
+        errors = asyncio.run(main())
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0]["exception"], ValueError)
+
+    def test_write(self):
+        async def main():
+            async with asyncfile.AsyncFile(os.path.join(self.directory, "new.txt"), mode="w", executor=self.executor) as file:
+                await file.write("a\nb\n")
+                await file.flush()
+                return await file.count_lines(), await file.md5()
+
+        count, md5 = asyncio.run(main())
+        self.assertEqual(count, 2)
+        self.assertEqual(md5, hashlib.md5(b"a\nb\n").hexdigest())
+
+    def test_lines(self):
+        async def main():
+            file = asyncfile.AsyncFile(self.path, executor=self.executor)
+            return [line async for line in file.lines()]
+
+        self.assertEqual(asyncio.run(main()), self.text.splitlines(True))
+
+    def test_grep(self):
+        async def main():
+            file = asyncfile.AsyncFile(self.path, executor=self.executor)
+            streamed = [match.line_no async for match in file.grep_iter(r"^line \d*7$")]
+            matches = await file.grep(r"^line 99\d$", max_count=3)
+            return streamed, matches
+
+        streamed, matches = asyncio.run(main())
+        self.assertEqual(streamed, [i + 1 for i in range(1000) if i % 10 == 7])
+        self.assertEqual([match.line for match in matches], [b"line 990", b"line 991", b"line 992"])
+
+    def test_compressed(self):
+        path = os.path.join(self.directory, "file.log")
+        with open(path, "wb") as f:
+            f.write(gzip.compress(self.text.encode()))
+        sync = PyFile.File(path)
+
+        async def main():
+            async with asyncfile.AsyncFile(path, executor=self.executor) as file:
+                return (
+                    await file.grep(r"^line 99\d$", max_count=3),
+                    [match async for match in file.grep_iter(r"^line 99\d$", max_count=3)],
+                    await file.count_lines(),
+                    await file.count_lines(decompress=False),
+                    [line async for line in file.lines()],
+                    await file.hashes(["md5", "sha256"], block_size=100, decompress=True),
+                    await file.sha256(),
+                    await file.read(),
+                )
+
+        grep, streamed, count, raw_count, lines, digests, sha256, text = asyncio.run(main())
+        self.assertEqual([match.line for match in grep], [b"line 990", b"line 991", b"line 992"])
+        self.assertEqual(streamed, grep)
+        self.assertEqual(count, sync.line_cnt)
+        self.assertEqual(count, 1000)
+        self.assertEqual(raw_count, sync.count_lines(decompress=False))
+        self.assertEqual(lines, self.text.splitlines(True))
+        self.assertEqual(digests, sync.hashes(decompress=True))
+        self.assertEqual(digests["sha256"], hashlib.sha256(self.text.encode()).hexdigest())
+        self.assertEqual(sha256, sync.sha256())
+        self.assertEqual(text, self.text)
+
+    def test_break_out_of_stream(self):
+        async def main():
+            file = asyncfile.AsyncFile(self.path, executor=self.executor)
+            lines = file.lines()
+            async for line in lines:
+                break
+            await lines.aclose()
+            return line
+
+        self.assertEqual(asyncio.run(main()), "line 0\n")
+
+    def test_process_pool(self):
+        executor = asyncfile.AsyncExecutor(workers=1, processes=1)
+        try:
+            async def main():
+                file = asyncfile.AsyncFile(self.path, executor=executor)
+                return await file.count_lines(), len(await file.grep("line"))
+
+            self.assertEqual(asyncio.run(main()), (1000, 1000))
+        finally:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import os
+import hashlib
+import tempfile
+import shutil
+import PyFile
+from PyFile import bulk
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(20):
+            path = os.path.join(self.directory, f"{i}.txt")
+            with open(path, "w") as f:
+                f.write(str(i) * (i * 1000))
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hash_many(self):
+        results = {result.path: result for result in PyFile.hash_many(self.paths, ["md5", "sha256"], workers=4)}
+        self.assertEqual(set(results), set(self.paths))
+        for i, path in enumerate(self.paths):
+            data = (str(i) * (i * 1000)).encode()
+            self.assertIsNone(results[path].error)
+            self.assertEqual(results[path].digests["sha256"], hashlib.sha256(data).hexdigest())
+            self.assertEqual(results[path].digests["md5"], hashlib.md5(data).hexdigest())
+
+    def test_errors(self):
+        missing = os.path.join(self.directory, "missing.txt")
+        results = list(bulk.hash_many([missing] + self.paths, workers=2, max_bytes_in_flight=1))
+        self.assertEqual(len(results), len(self.paths) + 1)
+        errors = [result for result in results if result.error is not None]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].path, missing)
+        self.assertIsInstance(errors[0].error, FileNotFoundError)
+
+    def test_invalid_algorithm(self):
+        self.assertRaises(ValueError, list, bulk.hash_many(self.paths, ["not_a_hash"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from PyFile import cache
+
+
+class TestDigestCache(unittest.TestCase):
+    def test_get_put(self):
+        digests = cache.DigestCache(max_entries=4)
+        signature = (1, 2, 3, 4)
+        self.assertIsNone(digests.get("/a", signature, "md5"))
+        digests.put("/a", signature, "md5", b"\x00" * 16)
+        self.assertEqual(digests.get("/a", signature, "md5"), b"\x00" * 16)
+        self.assertIsNone(digests.get("/a", (1, 2, 3, 5), "md5"))
+        self.assertEqual(digests.stats()["hits"], 1)
+        self.assertEqual(digests.stats()["misses"], 2)
+
+    def test_entry_budget(self):
+        digests = cache.DigestCache(max_entries=2)
+        digests.put("/a", (), "md5", b"a")
+        digests.put("/b", (), "md5", b"b")
+        digests.get("/a", (), "md5")
+        digests.put("/c", (), "md5", b"c")
+        self.assertEqual(len(digests), 2)
+        self.assertIsNone(digests.get("/b", (), "md5"))
+        self.assertEqual(digests.get("/a", (), "md5"), b"a")
+
+    def test_byte_budget(self):
+        digests = cache.DigestCache(max_entries=None, max_bytes=100)
+        for i in range(10):
+            digests.put(f"/{i}", (), "sha256", b"\x00" * 32)
+        self.assertLessEqual(digests.stats()["bytes"], 100)
+        self.assertEqual(len(digests), 2)
+
+    def test_shared_cache(self):
+        self.assertIsNone(cache.shared_cache())
+        shared = cache.enable_shared_cache(max_entries=10)
+        self.assertIs(cache.shared_cache(), shared)
+        cache.disable_shared_cache()
+        self.assertIsNone(cache.shared_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
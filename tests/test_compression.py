@@ -0,0 +1,122 @@
+import unittest
+import os
+import bz2
+import gzip
+import lzma
+import hashlib
+import tempfile
+import shutil
+import PyFile
+from PyFile import compression
+
+
+DATA = b"".join(b"line %d %s\n" % (i, b"error" if i % 10 == 0 else b"ok") for i in range(1000)) + b"tail error"
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Extensions deliberately do not match the formats.
+        self.paths = {
+            "gzip": self.write("a.log", gzip.compress(DATA)),
+            "bz2": self.write("b.txt", bz2.compress(DATA)),
+            "xz": self.write("c", lzma.compress(DATA)),
+        }
+        self.plain = self.write("d.gz", DATA)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_detect(self):
+        for name, path in self.paths.items():
+            self.assertEqual(compression.detect(path), name)
+        self.assertIsNone(compression.detect(self.plain))
+        self.assertIsNone(compression.detect(self.write("empty", b"")))
+
+    def test_detect_lookalikes(self):
+        text = self.write("text.txt", b"BZh is a prefix\nsecond line\n")
+        self.assertIsNone(compression.detect(text))
+        self.assertEqual(compression.detect(self.write("empty.bz2", bz2.compress(b""))), "bz2")
+        self.assertIsNone(compression.detect(self.write("bad.gz", b"\x1f\x8bnot really gzip\n")))
+
+        test = PyFile.File(text)
+        self.assertIsNone(test.compression)
+        self.assertEqual(test.line_cnt, 2)
+        self.assertEqual(test.grep("prefix"), ["BZh is a prefix\n"])
+        self.assertEqual(test.readlines(), ["BZh is a prefix\n", "second line\n"])
+
+    def test_open_decompressed(self):
+        for path in list(self.paths.values()) + [self.plain]:
+            with compression.open_decompressed(path) as f:
+                self.assertEqual(f.read(), DATA)
+            with compression.open_decompressed(path, "r") as f:
+                self.assertEqual(f.readline(), "line 0 error\n")
+        with self.assertRaises(ValueError):
+            compression.open_decompressed(self.plain, "w")
+
+    def test_iter_blocks(self):
+        blocks = [bytes(block) for block in compression.iter_blocks(self.paths["gzip"], block_size=100)]
+        self.assertEqual(b"".join(blocks), DATA)
+        self.assertTrue(all(len(block) == 100 for block in blocks[:-1]))
+
+    def test_count_lines_and_hash(self):
+        for path in self.paths.values():
+            self.assertEqual(compression.count_lines(path, block_size=64), 1001)
+            self.assertEqual(compression.count_lines(path, count_unterminated=False), 1000)
+            hashers, total = compression.hash_path(path, ["md5", "sha256"], block_size=64)
+            self.assertEqual(total, len(DATA))
+            self.assertEqual(hashers["sha256"].hexdigest(), hashlib.sha256(DATA).hexdigest())
+
+    def test_file(self):
+        raw = PyFile.File(self.paths["gzip"])
+        plain = PyFile.File(self.plain)
+        self.assertEqual(raw.compression, "gzip")
+        self.assertIsNone(plain.compression)
+
+        self.assertEqual(raw.line_cnt, plain.line_cnt)
+        self.assertEqual(raw.count_lines(decompress=False), gzip.compress(DATA).count(b"\n") + 1)
+        self.assertEqual(raw.grep("error"), plain.grep("error"))
+        self.assertEqual(raw.grep("error", count_only=True, max_count=5), 5)
+        self.assertEqual(raw.grep("error", max_count=2), ["line 0 error\n", "line 10 error\n"])
+        self.assertEqual(raw.grep("^tail"), ["tail error"])
+        self.assertEqual(list(raw.grep_iter("line 5[05] ", before=1, after=1)), list(plain.grep_iter("line 5[05] ", before=1, after=1)))
+        self.assertEqual(raw.grep_many(["error$"], ["line 99"]), plain.grep_many(["error$"], ["line 99"]))
+        self.assertEqual(raw.readlines(), plain.readlines())
+        with raw.decompressed() as stream:
+            self.assertEqual(stream.read(), DATA)
+
+        with open(self.paths["gzip"], "rb") as f:
+            self.assertEqual(raw.sha256(), hashlib.sha256(f.read()).hexdigest())
+        self.assertEqual(raw.sha256(decompress=True), plain.sha256())
+        self.assertEqual(raw.hashes(decompress=True), plain.hashes())
+        self.assertNotEqual(raw.md5(), raw.md5(decompress=True))
+        self.assertEqual(plain.md5(decompress=True), plain.md5())
+
+        self.assertEqual(raw.lines(), plain.lines())
+        self.assertEqual(raw.lines(5, 8), plain.lines(5, 8))
+        self.assertEqual(raw.line(raw.line_cnt - 1), "tail error")
+        self.assertEqual(raw.line(-2), plain.line(-2))
+        self.assertEqual(raw.line(3), plain.line(3))
+        with self.assertRaises(IndexError):
+            raw.line(raw.line_cnt)
+        self.assertEqual(raw.tail(3), plain.tail(3))
+        self.assertEqual(raw.tail(0), [])
+        with self.assertRaises(ValueError):
+            raw.line_index()
+
+        raw.open("r")
+        self.assertEqual(raw.read(12), "line 0 error")
+        raw.close()
+        raw.open("rb")
+        self.assertEqual(raw.read(2), b"\x1f\x8b")
+        raw.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
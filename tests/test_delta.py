@@ -0,0 +1,77 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from PyFile import delta, file
+
+
+class TestDelta(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old = os.urandom(50000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def roundtrip(self, new, block_size=512):
+        old_path = self.write("old.bin", self.old)
+        signature = delta.Signature.build(old_path, block_size)
+        operations = list(delta.delta(io.BytesIO(new), signature))
+        out = io.BytesIO()
+        delta.patch(old_path, operations, out, block_size)
+        self.assertEqual(out.getvalue(), new)
+        return operations
+
+    def literal_size(self, operations):
+        return sum(len(op[1]) for op in operations if op[0] == delta.DATA)
+
+    def test_identical(self):
+        operations = self.roundtrip(self.old)
+        self.assertEqual(operations, [(delta.COPY, 0, 98)])
+
+    def test_edits(self):
+        new = self.old[:1000] + b"inserted" + self.old[1000:30000] + b"X" + self.old[30001:45000]
+        operations = self.roundtrip(new)
+        self.assertLess(self.literal_size(operations), 2000)
+
+    def test_unrelated_and_empty(self):
+        self.roundtrip(os.urandom(3000))
+        self.roundtrip(b"")
+        self.old = b""
+        self.roundtrip(b"new data")
+
+    def test_serialization(self):
+        old_path = self.write("old.bin", self.old)
+        stream = io.BytesIO()
+        delta.write_signature(old_path, stream, 1024)
+        stream.seek(0)
+        signature = delta.Signature.read(stream)
+        self.assertEqual(len(signature), 49)
+
+        new = self.old[:20000] + b"changed" + self.old[20000:]
+        stream = io.BytesIO()
+        delta.write_delta(delta.delta(io.BytesIO(new), signature), stream, 1024)
+        stream.seek(0)
+        block_size, operations = delta.read_delta(stream)
+        out = io.BytesIO()
+        delta.patch(old_path, operations, out, block_size)
+        self.assertEqual(out.getvalue(), new)
+
+    def test_file(self):
+        old = file.File(self.write("old.bin", self.old), open_file=False)
+        signature = old.signature()
+        new_data = self.old[:10000] + b"more" + self.old[10000:]
+        new = file.File(self.write("new.bin", new_data), open_file=False)
+        rebuilt = old.patch(new.delta(signature), os.path.join(self.directory, "rebuilt.bin"))
+        self.assertEqual(file.File(rebuilt, open_file=False).sha256(), new.sha256())
+
+
+if __name__ == "__main__":
+    unittest.main()
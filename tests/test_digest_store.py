@@ -0,0 +1,66 @@
+import unittest
+import os
+import hashlib
+from PyFile import digest_store, file, cache
+
+
+class TestDigestStore(unittest.TestCase):
+    def setUp(self):
+        self.db = "test_digest_store.db"
+        self.filename = "test_digest_store.txt"
+        with open(self.filename, "w") as f:
+            f.write("#" * 1000)
+        self.store = digest_store.DigestStore(self.db, batch_size=2)
+
+    def tearDown(self):
+        cache.set_digest_store(None)
+        self.store.close()
+        for path in (self.db, self.db + "-wal", self.db + "-shm", self.filename):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_get_put(self):
+        signature = (1, 2, 3, 4)
+        self.assertIsNone(self.store.get("/a", signature, "md5"))
+        self.store.put("/a", signature, "md5", b"digest")
+        self.assertEqual(self.store.get("/a", signature, "md5"), b"digest")
+        self.store.flush()
+        self.assertEqual(self.store.get("/a", signature, "md5"), b"digest")
+        self.assertIsNone(self.store.get("/a", (1, 2, 3, 5), "md5"))
+
+    def test_persistence(self):
+        self.store.put("/a", (1, 2, 3, 4), "md5", b"digest")
+        self.store.close()
+        self.store = digest_store.DigestStore(self.db)
+        self.assertEqual(self.store.get("/a", (1, 2, 3, 4), "md5"), b"digest")
+
+    def test_prune(self):
+        path = os.path.abspath(self.filename)
+        self.store.put(path, (1, 2, 3, 4), "md5", b"digest")
+        self.store.put("/does/not/exist", (1, 2, 3, 4), "md5", b"digest")
+        self.assertEqual(self.store.prune(), 1)
+        self.assertIsNotNone(self.store.get(path, (1, 2, 3, 4), "md5"))
+
+    def test_file_integration(self):
+        cache.set_digest_store(self.store)
+        expected = hashlib.sha256(b"#" * 1000).digest()
+        self.assertEqual(file.File(self.filename, open_file=False).sha256(file.HashType.BYTES), expected)
+
+        # A fresh File finds the digest in the store; a poisoned entry proves no rehash happened.
+        test = file.File(self.filename, open_file=False)
+        self.store.put(test.abs_path, test._signature(), "sha256", b"cached")
+        self.assertEqual(file.File(self.filename, open_file=False).sha256(file.HashType.BYTES), b"cached")
+
+    @unittest.skipUnless(hasattr(os, "setxattr"), "extended attributes not supported")
+    def test_xattr_store(self):
+        store = digest_store.XattrDigestStore()
+        store.put(self.filename, (1, 2, 3, 4), "md5", b"digest")
+        value = store.get(self.filename, (1, 2, 3, 4), "md5")
+        if value is None:
+            self.skipTest("filesystem does not support user extended attributes")
+        self.assertEqual(value, b"digest")
+        self.assertIsNone(store.get(self.filename, (1, 2, 3, 5), "md5"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import time
+import shutil
+import tempfile
+from PyFile import directory, file
+
+
+class TestDirectory(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path, size in (
+            ("a.txt", 10),
+            ("b.log", 1000),
+            (".hidden.txt", 10),
+            ("scratch.tmp", 10),
+            ("sub/c.TXT", 100),
+            ("sub/deeper/d.log", 10),
+            ("skip/e.txt", 10),
+        ):
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"#" * size)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def names(self, tree):
+        return sorted(os.path.relpath(path, self.root) for path in tree.paths())
+
+    def test_classify(self):
+        self.assertEqual(directory.classify("a.txt"), file.FileClass.NORMAL)
+        self.assertEqual(directory.classify(".a.txt"), file.FileClass.HIDDEN)
+        self.assertEqual(directory.classify("a.tmp"), file.FileClass.TEMPORARY)
+        self.assertEqual(directory.classify(".a.swp"), file.FileClass.HIDDEN_TEMP)
+
+    def test_walk(self):
+        tree = directory.Directory(self.root)
+        self.assertEqual(len(self.names(tree)), 7)
+        self.assertEqual(self.names(tree.filter(recursive=False)), [".hidden.txt", "a.txt", "b.log", "scratch.tmp"])
+        self.assertEqual(len(self.names(tree.filter(exclude_dirs="skip"))), 6)
+
+    def test_filters(self):
+        tree = directory.Directory(self.root)
+        self.assertEqual(
+            self.names(tree.filter(extensions=[".txt"])),
+            [".hidden.txt", "a.txt", "skip/e.txt", "sub/c.TXT"],
+        )
+        self.assertEqual(self.names(tree.filter(min_size=100)), ["b.log", "sub/c.TXT"])
+        self.assertEqual(self.names(tree.filter(max_size=50, extensions="log")), ["sub/deeper/d.log"])
+        self.assertEqual(self.names(tree.filter(file_classes=file.FileClass.HIDDEN)), [".hidden.txt"])
+        self.assertEqual(self.names(tree.filter(file_classes=[file.FileClass.TEMPORARY])), ["scratch.tmp"])
+        self.assertEqual(self.names(tree.filter(modified_after=time.time() + 60)), [])
+
+    def test_files(self):
+        files = list(directory.Directory(self.root, extensions="log"))
+        self.assertEqual(sorted(f.size for f in files), [10, 1000])
+        self.assertTrue(all(isinstance(f, file.File) and not f.is_open for f in files))
+        self.assertTrue(all(f.file_class == file.FileClass.NORMAL for f in files))
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks not supported")
+    def test_symlink_cycle(self):
+        os.symlink("..", os.path.join(self.root, "sub", "loop"))
+        os.symlink(os.path.join(self.root, "sub"), os.path.join(self.root, "link"))
+        self.assertEqual(len(self.names(directory.Directory(self.root))), 7)
+        names = self.names(directory.Directory(self.root, follow_symlinks=True))
+        self.assertEqual(len(names), 7)
+        self.assertEqual(len({os.path.basename(name) for name in names}), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
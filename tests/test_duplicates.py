@@ -0,0 +1,91 @@
+import unittest
+import os
+import hashlib
+import tempfile
+import shutil
+from unittest import mock
+import PyFile
+from PyFile import duplicates
+from PyFile import directory
+
+
+class TestDuplicates(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.large = os.urandom(100000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def groups(self, *args, **kwargs):
+        return sorted(
+            (group.size, group.digest, sorted(group.paths))
+            for group in PyFile.find_duplicates(*args, **kwargs)
+        )
+
+    def test_find_duplicates(self):
+        small = [self.write("a.txt", b"same"), self.write("sub/b.txt", b"same")]
+        self.write("c.txt", b"diff")
+        large = [self.write("large1.bin", self.large), self.write("sub/large2.bin", self.large)]
+        # Same size, same first and last blocks, different middle.
+        self.write("large3.bin", self.large[:50000] + b"x" + self.large[50001:])
+        self.write("empty1", b"")
+        self.write("empty2", b"")
+
+        self.assertEqual(self.groups(self.directory, workers=3, partial_size=1024), [
+            (4, hashlib.sha256(b"same").hexdigest(), sorted(small)),
+            (len(self.large), hashlib.sha256(self.large).hexdigest(), sorted(large)),
+        ])
+        # The same through an explicit list of paths, and a filtered Directory.
+        paths = list(directory.Directory(self.directory).paths())
+        self.assertEqual(len(self.groups(paths, partial_size=1024)), 2)
+        self.assertEqual(len(self.groups(directory.Directory(self.directory, extensions="txt"))), 1)
+        self.assertEqual(len(self.groups(self.directory, min_size=0)), 3)
+
+    def test_stages(self):
+        self.write("large1.bin", self.large)
+        self.write("large2.bin", self.large[:-1] + b"x")
+        self.write("unique.bin", self.large + b"x")
+        with mock.patch.object(duplicates, "_full_digest", wraps=duplicates._full_digest) as full:
+            self.assertEqual(self.groups(self.directory, partial_size=1024), [])
+            # Screening separated the candidates, so nothing was hashed in full.
+            full.assert_not_called()
+
+    def test_hardlinks(self):
+        original = self.write("original.bin", self.large)
+        link = os.path.join(self.directory, "link.bin")
+        os.link(original, link)
+        with mock.patch.object(duplicates, "_partial_digest", wraps=duplicates._partial_digest) as partial:
+            # Only links to one file: nothing to deduplicate, nothing read.
+            self.assertEqual(self.groups(self.directory), [])
+            partial.assert_not_called()
+
+        copy = self.write("copy.bin", self.large)
+        with mock.patch.object(duplicates, "_full_digest", wraps=duplicates._full_digest) as full:
+            groups = self.groups(self.directory)
+            self.assertEqual(full.call_count, 2)
+        self.assertEqual(groups, [(len(self.large), hashlib.sha256(self.large).hexdigest(), sorted([original, link, copy]))])
+
+    def test_unreadable(self):
+        paths = [self.write("a.bin", self.large), self.write("b.bin", self.large), self.write("c.bin", self.large)]
+        real = duplicates._full_digest
+
+        def flaky(path, algorithm):
+            if path == paths[0]:
+                raise PermissionError(path)
+            return real(path, algorithm)
+
+        with mock.patch.object(duplicates, "_full_digest", side_effect=flaky):
+            groups = self.groups(paths + [os.path.join(self.directory, "missing")])
+        self.assertEqual([group[2] for group in groups], [sorted(paths[1:])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
 import unittest
 import os
 import time
+import hashlib
+import shutil
+import zipfile
+from unittest import mock
 from PyFile import file
+from PyFile import cache
 
 
 # Many of these tests only check basic equality and type.
@@ -17,7 +22,37 @@ class TestFile(unittest.TestCase):
         self.test = None
 
     def test_init(self):
-        pass
+        self.assertTrue(self.test.exists)
+        self.assertEqual(self.test.file_class, file.FileClass.NORMAL)
+        self.assertFalse(file.File("does_not_exist.txt").exists)
+
+        lazy = file.File(self.filename)
+        self.assertTrue(lazy.is_open)
+        self.assertIsNone(lazy._file_io_obj)
+        self.assertEqual(lazy.read(), "")
+        self.assertIsNotNone(lazy._file_io_obj)
+        lazy.close()
+        self.assertFalse(lazy.is_open)
+
+    def test_from_dir_entry(self):
+        with os.scandir(".") as it:
+            entry = next(entry for entry in it if entry.name == self.filename)
+        test = file.File.from_dir_entry(entry)
+        self.assertTrue(test.exists)
+        self.assertFalse(test.is_open)
+        self.assertEqual(test.size, entry.stat().st_size)
+        self.assertEqual(file.File.from_stat(self.filename, os.stat(self.filename)).basename, self.filename)
+
+    def test_construction_cost(self):
+        # Constructing a File should cost one stat and no open file descriptor.
+        with mock.patch("os.stat", wraps=os.stat) as stat, \
+                mock.patch("builtins.open", wraps=open) as opener, \
+                mock.patch("os.open", wraps=os.open) as os_open:
+            test = file.File(self.filename)
+        self.assertEqual(stat.call_count, 1)
+        self.assertFalse(opener.called)
+        self.assertFalse(os_open.called)
+        self.assertIsNone(test._file_io_obj)
 
     def test_basename(self):
         self.assertEqual(self.test.basename, self.filename)
@@ -78,12 +113,24 @@ class TestFile(unittest.TestCase):
 
     def test_line_cnt(self):
         self.assertEqual(self.test.line_cnt, 0)
-        # self.test._file_io_obj.write("#" * 100)
-        # self.assertEqual(self.test.line_cnt, 1)
-        # self.test.write("#" * 100)
-        # self.assertEqual(self.test.line_cnt, 2)
-        # self.test.write("#" * 100)
-        # self.assertEqual(self.test.line_cnt, 3)
+        self.test.write("#" * 100)
+        self.assertEqual(self.test.line_cnt, 1)
+        self.assertEqual(self.test.count_lines(count_unterminated=False), 0)
+        self.test.write("\n" + "#" * 100)
+        self.assertEqual(self.test.line_cnt, 2)
+        self.test.write("\n")
+        self.assertEqual(self.test.line_cnt, 2)
+        self.assertEqual(self.test.count_lines(count_unterminated=False), 2)
+
+    def test_line(self):
+        self.test.write("".join(f"line {i}\n" for i in range(3000)))
+        self.assertEqual(self.test.line(0), "line 0\n")
+        self.assertEqual(self.test.line(2999), "line 2999\n")
+        self.assertEqual(self.test.line(-1), "line 2999\n")
+        self.assertEqual(self.test.lines(1500, 1502), ["line 1500\n", "line 1501\n"])
+        self.assertRaises(IndexError, self.test.line, 3000)
+        self.test.write("appended\n")
+        self.assertEqual(self.test.line(3000), "appended\n")
 
     def test_stat(self):
         pass
@@ -142,6 +189,36 @@ class TestFile(unittest.TestCase):
         self.assertEqual(len(self.test.sha256()), 64)
         self.assertFalse(self.test.is_open)
 
+    def test_hashes(self):
+        self.test.write("#" * 100000)
+        hashes = self.test.hashes(["md5", "sha256", "blake2b"])
+        data = b"#" * 100000
+        self.assertEqual(hashes["md5"], hashlib.md5(data).hexdigest())
+        self.assertEqual(hashes["sha256"], hashlib.sha256(data).hexdigest())
+        self.assertEqual(hashes["blake2b"], hashlib.blake2b(data).hexdigest())
+        self.assertEqual(self.test.sha256(), hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.test.md5(file.HashType.BYTES), hashlib.md5(data).digest())
+
+    def test_hash_cache(self):
+        self.test.write("#" * 100)
+        first = self.test.sha256()
+        self.assertIn(("digest", "sha256"), self.test._cache)
+        self.test.write("#" * 100)
+        # Writes only mark the file dirty; the cache is dropped once, on flush.
+        self.assertIn(("digest", "sha256"), self.test._cache)
+        self.test.flush()
+        self.assertNotIn(("digest", "sha256"), self.test._cache)
+        self.assertNotEqual(self.test.sha256(), first)
+
+        other = file.File(self.filename, open_file=False)
+        shared = cache.enable_shared_cache()
+        try:
+            digest = other.sha256()
+            self.assertEqual(file.File(self.filename, open_file=False).sha256(), digest)
+            self.assertEqual(shared.stats()["hits"], 1)
+        finally:
+            cache.disable_shared_cache()
+
     def test_delete(self):
         self.assertTrue(os.path.exists(self.test.abs_path))
         self.assertTrue(os.path.isfile(self.test.abs_path))
@@ -164,10 +241,72 @@ class TestFile(unittest.TestCase):
         pass
 
     def test_backup(self):
-        pass
+        self.test.write("#" * 1000)
+        backup_file = self.test.backup("test_backups/", codec="bz2", level=9)
+        try:
+            with zipfile.ZipFile(backup_file) as archive:
+                self.assertEqual(archive.read(self.filename), b"#" * 1000)
+                self.assertEqual(archive.read(self.filename + ".SHA256").decode(), self.test.sha256())
+                self.assertEqual(archive.getinfo(self.filename).compress_type, zipfile.ZIP_BZIP2)
+        finally:
+            shutil.rmtree("test_backups")
+
+    def test_write_binary(self):
+        self.assertEqual(self.test.write("text\n"), 5)
+        self.assertEqual(self.test.write(b"\x00\xff\n"), 3)
+        self.test.writelines(["a\n", b"b\n"])
+        self.assertEqual(self.test.size, 12)
+        with open(self.filename, "rb") as f:
+            self.assertEqual(f.read(), b"text\n\x00\xff\na\nb\n")
+
+    def test_open_writer(self):
+        first = self.test.md5()
+        with self.test.open_writer() as writer:
+            writer.writelines([b"record\n"] * 1000)
+        self.assertEqual(self.test.size, 7000)
+        self.assertEqual(self.test.md5(), hashlib.md5(b"record\n" * 1000).hexdigest())
+        self.assertNotEqual(self.test.md5(), first)
+
+    def test_copy_to(self):
+        self.test.write("#" * 1000)
+        os.mkdir("test_copies")
+        try:
+            destination = self.test.copy_to("test_copies")
+            self.assertEqual(destination, os.path.join("test_copies", self.filename))
+            with open(destination) as f:
+                self.assertEqual(f.read(), "#" * 1000)
+        finally:
+            shutil.rmtree("test_copies")
+
+    def test_copy_to_itself(self):
+        self.test.write("#" * 1000)
+        with self.assertRaises(shutil.SameFileError):
+            self.test.copy_to(os.path.dirname(self.test.abs_path))
+        with self.assertRaises(shutil.SameFileError):
+            self.test.copy_to(self.test.abs_path)
+        with open(self.test.abs_path) as f:
+            self.assertEqual(f.read(), "#" * 1000)
+
+    def test_view(self):
+        self.test.write("alpha\nbeta")
+        with self.test.view() as view:
+            self.assertTrue(view.readonly)
+            self.assertEqual(view[6:], b"beta")
 
     def test_grep(self):
-        pass
+        self.test.write("alpha\nbeta\ngamma\nalphabet")
+        self.assertEqual(self.test.grep("^alpha"), ["alpha\n", "alphabet"])
+        self.assertEqual(self.test.grep("alpha", count_only=True), 2)
+        self.assertEqual(self.test.grep("alpha", max_count=1), ["alpha\n"])
+        self.assertEqual(self.test.grep("alpha", invert=True), ["beta\n", "gamma\n"])
+        matches = list(self.test.grep_iter("gamma", before=1, after=1))
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0][:3], (3, 11, b"gamma"))
+        self.assertEqual(matches[0].before, ((2, 6, b"beta"),))
+        self.assertEqual(matches[0].after, ((4, 17, b"alphabet"),))
+
+        self.test.truncate()
+        self.assertEqual(self.test.grep("alpha"), [])
 
 
 if __name__ == "__main__":
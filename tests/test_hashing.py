@@ -0,0 +1,35 @@
+import unittest
+import os
+import hashlib
+from PyFile import hashing
+
+
+class TestHashing(unittest.TestCase):
+    def setUp(self):
+        self.filename = "test_hashing.bin"
+        self.data = os.urandom(200000)
+        with open(self.filename, "wb") as file:
+            file.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_new_hashers(self):
+        hashers = hashing.new_hashers(["MD5", "sha256", "md5"])
+        self.assertEqual(list(hashers.keys()), ["md5", "sha256"])
+        self.assertRaises(ValueError, hashing.new_hashers, ["not_a_hash"])
+        self.assertRaises(ValueError, hashing.new_hashers, [])
+
+    def test_hash_path(self):
+        hashers = hashing.hash_path(self.filename, ["md5", "sha1", "sha256", "blake2b"])
+        for name, hasher in hashers.items():
+            self.assertEqual(hasher.hexdigest(), hashlib.new(name, self.data).hexdigest())
+
+    def test_block_size(self):
+        for block_size in (1, 7, 4096, 1 << 20):
+            hashers = hashing.hash_path(self.filename, ["sha256"], block_size)
+            self.assertEqual(hashers["sha256"].hexdigest(), hashlib.sha256(self.data).hexdigest())
+
+
+if __name__ == "__main__":
+    unittest.main()
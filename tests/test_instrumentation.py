@@ -0,0 +1,86 @@
+import unittest
+import os
+import shutil
+import tempfile
+from PyFile import file
+from PyFile import instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "file.txt")
+        with open(self.path, "w") as f:
+            f.write("alpha\nbeta\ngamma\n")
+        self.events = []
+        self.recorder = instrumentation.enable_instrumentation(self.events.append)
+
+    def tearDown(self):
+        instrumentation.disable_instrumentation()
+        shutil.rmtree(self.directory)
+
+    def test_counters(self):
+        test = file.File(self.path, open_file=False)
+        test.sha256()
+        test.sha256()
+        self.assertEqual(test.line_cnt, 3)
+        self.assertEqual(test.grep("^.a"), ["gamma\n"])
+        test.backup(self.directory + os.sep)
+
+        stats = instrumentation.snapshot()
+        self.assertEqual(stats["sha256"]["calls"], 2)
+        self.assertEqual(stats["sha256"]["cache_misses"], 1)
+        self.assertEqual(stats["sha256"]["cache_hits"], 1)
+        self.assertEqual(stats["sha256"]["bytes_read"], 17)
+        self.assertNotIn("hashes", stats)
+        self.assertEqual(stats["line_cnt"]["calls"], 1)
+        self.assertEqual(stats["line_cnt"]["bytes_read"], 17)
+        self.assertEqual(stats["grep"]["bytes_read"], 17)
+        self.assertEqual(stats["backup"]["bytes_read"], 17)
+        self.assertGreater(stats["backup"]["bytes_written"], 0)
+        self.assertGreaterEqual(stats["backup"]["seconds"], 0)
+
+        self.assertEqual([event.operation for event in self.events], ["sha256", "sha256", "line_cnt", "grep", "backup"])
+        self.assertEqual(self.events[0].path, self.path)
+        self.assertIsNone(self.events[0].error)
+
+    def test_read_write(self):
+        test = file.File(self.path, mode="r+")
+        self.assertEqual(test.read(), "alpha\nbeta\ngamma\n")
+        test.write("delta\n")
+        test.writelines(["x\n", "y\n"])
+        test.close()
+
+        stats = self.recorder.snapshot()
+        self.assertEqual(stats["read"]["bytes_read"], 17)
+        self.assertEqual(stats["write"]["bytes_written"], 6)
+        self.assertEqual(stats["writelines"]["bytes_written"], 4)
+        # The deferred open happens inside read and is counted there.
+        self.assertNotIn("open", stats)
+        test.open()
+        test.close()
+        self.assertEqual(self.recorder.snapshot()["open"]["calls"], 1)
+
+    def test_errors(self):
+        test = file.File(self.path, open_file=False)
+        os.remove(self.path)
+        self.assertRaises(FileNotFoundError, test.sha256)
+        self.assertEqual(instrumentation.snapshot()["sha256"]["errors"], 1)
+        self.assertIsInstance(self.events[0].error, FileNotFoundError)
+
+    def test_disabled(self):
+        instrumentation.disable_instrumentation()
+        test = file.File(self.path, open_file=False)
+        test.sha256()
+        self.assertEqual(instrumentation.snapshot(), {})
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.recorder.snapshot(), {})
+
+    def test_reset(self):
+        file.File(self.path, open_file=False).md5()
+        self.recorder.reset()
+        self.assertEqual(self.recorder.snapshot(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+from PyFile import lines
+
+
+class TestLines(unittest.TestCase):
+    def setUp(self):
+        self.filename = "test_lines.txt"
+        with open(self.filename, "wb") as f:
+            f.write(b"line\n" * 10000 + b"last")
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_count_newlines(self):
+        self.assertEqual(lines.count_newlines(self.filename), 10000)
+        self.assertEqual(lines.count_newlines(self.filename, block_size=7), 10000)
+        self.assertEqual(lines.count_newlines(self.filename, 0, 10), 2)
+        self.assertEqual(lines.count_newlines(self.filename, 5, 12, block_size=3), 1)
+
+    def test_count_lines(self):
+        self.assertEqual(lines.count_lines(self.filename), 10001)
+        self.assertEqual(lines.count_lines(self.filename, count_unterminated=False), 10000)
+
+    def test_parallel(self):
+        self.assertEqual(lines.count_lines(self.filename, workers=3, block_size=1024), 10001)
+
+
+class TestLineIndex(unittest.TestCase):
+    def setUp(self):
+        self.filename = "test_line_index.txt"
+        self.index_file = "test_line_index.lidx"
+        with open(self.filename, "wb") as f:
+            f.write(b"".join(b"line %d\n" % i for i in range(5000)) + b"tail")
+
+    def tearDown(self):
+        for path in (self.filename, self.index_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_read_lines(self):
+        with open(self.filename, "rb") as f:
+            expected = f.readlines()
+        for step in (1, 7, 1024, 10000):
+            index = lines.LineIndex.build(self.filename, step)
+            self.assertEqual(len(index), 5001)
+            self.assertEqual(index.read_lines(self.filename, 0, 6000), expected)
+            self.assertEqual(index.read_lines(self.filename, 4321, 4323), expected[4321:4323])
+        self.assertRaises(IndexError, index.locate, 5001)
+
+    def test_append(self):
+        index = lines.LineIndex.build(self.filename, 100)
+        offsets = len(index.offsets)
+        with open(self.filename, "ab") as f:
+            f.write(b" end\n" + b"more\n" * 300)
+        self.assertTrue(index.refresh(self.filename))
+        self.assertEqual(len(index), 5301)
+        self.assertEqual(len(index.offsets), offsets + 3)
+        self.assertEqual(index.read_lines(self.filename, 5000, 5002), [b"tail end\n", b"more\n"])
+        self.assertFalse(index.refresh(self.filename))
+
+    def test_rewrite(self):
+        index = lines.LineIndex.build(self.filename, 100)
+        with open(self.filename, "wb") as f:
+            f.write(b"a\nb\n")
+        index.refresh(self.filename)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.read_lines(self.filename, 1, 2), [b"b\n"])
+
+    def test_save_load(self):
+        index = lines.LineIndex.build(self.filename, 64)
+        index.save(self.index_file)
+        loaded = lines.LineIndex.load(self.index_file)
+        self.assertEqual(loaded.signature, index.signature)
+        self.assertEqual(loaded.offsets, index.offsets)
+        self.assertEqual(len(loaded), len(index))
+        self.assertFalse(loaded.refresh(self.filename))
+        self.assertIsNone(lines.LineIndex.load(self.filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import os
+import hashlib
+import tempfile
+import shutil
+from unittest import mock
+from PyFile import merkle
+from PyFile import file
+
+
+class TestMerkle(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.bin")
+        self.data = os.urandom(10000)
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def expected(self, data, block_size=1024):
+        leaves = [
+            hashlib.sha256(b"\x00" + data[i:i + block_size]).digest()
+            for i in range(0, len(data), block_size)
+        ]
+        return merkle.merkle_root(leaves, "sha256"), leaves
+
+    def test_merkle_root(self):
+        a, b, c = (hashlib.sha256(x).digest() for x in (b"a", b"b", b"c"))
+        ab = hashlib.sha256(b"\x01" + a + b).digest()
+        self.assertEqual(merkle.merkle_root([a], "sha256"), a)
+        self.assertEqual(merkle.merkle_root([a, b], "sha256"), ab)
+        self.assertEqual(merkle.merkle_root([a, b, c], "sha256"), hashlib.sha256(b"\x01" + ab + c).digest())
+        self.assertEqual(merkle.merkle_root([], "sha256"), hashlib.sha256(b"\x00").digest())
+
+    def test_build(self):
+        tree = merkle.MerkleTree.build(self.path, 1024)
+        root, leaves = self.expected(self.data)
+        self.assertEqual(tree.leaves, leaves)
+        self.assertEqual(tree.root, root)
+        self.assertEqual(len(tree), 10)
+        self.assertFalse(tree.refresh(self.path))
+
+    def test_incremental(self):
+        tree = merkle.MerkleTree.build(self.path, 1024)
+        with open(self.path, "ab") as f:
+            f.write(b"appended" * 300)
+        data = self.data + b"appended" * 300
+
+        with mock.patch.object(merkle.MerkleTree, "_leaf", autospec=True, side_effect=merkle.MerkleTree._leaf) as leaf:
+            self.assertTrue(tree.refresh(self.path))
+            # The old partial last block, three new blocks, and one block to check the old data.
+            self.assertEqual(leaf.call_count, 5)
+        self.assertEqual(tree.root, self.expected(data)[0])
+
+        with open(self.path, "r+b") as f:
+            f.seek(5000)
+            f.write(b"patched")
+        data = data[:5000] + b"patched" + data[5007:]
+        tree.mark_dirty(5000, 5007)
+        self.assertEqual(tree.dirty_ranges(), [(4096, 5120)])
+        with mock.patch.object(merkle.MerkleTree, "_leaf", autospec=True, side_effect=merkle.MerkleTree._leaf) as leaf:
+            tree.refresh(self.path)
+            self.assertEqual(leaf.call_count, 1)
+        self.assertEqual(tree.root, self.expected(data)[0])
+
+        os.truncate(self.path, 3000)
+        tree.refresh(self.path)
+        self.assertEqual(tree.root, self.expected(data[:3000])[0])
+
+    def test_unannounced_change(self):
+        tree = merkle.MerkleTree.build(self.path, 1024)
+        # Rewriting the old end of the file along with an append is noticed.
+        with open(self.path, "r+b") as f:
+            f.seek(9000)
+            f.write(b"x" * 10)
+            f.seek(0, os.SEEK_END)
+            f.write(b"y")
+        tree.refresh(self.path)
+        with open(self.path, "rb") as f:
+            self.assertEqual(tree.root, self.expected(f.read())[0])
+
+    def test_verify_range(self):
+        tree = merkle.MerkleTree.build(self.path, 1024)
+        with open(self.path, "r+b") as f:
+            f.seek(5000)
+            f.write(b"!")
+        self.assertTrue(tree.verify_range(self.path, 0, 4096))
+        self.assertTrue(tree.verify_range(self.path, 6000, 10000))
+        self.assertFalse(tree.verify_range(self.path, 4096, 5121))
+        self.assertFalse(tree.verify_range(self.path, 0, 20000))
+        self.assertTrue(tree.verify_range(self.path, 5, 5))
+
+    def test_save_load(self):
+        tree = merkle.MerkleTree.build(self.path, 1024, "blake2b")
+        sidecar = self.path + ".mrkl"
+        tree.save(sidecar)
+        loaded = merkle.MerkleTree.load(sidecar)
+        self.assertEqual((loaded.block_size, loaded.algorithm), (1024, "blake2b"))
+        self.assertEqual(loaded.leaves, tree.leaves)
+        self.assertEqual(loaded.signature, tree.signature)
+        self.assertFalse(loaded.refresh(self.path))
+
+        with open(sidecar, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"\xff" if f.read(1) != b"\xff" else b"\x00")
+        self.assertIsNone(merkle.MerkleTree.load(sidecar))
+        self.assertIsNone(merkle.MerkleTree.load(self.path))
+
+    def test_file(self):
+        test = file.File(self.path, mode="r+b")
+        tree = test.merkle(block_size=1024, persist=True)
+        self.assertEqual(test.merkle_root(), self.expected(self.data)[0].hex())
+
+        test.write(b"patched")
+        self.assertEqual(tree.dirty, {0})
+        test.truncate(4000)
+        self.assertEqual(tree.dirty, {0, 3, 4, 5, 6, 7, 8, 9})
+        data = b"patched" + self.data[7:4000]
+        self.assertTrue(test.verify_range(0, 4000))
+        self.assertEqual(test.merkle(block_size=1024).root, self.expected(data)[0])
+        test.close()
+
+        # Another reader checks slices against the persisted tree after a corruption.
+        test.merkle(block_size=1024, persist=True)
+        with open(self.path, "r+b") as f:
+            f.seek(3000)
+            f.write(b"!")
+        reader = file.File(self.path, open_file=False)
+        self.assertTrue(reader.verify_range(0, 2048))
+        self.assertFalse(reader.verify_range(2048, 4000))
+        self.assertRaises(ValueError, file.File(self.path + ".mrkl", open_file=False).verify_range, 0, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
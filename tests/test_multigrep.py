@@ -0,0 +1,113 @@
+import unittest
+import io
+import os
+import re
+import random
+import tempfile
+from unittest import mock
+import PyFile
+from PyFile import multigrep
+from PyFile.search import compile_pattern, grep_buffer
+
+
+class TestMultiGrep(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        words = ["disk", "full", "error", "Error", "timeout", "ok", "retry", "abc", "abcabc", "user=42"]
+        lines = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 6))) for _ in range(500)]
+        self.data = ("\n".join(lines) + "\nno newline at end").encode()
+        with tempfile.NamedTemporaryFile("wb", delete=False) as tmp:
+            tmp.write(self.data)
+            self.path = tmp.name
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def expected(self, pattern, flags=0):
+        return list(grep_buffer(self.data, compile_pattern(pattern, flags)))
+
+    def test_aho_corasick(self):
+        automaton = multigrep.AhoCorasick(["he", "she", b"his", "hers"])
+        self.assertEqual(automaton.search(b"ushers"), {0, 1, 3})
+        self.assertEqual(automaton.search(b"ahishe"), {0, 1, 2})
+        self.assertEqual(automaton.search(b"xyz"), set())
+        self.assertEqual(automaton.search(b"h\nis"), set())
+        with self.assertRaises(ValueError):
+            multigrep.AhoCorasick(["a\nb"])
+        with self.assertRaises(ValueError):
+            multigrep.AhoCorasick([""])
+
+    def test_scan(self):
+        patterns = [r"disk \w+", "(?i)error", r"(abc)\1", r"user=\d+$", "^ok", "end$", "nothing"]
+        literals = ["timeout", "retry ok", b"abc", "at end"]
+        pattern_set = multigrep.PatternSet(patterns, literals)
+        self.assertEqual(len(pattern_set), 11)
+
+        for block_size, screens in ((7, True), (64, False), (1 << 20, True), (1 << 20, False)):
+            with mock.patch.object(multigrep.PatternSet, "_screens", return_value=screens):
+                results = pattern_set.scan(io.BytesIO(self.data), block_size=block_size)
+            self.assertEqual(list(results), patterns + literals)
+            for pattern in patterns:
+                self.assertEqual(results[pattern], self.expected(pattern))
+            for literal in literals:
+                literal_bytes = literal.encode() if isinstance(literal, str) else literal
+                self.assertEqual(results[literal], self.expected(re.escape(literal_bytes)))
+
+    def test_screens(self):
+        self.assertTrue(multigrep.PatternSet(literals=["user=42", "#x"])._screens(self.data))
+        self.assertFalse(multigrep.PatternSet(literals=[" %d" % i for i in range(10)])._screens(self.data))
+        every_byte = multigrep.PatternSet(literals=[bytes([byte]) + b"x" for byte in range(1, 256) if byte != 10])
+        self.assertFalse(every_byte._screens(b"abc"))
+
+    def test_repeated_group_names(self):
+        patterns = ["(?P<n>disk) full", "(?P<n>err)or", "(?P<n>time)out"]
+        results = multigrep.PatternSet(patterns).scan(io.BytesIO(self.data))
+        for pattern in patterns:
+            self.assertEqual(results[pattern], self.expected(pattern))
+
+    def test_string_anchors(self):
+        # \Z must not match at the end of every line the alternation selects.
+        patterns = ["error", r"\Z", r"end\Z", r"nothing|\Z"]
+        for block_size in (7, 1 << 20):
+            results = multigrep.PatternSet(patterns).scan(io.BytesIO(self.data), block_size=block_size)
+            for pattern in patterns:
+                self.assertEqual(results[pattern], self.expected(pattern))
+        # \A matches at the start of each block, so only a single block matches grep_buffer.
+        first = self.data.split(b" ", 1)[0].decode()
+        patterns = ["error", r"\A" + first, r"\A(?:disk|ok)"]
+        results = multigrep.PatternSet(patterns).scan(io.BytesIO(self.data))
+        for pattern in patterns:
+            self.assertEqual(results[pattern], self.expected(pattern))
+        self.assertEqual(len(results[r"\A" + first]), 1)
+
+    def test_duplicates(self):
+        with self.assertRaises(ValueError):
+            multigrep.PatternSet(["err", "err"])
+        with self.assertRaises(ValueError):
+            multigrep.PatternSet(["err"], ["err"])
+        results = multigrep.PatternSet(["err"], [b"err"]).scan(io.BytesIO(self.data), count_only=True)
+        self.assertEqual(len(results), 2)
+
+    def test_count_and_max_count(self):
+        pattern_set = multigrep.PatternSet(["disk", "(?i)ERROR"], ["retry"], flags=re.IGNORECASE)
+        counts = pattern_set.scan(io.BytesIO(self.data), count_only=True)
+        self.assertEqual(counts["disk"], len(self.expected("disk")))
+        self.assertEqual(counts["(?i)ERROR"], len(self.expected("error", re.IGNORECASE)))
+        self.assertEqual(counts["retry"], len(self.expected("retry")))
+
+        limited = pattern_set.scan(io.BytesIO(self.data), max_count=3)
+        self.assertEqual(limited["disk"], self.expected("disk")[:3])
+        self.assertEqual(limited["retry"], self.expected("retry")[:3])
+        self.assertEqual(pattern_set.scan(io.BytesIO(self.data), count_only=True, max_count=0)["disk"], 0)
+
+    def test_file_grep_many(self):
+        test = PyFile.File(self.path)
+        pattern_set = multigrep.PatternSet(["disk", "full$"], ["user=42"])
+        self.assertEqual(test.grep_many(pattern_set), test.grep_many(["disk", "full$"], ["user=42"]))
+        counts = test.grep_many(["disk"], ["ok"], count_only=True)
+        self.assertEqual(counts, {"disk": test.grep("disk", count_only=True), "ok": test.grep("ok", count_only=True)})
+        test.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+import zlib
+from PyFile import repository, file
+
+
+class TestRepository(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.bin")
+        self.data = os.urandom(600000)
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        self.repo = repository.BackupRepository(
+            os.path.join(self.directory, "repo"), min_size=2048, avg_size=8192, max_size=32768
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_chunk_stream(self):
+        chunks = list(repository.chunk_stream(io.BytesIO(self.data), 2048, 8192, 32768))
+        self.assertEqual(b"".join(chunks), self.data)
+        self.assertTrue(all(len(chunk) <= 32768 for chunk in chunks))
+        self.assertTrue(all(len(chunk) >= 2048 for chunk in chunks[:-1]))
+        self.assertEqual(list(repository.chunk_stream(io.BytesIO(b""))), [])
+
+    def test_find_cut_matches_gear_hash(self):
+        def reference(buf, start, min_size, max_size, mask):
+            h = 0
+            limit = min(len(buf), start + max_size)
+            for i in range(start + min_size, limit):
+                h = ((h << 1) + repository._GEAR[buf[i]]) & repository._MASK64
+                if not h & mask:
+                    return i + 1
+            return limit if limit - start >= max_size else -1
+
+        text = b"".join(b"line %d of the log\n" % (i % 97) for i in range(1000))
+        for buf in (self.data[:20000], text[:20000], bytes(5000)):
+            for bits in (1, 5, 12, 20):
+                mask = (1 << bits) - 1
+                start = 0
+                while start < len(buf):
+                    cut = repository._find_cut(buf, start, len(buf), 3, 1 << 15, mask)
+                    self.assertEqual(cut, reference(buf, start, 3, 1 << 15, mask))
+                    if cut < 0:
+                        break
+                    start = cut
+
+    def test_chunk_boundaries_resynchronize(self):
+        edited = self.data[:1000] + b"inserted" + self.data[1000:]
+        before = set(repository.chunk_stream(io.BytesIO(self.data), 2048, 8192, 32768))
+        after = list(repository.chunk_stream(io.BytesIO(edited), 2048, 8192, 32768))
+        self.assertGreater(sum(1 for chunk in after if chunk in before), len(after) - 3)
+
+    def test_backup_restore(self):
+        first = self.repo.backup(self.path)
+        self.assertEqual(first.size, len(self.data))
+        self.assertEqual(first.new_chunks, first.chunks)
+
+        with open(self.path, "r+b") as f:
+            f.seek(300000)
+            f.write(b"changed")
+        second = self.repo.backup(self.path)
+        self.assertLessEqual(second.new_chunks, 2)
+        self.assertEqual(len(self.repo.manifests(os.path.basename(self.path))), 2)
+
+        restored = os.path.join(self.directory, "restored.bin")
+        self.repo.restore(first.manifest, restored)
+        with open(restored, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.repo.restore(second.manifest, restored)
+        self.assertEqual(file.File(restored, open_file=False).sha256(), file.File(self.path, open_file=False).sha256())
+
+    def test_restore_corrupt_chunk(self):
+        result = self.repo.backup(self.path)
+        restored = os.path.join(self.directory, "restored.bin")
+        with open(restored, "wb") as f:
+            f.write(b"previous")
+
+        objects = os.path.join(self.repo.root, "objects")
+        subdir = sorted(os.listdir(objects))[-1]
+        chunk = os.path.join(objects, subdir, os.listdir(os.path.join(objects, subdir))[0])
+        with open(chunk, "wb") as f:
+            f.write(zlib.compress(b"corrupt"))
+
+        self.assertRaises(ValueError, self.repo.restore, result.manifest, restored)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["data.bin", "repo", "restored.bin"])
+        with open(restored, "rb") as f:
+            self.assertEqual(f.read(), b"previous")
+
+    def test_file_backup(self):
+        manifest = file.File(self.path, open_file=False).backup(repository=self.repo)
+        self.assertEqual(self.repo.manifests(), [manifest])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import io
+import os
+import re
+import shutil
+import tempfile
+from PyFile import search
+
+
+DATA = b"alpha\nbeta\ngamma\ndelta\nalphabet\nzeta"
+
+
+def grep(pattern, data=DATA, **kwargs):
+    return [match[:3] for match in search.grep_buffer(data, search.compile_pattern(pattern), **kwargs)]
+
+
+class TestSearch(unittest.TestCase):
+    def test_compile_pattern(self):
+        self.assertEqual(search.compile_pattern("a.c").pattern, b"a.c")
+        self.assertTrue(search.compile_pattern(b"x").flags & re.MULTILINE)
+        compiled = search.compile_pattern(re.compile("abc", re.IGNORECASE))
+        self.assertTrue(compiled.flags & re.IGNORECASE)
+        self.assertIsInstance(compiled.pattern, bytes)
+
+    def test_grep_buffer(self):
+        self.assertEqual(grep("^al"), [(1, 0, b"alpha"), (5, 23, b"alphabet")])
+        self.assertEqual(grep("ta$"), [(2, 6, b"beta"), (4, 17, b"delta"), (6, 32, b"zeta")])
+        self.assertEqual(grep(r"a\nb"), [])
+        self.assertEqual(grep("nomatch"), [])
+        self.assertEqual(grep("a", data=b""), [])
+
+    def test_max_count(self):
+        self.assertEqual(grep("a", max_count=2), [(1, 0, b"alpha"), (2, 6, b"beta")])
+        self.assertEqual(grep("a", max_count=0), [])
+
+    def test_invert(self):
+        self.assertEqual(grep("e", invert=True), [(1, 0, b"alpha"), (3, 11, b"gamma")])
+
+    def test_context(self):
+        matches = list(search.grep_buffer(DATA, search.compile_pattern("gamma"), before=2, after=5))
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0].before, ((1, 0, b"alpha"), (2, 6, b"beta")))
+        self.assertEqual(matches[0].after, ((4, 17, b"delta"), (5, 23, b"alphabet"), (6, 32, b"zeta")))
+
+    def test_empty_match_after_final_newline(self):
+        self.assertEqual(grep("^$", data=b"a\n\nb\n"), [(2, 2, b"")])
+        self.assertEqual(grep("^$", data=b"a\n\nb\n", invert=True), [(1, 0, b"a"), (3, 3, b"b")])
+
+    def test_grep_stream(self):
+        regex = search.compile_pattern("a")
+        for kwargs in ({}, {"max_count": 2}, {"invert": True}, {"before": 2, "after": 1}, {"after": 3, "max_count": 1}):
+            expected = list(search.grep_buffer(DATA, regex, **kwargs))
+            for block_size in (1, 4, 1024):
+                stream = io.BytesIO(DATA)
+                self.assertEqual(list(search.grep_stream(stream, regex, block_size=block_size, **kwargs)), expected)
+
+    def test_grep_stream_anchors(self):
+        data = b"ab\nba\n\nab\naab\nb"
+        for pattern in ("^a", "b$", "^$", "^ab$"):
+            regex = search.compile_pattern(pattern)
+            expected = list(search.grep_buffer(data, regex))
+            for block_size in (1, 2, 3):
+                stream = io.BytesIO(data)
+                self.assertEqual(list(search.grep_stream(stream, regex, block_size=block_size)), expected)
+
+
+class TestGrepTree(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for path, content in (
+            ("a.txt", b"needle one\nhay\n"),
+            ("b.log", b"hay\nneedle two\n"),
+            ("sub/c.txt", b"needle three\n"),
+            ("sub/skip/d.txt", b"needle four\n"),
+            ("binary.txt", b"needle\0binary"),
+        ):
+            path = os.path.join(self.directory, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def relative(self, results):
+        return [(os.path.relpath(path, self.directory), match.line) for path, match in results]
+
+    def test_walk_tree(self):
+        paths = [os.path.relpath(path, self.directory) for path in search.walk_tree(self.directory)]
+        self.assertEqual(paths, ["a.txt", "b.log", "binary.txt", "sub/c.txt", "sub/skip/d.txt"])
+
+    def test_grep_tree(self):
+        expected = [
+            ("a.txt", b"needle one"),
+            ("b.log", b"needle two"),
+            ("sub/c.txt", b"needle three"),
+            ("sub/skip/d.txt", b"needle four"),
+        ]
+        for workers in (1, 2):
+            results = search.grep_tree(self.directory, "needle", workers=workers, batch_size=1)
+            self.assertEqual(self.relative(results), expected)
+
+    def test_include_exclude(self):
+        results = search.grep_tree(self.directory, "needle", include="*.txt", exclude="skip", workers=1)
+        self.assertEqual(self.relative(results), [("a.txt", b"needle one"), ("sub/c.txt", b"needle three")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import os
+import asyncio
+import tempfile
+import shutil
+import threading
+import time
+from PyFile import tail
+from PyFile import file
+from PyFile import asyncfile
+
+
+class TestTail(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "app.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, data, path=None):
+        with open(path or self.path, "ab") as f:
+            f.write(data)
+
+    def test_split_lines(self):
+        self.assertEqual(tail.split_lines(b"a\r\nb\n\nc"), [b"a\r\n", b"b\n", b"\n", b"c"])
+        self.assertEqual(tail.split_lines(b""), [])
+
+    def test_tail_lines(self):
+        lines = [b"line %d\n" % i for i in range(1000)]
+        self.append(b"".join(lines))
+        for block_size in (1, 7, 64, 1 << 16):
+            self.assertEqual(tail.tail_lines(self.path, 10, block_size), lines[-10:])
+            self.assertEqual(tail.tail_lines(self.path, 1, block_size), lines[-1:])
+            self.assertEqual(tail.tail_lines(self.path, 5000, block_size), lines)
+        self.assertEqual(tail.tail_lines(self.path, 0), [])
+
+        self.append(b"partial")
+        self.assertEqual(tail.tail_lines(self.path, 2, 5), [lines[-1], b"partial"])
+
+    def test_tail_empty(self):
+        self.append(b"")
+        self.assertEqual(tail.tail_lines(self.path, 10), [])
+        self.append(b"\n\n")
+        self.assertEqual(tail.tail_lines(self.path, 10, 1), [b"\n", b"\n"])
+
+    def test_follower(self):
+        self.append(b"old\n")
+        with tail.Follower(self.path) as follower:
+            self.assertEqual(follower.read(), [])
+            self.append(b"one\ntw")
+            self.assertEqual(follower.read(), [b"one\n"])
+            self.assertEqual(follower.offset, 8)
+            self.append(b"o\n")
+            self.assertEqual(follower.read(), [b"two\n"])
+            offset = follower.offset
+
+        self.append(b"three\n")
+        with tail.Follower(self.path, offset) as follower:
+            self.assertEqual(follower.read(), [b"three\n"])
+
+    def test_rotation(self):
+        self.append(b"one\n")
+        follower = tail.Follower(self.path, 0)
+        self.assertEqual(follower.read(), [b"one\n"])
+        self.append(b"two\nunterminated")
+        os.rename(self.path, self.path + ".1")
+        # The writer keeps writing to the rotated file for a moment.
+        self.append(b"\nthree\n", self.path + ".1")
+        self.assertEqual(follower.read(), [b"two\n", b"unterminated\n", b"three\n"])
+        self.assertEqual(follower.read(), [])
+        self.append(b"four\n")
+        self.assertEqual(follower.read(), [b"four\n"])
+        self.append(b"five\n")
+        self.assertEqual(follower.read(), [b"five\n"])
+        follower.close()
+
+    def test_truncation(self):
+        self.append(b"one\ntwo\n")
+        with tail.Follower(self.path, 0) as follower:
+            self.assertEqual(follower.read(), [b"one\n", b"two\n"])
+            with open(self.path, "wb") as f:
+                f.write(b"x\n")
+            self.assertEqual(follower.read(), [b"x\n"])
+        with tail.Follower(self.path, 100) as follower:
+            self.assertEqual(follower.read(), [b"x\n"])
+
+    def test_file_follow(self):
+        self.append(b"old\n")
+        test = file.File(self.path, open_file=False)
+        self.assertEqual(test.tail(1), ["old\n"])
+
+        def writer():
+            for i in range(5):
+                time.sleep(0.01)
+                self.append(b"new %d\n" % i)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        lines = list(test.follow(min_interval=0.005, max_interval=0.02, timeout=0.5))
+        thread.join()
+        self.assertEqual(lines, [f"new {i}\n" for i in range(5)])
+
+    def test_async_follow(self):
+        self.append(b"old\n")
+
+        async def main():
+            test = asyncfile.AsyncFile(self.path, executor=asyncfile.AsyncExecutor(workers=1))
+            lines = []
+            async for line in test.follow(offset=0, min_interval=0.005, timeout=0.2):
+                lines.append(line)
+                if line == "old\n":
+                    self.append(b"new\n")
+            test.executor.shutdown()
+            return lines
+
+        self.assertEqual(asyncio.run(main()), ["old\n", "new\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import stat
+import errno
+import tempfile
+import shutil
+from unittest import mock
+from PyFile import transfer
+from PyFile.config import MMAP_MIN_SIZE
+
+
+class TestTransfer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "source.bin")
+        self.destination = os.path.join(self.directory, "destination.bin")
+        self.data = os.urandom(MMAP_MIN_SIZE + 12345)
+        with open(self.source, "wb") as f:
+            f.write(self.data)
+        os.chmod(self.source, 0o640)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_copy_file(self):
+        self.assertEqual(transfer.copy_file(self.source, self.destination), len(self.data))
+        self.assertEqual(self.read(self.destination), self.data)
+        self.assertEqual(stat.S_IMODE(os.stat(self.destination).st_mode), 0o640)
+
+    def test_copy_file_fallbacks(self):
+        unsupported = OSError(errno.EXDEV, "unsupported")
+        with mock.patch("os.copy_file_range", side_effect=unsupported, create=True):
+            self.assertEqual(transfer.copy_file(self.source, self.destination), len(self.data))
+            self.assertEqual(self.read(self.destination), self.data)
+            with mock.patch("os.sendfile", side_effect=unsupported, create=True):
+                self.assertEqual(transfer.copy_file(self.source, self.destination, 4096), len(self.data))
+                self.assertEqual(self.read(self.destination), self.data)
+
+    def test_copy_empty_file(self):
+        open(self.source, "wb").close()
+        with open(self.destination, "wb") as f:
+            f.write(b"old contents")
+        self.assertEqual(transfer.copy_file(self.source, self.destination), 0)
+        self.assertEqual(self.read(self.destination), b"")
+
+    def test_iter_blocks(self):
+        for size in (0, 1000, len(self.data)):
+            with open(self.source, "wb") as f:
+                f.write(self.data[:size])
+            blocks = [bytes(block) for block in transfer.iter_blocks(self.source, 4096)]
+            self.assertEqual(b"".join(blocks), self.data[:size])
+            self.assertTrue(all(len(block) == 4096 for block in blocks[:-1]))
+
+    def test_iter_blocks_closed_early(self):
+        # Stopping partway through a memory mapped file must release the map.
+        blocks = transfer.iter_blocks(self.source, 4096)
+        self.assertEqual(bytes(next(blocks)), self.data[:4096])
+        blocks.close()
+
+    def test_map_view(self):
+        with open(self.source, "rb") as f, transfer.map_view(f) as view:
+            self.assertTrue(view.readonly)
+            self.assertEqual(view[100:200], self.data[100:200])
+        open(self.source, "wb").close()
+        with open(self.source, "rb") as f, transfer.map_view(f) as view:
+            self.assertEqual(len(view), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import re
+import tempfile
+import shutil
+import PyFile
+from PyFile import trigram
+from PyFile.search import compile_pattern, grep_paths
+
+
+class TestTrigram(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.directory, ".trigrams")
+        self.write("a.txt", b"the quick brown fox\njumps over\n")
+        self.write("b.txt", b"lazy dog\nQuick thinking\n")
+        self.write("sub/c.txt", b"foxglove and foxes\n")
+        self.write("d.bin", b"\0binary fox\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def names(self, paths):
+        return sorted(os.path.relpath(path, self.directory) for path in paths)
+
+    def test_trigrams(self):
+        data = os.urandom(10001)
+        expected = {int.from_bytes(data[i:i + 3], "little") for i in range(len(data) - 2)}
+        self.assertEqual(trigram.trigrams(data), expected)
+        for size in range(8):
+            data = b"abcdefgh"[:size]
+            expected = {int.from_bytes(data[i:i + 3], "little") for i in range(len(data) - 2)}
+            self.assertEqual(trigram.trigrams(data), expected)
+
+    def test_query_plan(self):
+        key = trigram._key
+        self.assertEqual(trigram.query_plan(compile_pattern("abcd")), ("and", [key(b"abc"), key(b"bcd")]))
+        self.assertEqual(trigram.query_plan(compile_pattern("ab(c)d")), ("and", [key(b"abc"), key(b"bcd")]))
+        self.assertEqual(trigram.query_plan(compile_pattern("abc|xyz")), ("or", [key(b"abc"), key(b"xyz")]))
+        self.assertEqual(trigram.query_plan(compile_pattern("^abc\\b")), key(b"abc"))
+        self.assertEqual(trigram.query_plan(compile_pattern("x(abc)+y")), key(b"abc"))
+        self.assertIsNone(trigram.query_plan(compile_pattern("ab.cd")))
+        self.assertIsNone(trigram.query_plan(compile_pattern("abc|x")))
+        self.assertIsNone(trigram.query_plan(compile_pattern("(abc)*")))
+        self.assertEqual(len(trigram.query_plan(compile_pattern("abc", re.IGNORECASE))[1]), 8)
+
+    def test_search(self):
+        with PyFile.TrigramIndex(self.index_path) as index:
+            result = index.update(self.directory)
+            self.assertEqual(result, trigram.IndexUpdate(4, 0, 0, 0))
+            self.assertEqual(self.names(index.candidates("fox")), ["a.txt", "sub/c.txt"])
+            self.assertEqual(self.names(index.candidates("quick")), ["a.txt"])
+            self.assertEqual(self.names(index.candidates("quick", re.IGNORECASE)), ["a.txt", "b.txt"])
+            self.assertEqual(self.names(index.candidates("lazy|jumps")), ["a.txt", "b.txt"])
+            self.assertEqual(len(index.candidates("o")), 4)
+
+            patterns = [("fox", 0), ("fox(glove|es)", 0), ("QUICK", re.IGNORECASE), ("o+v", 0), ("^l", 0)]
+            for pattern, flags in patterns:
+                expected = list(grep_paths(sorted(index.paths), pattern, 1, None, False, flags))
+                self.assertEqual(sorted(index.search(pattern, flags)), sorted(expected))
+
+            matches = list(index.search("foxes"))
+            self.assertEqual(len(matches), 1)
+            self.assertEqual(matches[0][1].line, b"foxglove and foxes")
+
+    def test_update(self):
+        with PyFile.TrigramIndex(self.index_path) as index:
+            index.update(self.directory)
+            self.assertEqual(index.update(self.directory), trigram.IndexUpdate(0, 0, 0, 4))
+
+            self.write("b.txt", b"a fox appears\n")
+            os.remove(os.path.join(self.directory, "sub", "c.txt"))
+            self.write("e.txt", b"another fox\n")
+            self.assertEqual(index.update(self.directory), trigram.IndexUpdate(1, 1, 1, 2))
+            self.assertEqual(self.names(index.candidates("fox")), ["a.txt", "b.txt", "e.txt"])
+
+            # Files passed explicitly, as paths or Files, replace the corpus.
+            files = [PyFile.File(os.path.join(self.directory, "e.txt")), os.path.join(self.directory, "a.txt")]
+            self.assertEqual(index.update(files), trigram.IndexUpdate(0, 0, 2, 2))
+            self.assertEqual(self.names(index.paths), ["a.txt", "e.txt"])
+
+        with PyFile.TrigramIndex(self.index_path) as index:
+            self.assertEqual(self.names(index.candidates("fox")), ["a.txt", "e.txt"])
+
+    def test_update_workers(self):
+        for i in range(10):
+            self.write("many/%d.txt" % i, ("line %d\n" % i).encode() * 100)
+        with PyFile.TrigramIndex(self.index_path) as index:
+            index.update(self.directory, workers=2, chunk_size=64)
+            self.assertEqual(self.names(index.candidates("line 7")), ["many/7.txt"])
+
+    def test_invalid_index(self):
+        with open(self.index_path, "wb") as f:
+            f.write(b"not an index")
+        with PyFile.TrigramIndex(self.index_path) as index:
+            self.assertEqual(len(index), 0)
+            index.update(self.directory)
+            self.assertEqual(len(index), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
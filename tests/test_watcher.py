@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+from PyFile import watcher, file
+
+
+class WatcherTests(object):
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "watched.txt")
+        with open(self.path, "w") as f:
+            f.write("first\n")
+        self.file = file.File(self.path, open_file=False)
+        self.received = []
+        self.watcher = watcher.Watcher(self.received.append, self.make_backend())
+        self.watcher.add(self.file)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.directory)
+
+    def test_modify(self):
+        digest = self.file.sha256()
+        self.assertEqual(self.watcher.poll(0), [])
+        with open(self.path, "a") as f:
+            f.write("second line, longer\n")
+        events = self.watcher.poll(2)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].kind, watcher.MODIFIED)
+        self.assertEqual(events[0].files, (self.file,))
+        self.assertEqual(self.received, events)
+        self.assertTrue(self.file.modified)
+        self.assertNotIn(("digest", "sha256"), self.file._cache)
+        self.assertNotEqual(self.file.sha256(), digest)
+
+    def test_delete(self):
+        os.remove(self.path)
+        events = self.watcher.poll(2)
+        self.assertEqual([event.kind for event in events], [watcher.DELETED])
+        self.assertFalse(self.file.exists)
+
+    def test_events(self):
+        with open(self.path, "a") as f:
+            f.write("x")
+        self.assertEqual([event.path for event in self.watcher.events(timeout=0.5)], [self.path])
+
+    def test_replace(self):
+        replacement = os.path.join(self.directory, "replacement.txt")
+        with open(replacement, "w") as f:
+            f.write("replaced\n")
+        os.replace(replacement, self.path)
+        events = self.watcher.poll(2)
+        self.assertEqual([(event.kind, event.path) for event in events], [(watcher.MOVED, self.path)])
+
+        with open(self.path, "a") as f:
+            f.write("still watched\n")
+        self.assertEqual([event.kind for event in self.watcher.poll(2)], [watcher.MODIFIED])
+
+    def test_recreate(self):
+        os.remove(self.path)
+        self.assertEqual([event.kind for event in self.watcher.poll(2)], [watcher.DELETED])
+        with open(self.path, "w") as f:
+            f.write("recreated\n")
+        events = self.watcher.poll(2)
+        self.assertEqual(len(events), 1)
+        self.assertIn(events[0].kind, (watcher.MODIFIED, watcher.MOVED))
+        self.assertTrue(self.file.exists)
+
+        with open(self.path, "a") as f:
+            f.write("more\n")
+        self.assertEqual([event.kind for event in self.watcher.poll(2)], [watcher.MODIFIED])
+
+    def test_missing_path(self):
+        path = os.path.join(self.directory, "later.txt")
+        later = file.File(path, open_file=False)
+        self.watcher.add(later)
+        self.assertEqual(self.watcher.poll(0), [])
+        with open(path, "w") as f:
+            f.write("created\n")
+        events = self.watcher.poll(2)
+        self.assertEqual([(event.kind, event.path) for event in events], [(watcher.MODIFIED, path)])
+        self.assertTrue(later.exists)
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+    def make_backend(self):
+        return watcher.PollingBackend(min_interval=0.01, max_interval=0.05)
+
+    def test_sweep_order_reused(self):
+        backend = watcher.PollingBackend(batch_size=10)
+        for i in range(35):
+            backend.add(os.path.join(self.directory, "missing%d" % i))
+        backend._read_batch()
+        order = backend._order
+        sweeps = [backend._read_batch()[1] for _ in range(3)]
+        self.assertEqual(sweeps, [False, False, True])
+        self.assertIs(backend._order, order)
+
+        backend.add(os.path.join(self.directory, "another"))
+        self.assertIsNone(backend._order)
+        backend.remove(os.path.join(self.directory, "missing0"))
+        backend._read_batch()
+        self.assertEqual(len(backend._order), 35)
+
+
+@unittest.skipUnless(os.path.exists("/proc/sys/fs/inotify"), "inotify not available")
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+    def make_backend(self):
+        return watcher.InotifyBackend()
+
+
+if __name__ == "__main__":
+    unittest.main()
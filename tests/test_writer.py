@@ -0,0 +1,118 @@
+import unittest
+import os
+import stat
+import tempfile
+import shutil
+from unittest import mock
+from PyFile import writer
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "records.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_write(self):
+        flushes = []
+        with writer.Writer(self.path, buffer_size=100, on_flush=lambda: flushes.append(1)) as w:
+            w.write(b"abc")
+            w.write("déf")
+            w.write(bytearray(b"ghi"))
+            w.writelines([memoryview(b"x" * 200), b"\n"])
+            self.assertEqual(w.bytes_written, 211)
+        self.assertTrue(w.closed)
+        self.assertEqual(self.read(), b"abc" + "déf".encode() + b"ghi" + b"x" * 200 + b"\n")
+        # One flush for the large record, one on close.
+        self.assertEqual(len(flushes), 2)
+        self.assertRaises(ValueError, w.write, b"closed")
+
+    def test_append(self):
+        with writer.Writer(self.path) as w:
+            w.write(b"first\n")
+        with writer.Writer(self.path, append=True) as w:
+            w.write(b"second\n")
+        self.assertEqual(self.read(), b"first\nsecond\n")
+
+    def test_write_all_partial(self):
+        real_writev = os.writev
+
+        def short_writev(fd, buffers):
+            # Write at most 5 bytes per call.
+            return real_writev(fd, [bytes(b"".join(bytes(b) for b in buffers)[:5])])
+
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT)
+        try:
+            with mock.patch("os.writev", side_effect=short_writev):
+                self.assertEqual(writer.write_all(fd, [b"abc", b"defgh", b"ijklmnop"]), 16)
+        finally:
+            os.close(fd)
+        self.assertEqual(self.read(), b"abcdefghijklmnop")
+
+    def test_many_buffers(self):
+        records = [b"%d\n" % i for i in range(writer.IOV_MAX * 2 + 10)]
+        with writer.Writer(self.path) as w:
+            w.writelines(records)
+        self.assertEqual(self.read(), b"".join(records))
+
+    def test_atomic_new_file_mode(self):
+        # The umask is read when the file is created, not when the module was imported.
+        previous = os.umask(0o027)
+        try:
+            with writer.Writer(self.path, atomic=True) as w:
+                w.write(b"new\n")
+        finally:
+            os.umask(previous)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+    def test_atomic(self):
+        with open(self.path, "wb") as f:
+            f.write(b"old\n")
+        os.chmod(self.path, 0o640)
+
+        with writer.Writer(self.path, atomic=True, durability=writer.Durability.ON_CLOSE) as w:
+            w.write(b"new\n")
+            w.flush()
+            self.assertEqual(self.read(), b"old\n")
+        self.assertEqual(self.read(), b"new\n")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self.directory), ["records.bin"])
+
+        with writer.Writer(self.path, append=True, atomic=True) as w:
+            w.write(b"more\n")
+        self.assertEqual(self.read(), b"new\nmore\n")
+
+    def test_atomic_abort(self):
+        with open(self.path, "wb") as f:
+            f.write(b"old\n")
+        with self.assertRaises(RuntimeError):
+            with writer.Writer(self.path, atomic=True) as w:
+                w.write(b"partial")
+                w.flush()
+                raise RuntimeError()
+        self.assertEqual(self.read(), b"old\n")
+        self.assertEqual(os.listdir(self.directory), ["records.bin"])
+
+    def test_periodic_sync(self):
+        with mock.patch("os.fsync") as fsync:
+            with writer.Writer(self.path, durability=writer.Durability.PERIODIC, sync_every=10, buffer_size=4) as w:
+                for _ in range(10):
+                    w.write(b"12345")
+            # Every other flush crosses sync_every, plus the final fsync on close.
+            self.assertEqual(fsync.call_count, 6)
+        self.assertEqual(self.read(), b"12345" * 10)
+
+        with mock.patch("os.fsync") as fsync:
+            with writer.Writer(self.path) as w:
+                w.write(b"12345")
+            fsync.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()